@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 # Carregar variáveis de ambiente
@@ -22,15 +23,147 @@ class Settings:
     EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
     EMAIL_RECEIVER = os.getenv("EMAIL_RECEIVER")
 
+    # SMTP: conexões reaproveitadas (limite de envios simultâneos) e retentativas em erros 4xx
+    SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+    SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+    SMTP_MAX_CONNECTIONS = int(os.getenv("SMTP_MAX_CONNECTIONS", "3"))
+    SMTP_MAX_RETRIES = int(os.getenv("SMTP_MAX_RETRIES", "3"))
+    SMTP_RETRY_BACKOFF = float(os.getenv("SMTP_RETRY_BACKOFF", "2"))
+    SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+
+    # Gráfico no e-mail: "cid" (anexo multipart/related) ou "inline" (data URI base64)
+    EMAIL_CHART_MODE = os.getenv("EMAIL_CHART_MODE", "cid").lower()
+    CHART_DPI = int(os.getenv("CHART_DPI", "80"))
+
+    # Gráfico em SVG (sem matplotlib) só para domínios cujos clientes exibem SVG inline
+    # (Apple Mail/iCloud); Gmail, Outlook, Hotmail, Yahoo e os demais recebem PNG
+    CHART_FORMAT = os.getenv("CHART_FORMAT", "svg").lower()
+    CHART_SVG_DOMAINS = [
+        d.strip().lower()
+        for d in os.getenv("CHART_SVG_DOMAINS", "icloud.com,me.com,mac.com").split(',') if d.strip()
+    ]
+    JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR", "data/cache/jinja")
+
     # IA (Gemini)
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+    # Prompt: orçamento de tokens para os dados da carteira e quantos ativos detalhar
+    AI_PROMPT_TOKEN_BUDGET = int(os.getenv("AI_PROMPT_TOKEN_BUDGET", "2000"))
+    AI_PROMPT_TOP_K = int(os.getenv("AI_PROMPT_TOP_K", "15"))
+
+    # Corrida entre modelos: dispara o reserva após N s sem resposta, dentro de um prazo total
+    AI_HEDGE_DELAY_SECONDS = float(os.getenv("AI_HEDGE_DELAY_SECONDS", "10"))
+    AI_DEADLINE_SECONDS = float(os.getenv("AI_DEADLINE_SECONDS", "90"))
+    AI_STREAMING = os.getenv("AI_STREAMING", "false").lower() in ("1", "true", "yes")
+
+    # Notícias: consultas macro + uma por ativo, em paralelo, com cache diário
+    NEWS_MACRO_QUERIES = ['Mercado Financeiro Ibovespa', 'Copom Selic juros', 'Dólar câmbio hoje']
+    NEWS_MAX_TICKER_QUERIES = int(os.getenv("NEWS_MAX_TICKER_QUERIES", "10"))
+    NEWS_MAX_WORKERS = int(os.getenv("NEWS_MAX_WORKERS", "4"))
+    NEWS_TOP_N = int(os.getenv("NEWS_TOP_N", "8"))
+    NEWS_DUP_THRESHOLD = float(os.getenv("NEWS_DUP_THRESHOLD", "0.5"))
+    NEWS_CACHE_DIR = os.getenv("NEWS_CACHE_DIR", "data/cache/news")
+
+    # Cache de respostas da IA: validade, tamanho e tolerância relativa para arredondar números do prompt
+    AI_CACHE_PATH = os.getenv("AI_CACHE_PATH", "data/cache/ai_responses.json")
+    AI_CACHE_TTL_HOURS = float(os.getenv("AI_CACHE_TTL_HOURS", "12"))
+    AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "200"))
+    AI_CACHE_TOLERANCE = float(os.getenv("AI_CACHE_TOLERANCE", "0"))
+
     # App
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+    # Orquestração do job: etapas em paralelo e prazo total (segundos)
+    PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "4"))
+    JOB_DEADLINE_SECONDS = float(os.getenv("JOB_DEADLINE_SECONDS", "600"))
+
+    # Métricas por execução e profiling opcional ("cprofile" ou "pyinstrument")
+    METRICS_JSONL_PATH = os.getenv("METRICS_JSONL_PATH", "logs/metrics.jsonl")
+    METRICS_PROM_PATH = os.getenv("METRICS_PROM_PATH", "logs/metrics.prom")
+    PROFILE = os.getenv("PROFILE", "").lower()
+
+    # Histórico diário do patrimônio (JSON lines, append-only)
+    HISTORY_PATH = os.getenv("HISTORY_PATH", "data/history.jsonl")
+    LEGACY_HISTORY_PATH = "data/history.json"
+
+    # Market Data: tickers por requisição no download em lote do yfinance
+    PRICE_BATCH_SIZE = int(os.getenv("PRICE_BATCH_SIZE", "100"))
+
+    # Cache local de cotações (SQLite); acima de N dias sem atualizar, baixa 1y completo
+    PRICE_CACHE_PATH = os.getenv("PRICE_CACHE_PATH", "data/prices.db")
+    PRICE_CACHE_MAX_GAP_DAYS = int(os.getenv("PRICE_CACHE_MAX_GAP_DAYS", "30"))
+
+    # Fundamentos (stock.info): workers, limite de requisições/s, timeout por ticker e da etapa inteira
+    FUNDAMENTALS_MAX_WORKERS = int(os.getenv("FUNDAMENTALS_MAX_WORKERS", "8"))
+    FUNDAMENTALS_RATE_LIMIT = float(os.getenv("FUNDAMENTALS_RATE_LIMIT", "4"))
+    FUNDAMENTALS_BURST = int(os.getenv("FUNDAMENTALS_BURST", "8"))
+    FUNDAMENTALS_TIMEOUT = float(os.getenv("FUNDAMENTALS_TIMEOUT", "15"))
+    FUNDAMENTALS_STAGE_TIMEOUT = float(os.getenv("FUNDAMENTALS_STAGE_TIMEOUT", "60"))
+
+    # Séries do BCB (Selic/CDI via SGS e PTAX) armazenadas localmente
+    INDICATORS_STORE_PATH = os.getenv("INDICATORS_STORE_PATH", "data/indicators.json")
+    INDICATORS_HISTORY_DAYS = int(os.getenv("INDICATORS_HISTORY_DAYS", "30"))
+
+    # Cache de fundamentos: validade por campo (segundos) e tamanho máximo (LRU)
+    FUNDAMENTALS_CACHE_PATH = os.getenv("FUNDAMENTALS_CACHE_PATH", "data/fundamentals_cache.json")
+    FUNDAMENTALS_CACHE_SIZE = int(os.getenv("FUNDAMENTALS_CACHE_SIZE", "500"))
+    FUNDAMENTALS_TTL = {
+        "name": 30 * 86400,
+        "sector": 30 * 86400,
+        "recommendation": 7 * 86400,
+        "p_vp": 7 * 86400,
+        "pe": 7 * 86400,
+        "dy_12m": 7 * 86400,
+        "roe": 7 * 86400
+    }
     
     # Google Sheets CSV Link
     SHEET_CSV_URL = "https://docs.google.com/spreadsheets/d/e/2PACX-1vQsiq3RTqfKGES0ntzkV_crn8BN43DleBxbpUr-UX32zD28ppyURXLaLnYIGaGmXt1Nvu3jUNsdjmiK/pub?gid=0&single=true&output=csv"
     
+    # Cópia local da planilha (revalidada via ETag/Last-Modified)
+    SHEETS_CACHE_DIR = os.getenv("SHEETS_CACHE_DIR", "data/cache/sheets")
+    SHEETS_TIMEOUT = float(os.getenv("SHEETS_TIMEOUT", "30"))
+
+    # Aba de transações (CSV publicado) e checkpoint do livro-razão com custo médio FIFO
+    TRANSACTIONS_CSV_URL = os.getenv("TRANSACTIONS_CSV_URL")
+    LEDGER_STATE_PATH = os.getenv("LEDGER_STATE_PATH", "data/cache/ledger.json")
+
+    # Modo lote: arquivo JSON com uma lista de carteiras
+    # [{"name": "...", "sheet_url": "...", "email_receiver": "a@x.com,b@y.com"}]
+    PORTFOLIOS_FILE = os.getenv("PORTFOLIOS_FILE")
+    DEFAULT_PORTFOLIO_NAME = "default"
+
+    # Risco: benchmark para o beta e nível de confiança do VaR/CVaR histórico
+    RISK_BENCHMARK = os.getenv("RISK_BENCHMARK", "BOVA11.SA")
+    RISK_VAR_CONFIDENCE = float(os.getenv("RISK_VAR_CONFIDENCE", "0.95"))
+    # Momentos da janela de retornos salvos entre execuções (cada dia novo entra de forma incremental)
+    RISK_STATE_PATH = os.getenv("RISK_STATE_PATH", "data/cache/risk_state.npz")
+
+    # Regras de rebalanceamento e aporte (também usadas no backtest)
+    REBALANCE_BAND_PP = float(os.getenv("REBALANCE_BAND_PP", "5"))
+    MONTHLY_CONTRIBUTION = float(os.getenv("MONTHLY_CONTRIBUTION", "250"))
+    RF_PRIORITY_CAP_PCT = float(os.getenv("RF_PRIORITY_CAP_PCT", "40"))
+
+    # Ordens de aporte por ativo: lotes de compra (B3 padrão/fracionário, casas de cripto e EUA, passo da RF em R$)
+    B3_FRACTIONAL = os.getenv("B3_FRACTIONAL", "true").lower() in ("1", "true", "yes")
+    B3_STANDARD_LOT = int(os.getenv("B3_STANDARD_LOT", "100"))
+    CRYPTO_DECIMALS = int(os.getenv("CRYPTO_DECIMALS", "6"))
+    US_FRACTIONAL_DECIMALS = int(os.getenv("US_FRACTIONAL_DECIMALS", "0"))
+    RF_STEP_BRL = float(os.getenv("RF_STEP_BRL", "0.01"))
+    SOLVER_MAX_PASSES = int(os.getenv("SOLVER_MAX_PASSES", "10000"))
+
+    # Backtest: anos de histórico, custo por rebalanceamento (bps do giro) e processos
+    BACKTEST_YEARS = int(os.getenv("BACKTEST_YEARS", "10"))
+    BACKTEST_COST_BPS = float(os.getenv("BACKTEST_COST_BPS", "0"))
+    BACKTEST_MAX_WORKERS = int(os.getenv("BACKTEST_MAX_WORKERS", str(os.cpu_count() or 1)))
+    BACKTEST_OUTPUT_PATH = os.getenv("BACKTEST_OUTPUT_PATH", "data/backtest.csv")
+
+    # Projeção Monte Carlo: horizontes (anos), caminhos simulados, percentis e processos
+    PROJECTION_YEARS = [int(y) for y in os.getenv("PROJECTION_YEARS", "5,10,20").split(',') if y.strip()]
+    PROJECTION_PATHS = int(os.getenv("PROJECTION_PATHS", "10000"))
+    PROJECTION_PERCENTILES = [int(p) for p in os.getenv("PROJECTION_PERCENTILES", "10,50,90").split(',') if p.strip()]
+    PROJECTION_MAX_WORKERS = int(os.getenv("PROJECTION_MAX_WORKERS", "1"))
+
     # Alocação Ideal Atualizada
     TARGET_ALLOCATION = {
         "Renda Fixa": 0.35,  # 35%
@@ -40,4 +173,42 @@ class Settings:
         "REITs": 0.07,       # 7%
         "Ações EUA": 0.07,   # 7%
         "Cripto": 0.06       # 6%
-    }
\ No newline at end of file
+    }
+
+    @classmethod
+    def recipient_needs_png(cls, recipient):
+        """True if the recipient's client should get the PNG chart instead of SVG."""
+        if cls.CHART_FORMAT != "svg":
+            return True
+        domain = recipient.rsplit('@', 1)[-1].strip().lower()
+        return domain not in cls.CHART_SVG_DOMAINS
+
+    @classmethod
+    def get_portfolios(cls):
+        """Portfolios processed by the job; a single default one unless PORTFOLIOS_FILE is set."""
+        default = {
+            "name": cls.DEFAULT_PORTFOLIO_NAME,
+            "sheet_url": cls.SHEET_CSV_URL,
+            "email_receiver": cls.EMAIL_RECEIVER,
+            "history_path": cls.HISTORY_PATH,
+            "legacy_history_path": cls.LEGACY_HISTORY_PATH,
+            "transactions_url": cls.TRANSACTIONS_CSV_URL,
+            "ledger_path": cls.LEDGER_STATE_PATH,
+            "risk_state_path": cls.RISK_STATE_PATH
+        }
+        if not cls.PORTFOLIOS_FILE:
+            return [default]
+
+        with open(cls.PORTFOLIOS_FILE, 'r') as f:
+            portfolios = json.load(f)
+        for portfolio in portfolios:
+            if portfolio['name'] == cls.DEFAULT_PORTFOLIO_NAME:
+                for key, value in default.items():
+                    portfolio.setdefault(key, value)
+            portfolio.setdefault("sheet_url", cls.SHEET_CSV_URL)
+            portfolio.setdefault("email_receiver", cls.EMAIL_RECEIVER)
+            portfolio.setdefault("history_path", f"data/history_{portfolio['name']}.jsonl")
+            portfolio.setdefault("transactions_url", None)
+            portfolio.setdefault("ledger_path", f"data/cache/ledger_{portfolio['name']}.json")
+            portfolio.setdefault("risk_state_path", f"data/cache/risk_state_{portfolio['name']}.npz")
+        return portfolios
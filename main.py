@@ -1,15 +1,16 @@
+import argparse
 import logging
 import sys
 import os
 from datetime import datetime
+from functools import partial
 from config.settings import Settings
-from src.data_collector import DataCollector
-from src.portfolio import PortfolioManager
-from src.report_generator import ReportGenerator
-from src.notifier import Notifier
-from src.ai_analyst import AIAnalyst
-from src.news_collector import NewsCollector
-from src.sheets_manager import SheetsManager
+from src.pipeline import Pipeline, PipelineAbort, Stage
+from src.metrics import metrics, run_profiled
+
+# Heavy dependencies (pandas, yfinance, matplotlib, google-genai, GoogleNews,
+# python-bcb, jinja2) are imported inside the stage that needs them, so
+# startup, dry runs and no-op runs don't pay for them.
 
 # Configure Logging
 os.makedirs("logs", exist_ok=True)
@@ -23,63 +24,228 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def job():
+# --- Stages ---
+
+def load_portfolio(config):
+    # 1. Load Portfolio from Sheets
+    from src.sheets_manager import SheetsManager
+    portfolio_data = SheetsManager.get_portfolio_from_sheets(config['sheet_url'])
+    if not portfolio_data:
+        logger.error(f"Failed to load portfolio data for '{config['name']}'.")
+    return portfolio_data
+
+def load_ledger(config, portfolio_data, indicators):
+    # 1.1 Transactions ledger (FIFO cost basis); runs after indicators so the PTAX store is current
+    if not config.get('transactions_url'):
+        return None
+    from src.sheets_manager import SheetsManager
+    from src.indicators_service import IndicatorsService
+    from src.ledger import Ledger
+    try:
+        content = SheetsManager.get_transactions_csv(config['transactions_url'])
+        usd_tickers = {
+            item['ticker'] for item in portfolio_data or []
+            if item.get('category') in ('US_STOCKS', 'US_REITS') or
+            (item.get('category') == 'CRYPTO' and not item['ticker'].endswith('-BRL'))
+        }
+        ledger = Ledger(config['ledger_path']).sync(
+            content, SheetsManager.parse_transactions,
+            ptax=partial(IndicatorsService().history, 'ptax'), usd_tickers=usd_tickers
+        )
+        return ledger.cost_basis()
+    except Exception as e:
+        logger.error(f"Failed to update transactions ledger for '{config['name']}': {e}")
+        return None
+
+def merge_portfolios(*portfolios):
+    """Union of all tickers, so market data is fetched once for every portfolio."""
+    universe = {}
+    for portfolio_data in portfolios:
+        for item in portfolio_data:
+            universe.setdefault(item['ticker'], item)
+    if not universe:
+        raise PipelineAbort("Failed to load portfolio data. Aborting.")
+    return list(universe.values())
+
+def fetch_market_data(universe):
+    # 2. Data Collection
+    from src.data_collector import DataCollector
+    collector = DataCollector(universe)
+    quotes = collector.get_market_data()
+    return {'quotes': quotes, 'panel': collector.price_panel}
+
+def fetch_indicators():
+    from src.indicators_service import IndicatorsService
+    return IndicatorsService().get()
+
+def fetch_news(universe):
+    # 2.1 News Collection
+    from src.news_collector import NewsCollector
+    return NewsCollector().get_top_news(universe)
+
+def compute_portfolio(config, portfolio_data, market_data, indicators, cost_basis):
+    # 3. Portfolio Logic
+    if not portfolio_data:
+        return None
+    from src.portfolio import PortfolioManager
+    from src.history_store import HistoryStore
+    history = HistoryStore(config['history_path'], config.get('legacy_history_path'))
+    manager = PortfolioManager(
+        portfolio_data, market_data['quotes'], indicators,
+        history_store=history, price_panel=market_data['panel'], cost_basis=cost_basis,
+        risk_state_path=config.get('risk_state_path')
+    )
+    portfolio_df, total_value, daily_variation_pct = manager.calculate_portfolio()
+    suggestions_df = manager.get_rebalancing_suggestions(portfolio_df, total_value)
+    contribution_df = manager.suggest_contribution(Settings.MONTHLY_CONTRIBUTION, suggestions_df)
+    orders = manager.suggest_orders(portfolio_df, Settings.MONTHLY_CONTRIBUTION)
+    risk = manager.calculate_risk(portfolio_df, total_value)
+    pnl = manager.calculate_pnl(portfolio_df)
+    return {
+        'df': portfolio_df,
+        'total_value': total_value,
+        'daily_variation_pct': daily_variation_pct,
+        'suggestions': suggestions_df,
+        'contribution': contribution_df,
+        'orders': orders,
+        'price_panel': manager.price_panel,
+        'risk': risk,
+        'pnl': pnl
+    }
+
+def run_ai_analysis(portfolio, indicators, news_summary):
+    # 3. AI Analysis
+    if portfolio is None:
+        return None
+    logger.info("Generating AI Analysis...")
+    from src.ai_analyst import AIAnalyst
+    analyst = AIAnalyst()
+    return analyst.generate_ai_analysis(
+        portfolio['df'], portfolio['total_value'], indicators, news_summary,
+        risk=portfolio['risk'], price_panel=portfolio['price_panel']
+    )
+
+def run_projection(portfolio_data, portfolio, indicators):
+    # 3.1 Goal projection (Monte Carlo)
+    if portfolio is None:
+        return None
+    from src.projection import project_portfolio
+    try:
+        return project_portfolio(
+            portfolio['df'], portfolio['price_panel'], portfolio_data, indicators.get('cdi_diario', 0.0)
+        )
+    except Exception as e:
+        logger.error(f"Goal projection failed: {e}")
+        return None
+
+def render_chart(config, portfolio):
+    # 4. Report Generation (Chart only)
+    if portfolio is None:
+        return None
+    from src.report_generator import ReportGenerator
+    generator = ReportGenerator()
+    charts = {'svg': "", 'png': b"", 'history_svg': ""}
+    if Settings.CHART_FORMAT == "svg":
+        charts['svg'] = generator.generate_allocation_chart_svg(portfolio['df'])
+        charts['history_svg'] = generator.generate_history_chart_svg(portfolio['df'], portfolio['price_panel'])
+    # PNG (matplotlib) only when some recipient can't display SVG
+    recipients = [r.strip() for r in (config['email_receiver'] or "").split(',') if r.strip()]
+    if not charts['svg'] or any(Settings.recipient_needs_png(r) for r in recipients):
+        charts['png'] = generator.generate_allocation_chart_png(portfolio['df'])
+    return charts
+
+def send_report(config, portfolio, indicators, ai_analysis, charts, projection):
+    # 5. Notification
+    if portfolio is None:
+        return
+    from src.notifier import Notifier
+    notifier = Notifier()
+    subject = f"Relatório Financeiro Diário - {datetime.now().strftime('%d/%m/%Y')}"
+    if config['name'] != Settings.DEFAULT_PORTFOLIO_NAME:
+        subject += f" ({config['name']})"
+    
+    # Prepare context for Email Template
+    email_context = {
+        'date': datetime.now().strftime('%d/%m/%Y'),
+        'total_value': portfolio['total_value'],
+        'daily_variation_pct': portfolio['daily_variation_pct'],
+        'indicators': indicators,
+        'ai_analysis': ai_analysis,
+        'suggestions': portfolio['suggestions'],
+        'contribution': portfolio['contribution'],
+        'contribution_amount': Settings.MONTHLY_CONTRIBUTION,
+        'orders': portfolio['orders'],
+        'risk': portfolio['risk'],
+        'pnl': portfolio['pnl'],
+        'projection': projection,
+        'allocation_chart_svg': charts['svg'],
+        'allocation_chart_png': charts['png'],
+        'history_chart_svg': charts['history_svg']
+    }
+    
+    # Send Email
+    notifier.send_email(subject, email_context, recipients=config['email_receiver'])
+
+def build_stages(portfolios):
+    """
+    Declares each stage with its inputs; independent stages run concurrently.
+    Market data, indicators and news are shared by every portfolio in the batch.
+    """
+    stages = [
+        Stage("indicators", fetch_indicators),
+        Stage("news", fetch_news, ["universe"]),
+        Stage("universe", merge_portfolios, [f"sheets:{p['name']}" for p in portfolios]),
+        Stage("market_data", fetch_market_data, ["universe"]),
+    ]
+    for config in portfolios:
+        name = config['name']
+        stages += [
+            Stage(f"sheets:{name}", partial(load_portfolio, config)),
+            Stage(f"ledger:{name}", partial(load_ledger, config), [f"sheets:{name}", "indicators"]),
+            Stage(f"portfolio:{name}", partial(compute_portfolio, config),
+                  [f"sheets:{name}", "market_data", "indicators", f"ledger:{name}"]),
+            Stage(f"ai_analysis:{name}", run_ai_analysis, [f"portfolio:{name}", "indicators", "news"]),
+            Stage(f"projection:{name}", run_projection, [f"sheets:{name}", f"portfolio:{name}", "indicators"]),
+            Stage(f"chart:{name}", partial(render_chart, config), [f"portfolio:{name}"]),
+            Stage(f"email:{name}", partial(send_report, config),
+                  [f"portfolio:{name}", "indicators", f"ai_analysis:{name}", f"chart:{name}",
+                   f"projection:{name}"]),
+        ]
+    return stages
+
+def job(dry_run=False):
     logger.info("Starting daily financial report job...")
     try:
-        # 1. Load Portfolio from Sheets
-        portfolio_data = SheetsManager.get_portfolio_from_sheets()
-        if not portfolio_data:
-            logger.error("Failed to load portfolio data. Aborting.")
+        portfolios = Settings.get_portfolios()
+        logger.info(f"Portfolios in this run: {[p['name'] for p in portfolios]}")
+        pipeline = Pipeline(
+            build_stages(portfolios),
+            max_workers=Settings.PIPELINE_MAX_WORKERS,
+            deadline=Settings.JOB_DEADLINE_SECONDS
+        )
+        if dry_run:
+            for stage in pipeline.stages.values():
+                logger.info(f"[dry-run] {stage.name} <- {stage.inputs}")
             return
-
-        # 2. Data Collection
-        collector = DataCollector(portfolio_data)
-        market_data = collector.get_market_data()
-        indicators = collector.get_economic_indicators()
-        
-        # 2.1 News Collection
-        news_collector = NewsCollector()
-        news_summary = news_collector.get_top_news()
-        
-        # 3. Portfolio Logic
-        manager = PortfolioManager(portfolio_data, market_data, indicators)
-        portfolio_df, total_value, daily_variation_pct = manager.calculate_portfolio()
-        suggestions_df = manager.get_rebalancing_suggestions(portfolio_df, total_value)
-        contribution_df = manager.suggest_contribution(250.00, suggestions_df)
-        
-        # 3. AI Analysis
-        logger.info("Generating AI Analysis...")
-        analyst = AIAnalyst()
-        ai_analysis = analyst.generate_ai_analysis(portfolio_df, total_value, indicators, news_summary)
-        
-        # 4. Report Generation (Chart only)
-        generator = ReportGenerator()
-        chart_b64 = generator.generate_allocation_chart(portfolio_df)
-        
-        # 5. Notification
-        notifier = Notifier()
-        subject = f"Relatório Financeiro Diário - {datetime.now().strftime('%d/%m/%Y')}"
-        
-        # Prepare context for Email Template
-        email_context = {
-            'date': datetime.now().strftime('%d/%m/%Y'),
-            'total_value': total_value,
-            'daily_variation_pct': daily_variation_pct,
-            'indicators': indicators,
-            'ai_analysis': ai_analysis,
-            'suggestions': suggestions_df,
-            'contribution': contribution_df,
-            'allocation_chart': chart_b64
-        }
-        
-        # Send Email
-        notifier.send_email(subject, email_context)
+        pipeline.run()
         
         logger.info("Job completed successfully.")
         
+    except PipelineAbort as e:
+        logger.error(str(e))
     except Exception as e:
         logger.error(f"Job failed: {e}", exc_info=True)
         sys.exit(1)
+    finally:
+        metrics.export(Settings.METRICS_JSONL_PATH, Settings.METRICS_PROM_PATH)
 
 if __name__ == "__main__":
-    job()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Invest-AI daily report job")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Validate settings and the stage graph without running any stage")
+    args = parser.parse_args()
+
+    if Settings.PROFILE:
+        run_profiled(partial(job, dry_run=args.dry_run), Settings.PROFILE)
+    else:
+        job(dry_run=args.dry_run)
@@ -1,7 +1,14 @@
 from google import genai
+from google.genai import types
 import logging
 import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from config.settings import Settings
+from src.metrics import metrics
+from src.ai_cache import AIResponseCache
+from src.prompt_builder import build_portfolio_summary
 
 logger = logging.getLogger(__name__)
 
@@ -20,19 +27,24 @@ class AIAnalyst:
             self.client = None
             logger.warning("GEMINI_API_KEY não configurada. A análise de IA será pulada.")
 
-    def generate_ai_analysis(self, portfolio_df, total_value, indicators, news_summary):
+        self.cache = AIResponseCache(
+            Settings.AI_CACHE_PATH,
+            Settings.AI_CACHE_TTL_HOURS * 3600,
+            max_entries=Settings.AI_CACHE_MAX_ENTRIES,
+            tolerance=Settings.AI_CACHE_TOLERANCE
+        )
+
+    def generate_ai_analysis(self, portfolio_df, total_value, indicators, news_summary, risk=None, price_panel=None):
         if not self.client:
             return "Análise de IA indisponível (Chave API não configurada)."
 
-        portfolio_summary = portfolio_df.to_dict(orient='records')
-        summary_text = f"Valor Total: R$ {total_value:,.2f}\n"
-        summary_text += f"Indicadores: Selic {indicators.get('selic_meta')}% | CDI {indicators.get('cdi')}% | PTAX {indicators.get('ptax_venda')}\n"
-        summary_text += "Ativos:\n"
-        
-        for item in portfolio_summary:
-            summary_text += (f"- {item['ticker']} ({item['category']}): R$ {item['value_brl']:.2f} "
-                            f"({item['allocation']:.1f}%) | L/P: {item.get('profit_loss_pct', 0):.2f}% | "
-                            f"P/L: {item.get('pe', 0):.1f} | ROE: {item.get('roe', 0):.1f}% | Rec: {item.get('recommendation', 'N/A')}\n")
+        summary_text = build_portfolio_summary(
+            portfolio_df, total_value, indicators,
+            token_budget=Settings.AI_PROMPT_TOKEN_BUDGET,
+            top_k=Settings.AI_PROMPT_TOP_K,
+            risk=risk,
+            price_panel=price_panel
+        )
 
         full_prompt = f"""
         Você é um Gestor de Portfólio Sênior. Analise a carteira com base no contexto:
@@ -46,19 +58,111 @@ class AIAnalyst:
         Gere uma análise direta e executiva sobre o que fazer hoje.
         """
 
-        for model_id in self.models_to_try:
-            try:
-                logger.info(f"Tentando análise com o modelo: {model_id}")
+        cached_model, cached_text = self.cache.lookup(self.models_to_try, full_prompt)
+        self._report_cache_stats()
+        if cached_text:
+            logger.info(f"Análise de IA reaproveitada do cache (modelo {cached_model}).")
+            return cached_text
+
+        result = self._generate_hedged(full_prompt)
+        if result is None:
+            return "Análise de IA temporariamente indisponível (Erro de conexão/cota)."
+
+        model_id, text, latency = result
+        self.cache.put(model_id, full_prompt, text, latency)
+        self.cache.save()
+        return text
+
+    def _call_model(self, model_id, prompt, cancelled, deadline):
+        """
+        Calls one model (streaming if enabled). Returns (text, latency) or raises.
+        The HTTP request times out client-side when the hedge deadline expires.
+        """
+        start = time.monotonic()
+        timeout_ms = max(1, int((deadline - start) * 1000))
+        config = types.GenerateContentConfig(http_options=types.HttpOptions(timeout=timeout_ms))
+        with metrics.span("fetch.gemini", model=model_id):
+            if Settings.AI_STREAMING:
+                chunks = []
+                stream = self.client.models.generate_content_stream(model=model_id, contents=prompt, config=config)
+                for chunk in stream:
+                    if cancelled.is_set():
+                        return None
+                    if chunk.text:
+                        chunks.append(chunk.text)
+                text = "".join(chunks)
+            else:
                 response = self.client.models.generate_content(
                     model=model_id,
-                    contents=full_prompt
+                    contents=prompt,
+                    config=config
                 )
-                
-                if response and response.text:
-                    return response.text
-                
-            except Exception as e:
-                logger.error(f"Erro com o modelo {model_id}: {e}")
-                if model_id == self.models_to_try[-1]:
-                    return "Análise de IA temporariamente indisponível (Erro de conexão/cota)."
-                continue
\ No newline at end of file
+                text = response.text if response else None
+
+        if not text:
+            raise ValueError("resposta vazia")
+        return text, time.monotonic() - start
+
+    def _generate_hedged(self, prompt):
+        """
+        Races models_to_try: starts the primary, launches the next model when no answer
+        arrives within AI_HEDGE_DELAY_SECONDS (or as soon as a model fails) and keeps
+        the first good response. Returns (model_id, text, latency), or None when every
+        model failed or AI_DEADLINE_SECONDS passed.
+        """
+        deadline = time.monotonic() + Settings.AI_DEADLINE_SECONDS
+        cancelled = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=len(self.models_to_try))
+        running = {}
+        queue = list(self.models_to_try)
+
+        def launch():
+            model_id = queue.pop(0)
+            logger.info(f"Tentando análise com o modelo: {model_id}")
+            running[executor.submit(self._call_model, model_id, prompt, cancelled, deadline)] = model_id
+
+        try:
+            launch()
+            while running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.error(f"Prazo de {Settings.AI_DEADLINE_SECONDS}s da análise de IA esgotado.")
+                    return None
+
+                timeout = min(remaining, Settings.AI_HEDGE_DELAY_SECONDS) if queue else remaining
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    if queue:
+                        logger.info(f"Sem resposta em {Settings.AI_HEDGE_DELAY_SECONDS}s, disparando modelo reserva.")
+                        metrics.incr("hedge.gemini")
+                        launch()
+                    continue
+
+                for future in done:
+                    model_id = running.pop(future)
+                    try:
+                        text, latency = future.result()
+                    except Exception as e:
+                        logger.error(f"Erro com o modelo {model_id}: {e}")
+                        metrics.incr("retry.gemini")
+                        if queue:
+                            launch()
+                        continue
+                    logger.info(f"Análise gerada pelo modelo {model_id} em {latency:.1f}s.")
+                    return model_id, text, latency
+
+            return None
+        finally:
+            # Cancela as chamadas restantes (streams param no próximo chunk)
+            cancelled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _report_cache_stats(self):
+        stats = self.cache.stats()
+        metrics.incr("cache.ai.hits", stats['hits'])
+        metrics.incr("cache.ai.misses", stats['misses'])
+        metrics.incr("cache.ai.saved_seconds", stats['saved_seconds'])
+        logger.info(
+            f"AI cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"(hit rate {stats['hit_rate']:.0%}), {stats['saved_seconds']:.1f}s saved."
+        )
@@ -0,0 +1,118 @@
+import os
+import re
+import json
+import math
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Número isolado (fora de tickers como PETR4, datas 17/10/2026 e rótulos como 12M), com % opcional
+_NUMBER = re.compile(r'(?<![\w/.,-])(-?\d[\d,]*(?:\.\d+)?)(\s*%)?(?![\w/])')
+
+def _is_value(match, text):
+    """Prices, totals and percentages: decimals, thousands separators, a % sign or an R$ prefix."""
+    number, percent = match.group(1), match.group(2)
+    return bool(percent) or '.' in number or ',' in number or text[:match.start()].endswith("R$ ")
+
+def _bucket(value, tolerance):
+    """Log-scale bucket of relative width `tolerance`: values sharing a bucket differ by less than it."""
+    if value == 0:
+        return "0"
+    sign = "-" if value < 0 else ""
+    return f"{sign}~{math.floor(math.log(abs(value)) / math.log1p(tolerance))}"
+
+def normalize_prompt(prompt, tolerance=0.0):
+    """
+    Collapses whitespace and, with tolerance > 0 (relative, e.g. 0.01 = 1%), replaces each
+    value (price, total, percentage) by its log-scale bucket so near-identical inputs share
+    a key. Dates, years, counts and tickers are kept as written.
+    """
+    text = " ".join(prompt.split())
+    if tolerance > 0:
+
+        def quantize(match):
+            if not _is_value(match, text):
+                return match.group()
+            value = float(match.group(1).replace(',', ''))
+            return _bucket(value, tolerance) + (match.group(2) or "")
+
+        text = _NUMBER.sub(quantize, text)
+    return text
+
+class AIResponseCache:
+    """On-disk cache of model responses keyed by hash(model id + normalized prompt), with TTL and LRU eviction."""
+
+    def __init__(self, path, ttl_seconds, max_entries=200, tolerance=0.0):
+        self.path = path
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.tolerance = tolerance
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    self.entries = OrderedDict(json.load(f))
+        except Exception as e:
+            logger.warning(f"Failed to load AI response cache: {e}")
+            self.entries = OrderedDict()
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with self.lock:
+                data = json.dumps(self.entries)
+            with open(self.path, 'w') as f:
+                f.write(data)
+        except Exception as e:
+            logger.warning(f"Failed to save AI response cache: {e}")
+
+    def key(self, model_id, prompt):
+        normalized = normalize_prompt(prompt, self.tolerance)
+        return hashlib.sha256(f"{model_id}\n{normalized}".encode()).hexdigest()
+
+    def lookup(self, model_ids, prompt):
+        """Returns (model_id, text) for the first model with a live entry, else (None, None)."""
+        now = time.time()
+        with self.lock:
+            for model_id in model_ids:
+                key = self.key(model_id, prompt)
+                entry = self.entries.get(key)
+                if entry and now - entry['created_at'] < self.ttl:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    self.saved_seconds += entry.get('latency', 0.0)
+                    return model_id, entry['text']
+            self.misses += 1
+            return None, None
+
+    def put(self, model_id, prompt, text, latency):
+        now = time.time()
+        with self.lock:
+            key = self.key(model_id, prompt)
+            self.entries[key] = {'model': model_id, 'text': text, 'latency': latency, 'created_at': now}
+            self.entries.move_to_end(key)
+            # Remove expirados e depois os menos usados acima do limite
+            for stale_key in [k for k, e in self.entries.items() if now - e['created_at'] >= self.ttl]:
+                del self.entries[stale_key]
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "saved_seconds": self.saved_seconds
+        }
@@ -0,0 +1,312 @@
+import os
+import logging
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from config.settings import Settings
+from src.price_store import PriceStore
+from src.portfolio import CATEGORY_MAP
+
+logger = logging.getLogger(__name__)
+
+RF_CATEGORY = "Renda Fixa"
+
+
+def _needs_usd(ticker, category):
+    return category in ("US_STOCKS", "US_REITS") or (category == "CRYPTO" and not ticker.endswith("-BRL"))
+
+
+def business_days(closes):
+    """Closes sampled on weekdays: crypto's weekend rows would give every other asset zero returns."""
+    return closes[closes.index.dayofweek < 5]
+
+
+def load_cdi_daily(dates, fallback_pct=0.0):
+    """
+    Daily CDI (% a.d.) aligned to business-day `dates`, from the SGS 12 history
+    (older observations are downloaded once for the window). The DI only accrues
+    on days it is published, so holidays earn nothing; dates after the last
+    publication repeat it.
+    """
+    from src.indicators_service import IndicatorsService
+    cdi = pd.Series(IndicatorsService().history('cdi', dates[0].strftime('%Y-%m-%d')), dtype=float)
+    if cdi.empty:
+        logger.warning(f"No CDI history available; using {fallback_pct}% a.d. for fixed income.")
+        return np.full(len(dates), fallback_pct)
+    cdi.index = pd.to_datetime(cdi.index)
+    cdi = cdi.sort_index()
+    if dates[0] < cdi.index[0] - pd.Timedelta(days=5):
+        logger.warning(f"CDI history starts on {cdi.index[0]:%Y-%m-%d}; fixed income earns nothing before it.")
+    aligned = cdi.reindex(dates)
+    aligned[dates > cdi.index[-1]] = cdi.iloc[-1]
+    return aligned.fillna(0.0).to_numpy()
+
+
+def category_returns(closes, portfolio_data, cdi_daily, categories, usd_ticker="BRL=X"):
+    """
+    Daily BRL returns per target category (T x C). Each category is the current
+    holdings of that category, weighted by today's value; fixed income earns the CDI.
+    """
+    closes = closes.ffill()
+    returns = closes.pct_change().fillna(0.0)
+    fx = returns[usd_ticker] if usd_ticker in returns else pd.Series(0.0, index=returns.index)
+    last = closes.iloc[-1]
+    usd_rate = last.get(usd_ticker, np.nan)
+    usd_rate = usd_rate if usd_rate > 0 else 1.0
+
+    out = np.zeros((len(returns), len(categories)))
+    missing = []
+    for c, category in enumerate(categories):
+        if category == RF_CATEGORY:
+            out[:, c] = cdi_daily / 100
+            continue
+        members = [
+            item for item in portfolio_data
+            if CATEGORY_MAP.get(item.get('category')) == category and item['ticker'] in returns
+        ]
+        if not members:
+            missing.append(category)
+            continue
+        values = np.array([
+            item['quantity'] * np.nan_to_num(last[item['ticker']]) * (usd_rate if _needs_usd(item['ticker'], item['category']) else 1.0)
+            for item in members
+        ])
+        weights = values / values.sum() if values.sum() > 0 else np.full(len(members), 1 / len(members))
+        for item, weight in zip(members, weights):
+            r = returns[item['ticker']]
+            if _needs_usd(item['ticker'], item['category']):
+                r = (1 + r) * (1 + fx) - 1
+            out[:, c] += weight * r.to_numpy()
+    if missing:
+        logger.warning(f"No price history for categories {missing}; treated as zero-return.")
+    return out
+
+
+# Batches are laid out categories-first (C x P): reductions over the few
+# categories become a handful of contiguous vector adds.
+
+def allocation_pct(holdings):
+    """Totals (P,) and allocation in % (C x P) of a batch of portfolios."""
+    total = holdings.sum(axis=0)
+    scale = np.zeros_like(total)
+    np.divide(100.0, total, out=scale, where=total > 0)
+    return total, holdings * scale
+
+
+def contribution_shares(pct, target_pct, rf_col, rf_caps):
+    """
+    Vectorized PortfolioManager.suggest_contribution: share of the amount for each
+    category below target, proportional to the gap, without fixed income while it
+    is above the cap. Portfolios with no gap get all-zero shares.
+    """
+    gap = target_pct[:, None] - pct
+    np.maximum(gap, 0.0, out=gap)
+    gap[rf_col] *= pct[rf_col] <= rf_caps
+    total_gap = gap.sum(axis=0)
+    scale = np.zeros_like(total_gap)
+    np.divide(1.0, total_gap, out=scale, where=total_gap > 0)
+    gap *= scale
+    return gap
+
+
+def band_breach(pct, target_pct, bands):
+    """Portfolios with any category more than `bands` pp away from target."""
+    drift = pct - target_pct[:, None]
+    np.abs(drift, out=drift)
+    return drift.max(axis=0) > bands
+
+
+def simulate(returns, contribution_days, targets, rf_col, bands, amounts, rf_caps,
+             initial=0.0, cost_bps=0.0, periods_per_year=252):
+    """
+    Replays the report's rules day by day for every parameter set at once.
+    Each array step is (C x P): C categories, P parameter sets. `periods_per_year`
+    is the number of rows per year of the returns calendar, used to annualize.
+
+    - On contribution days, `amount` is split over the categories below target in
+      proportion to the gap, skipping fixed income while it is above `rf_cap`
+      (PortfolioManager.suggest_contribution). With no gap the money stays idle.
+    - Whenever a category drifts more than `band` pp from target, the whole
+      portfolio is rebalanced back to target (get_rebalancing_suggestions),
+      paying `cost_bps` on the traded value.
+    """
+    bands = np.asarray(bands, dtype=float)
+    amounts = np.asarray(amounts, dtype=float)
+    rf_caps = np.asarray(rf_caps, dtype=float)
+    targets = np.asarray(targets, dtype=float)
+    target_pct = targets * 100
+    n_params = len(bands)
+    growth = 1 + np.asarray(returns, dtype=float)[:, :, None]
+
+    holdings = np.tile((targets * initial)[:, None], (1, n_params))
+    idle = np.zeros(n_params)
+    contributed = np.full(n_params, float(initial))
+    rebalances = np.zeros(n_params, dtype=int)
+    costs = np.zeros(n_params)
+
+    nav = np.ones(n_params)
+    peak = np.ones(n_params)
+    max_dd = np.zeros(n_params)
+    sum_r = np.zeros(n_params)
+    sum_r2 = np.zeros(n_params)
+    n_obs = 0
+
+    for t in range(len(growth)):
+        if t > 0:
+            before = holdings.sum(axis=0)
+            holdings *= growth[t]
+            after = holdings.sum(axis=0)
+            invested = before > 0
+            if invested.any():
+                r = np.divide(after, before, out=np.ones(n_params), where=invested) - 1
+                nav *= 1 + r
+                np.maximum(peak, nav, out=peak)
+                np.minimum(max_dd, nav / peak - 1, out=max_dd)
+                sum_r += r
+                sum_r2 += r * r
+                n_obs += 1
+
+        if contribution_days[t]:
+            _, pct = allocation_pct(holdings)
+            share = contribution_shares(pct, target_pct, rf_col, rf_caps)
+            holdings += share * amounts
+            idle += np.where(share.any(axis=0), 0.0, amounts)
+            contributed += amounts
+
+        total, pct = allocation_pct(holdings)
+        breach = band_breach(pct, target_pct, bands) & (total > 0)
+        if breach.any():
+            rebalanced = targets[:, None] * total[breach]
+            traded = np.abs(rebalanced - holdings[:, breach]).sum(axis=0) / 2
+            cost = traded * cost_bps / 10_000
+            holdings[:, breach] = rebalanced * (1 - cost / total[breach])
+            costs[breach] += cost
+            rebalances[breach] += 1
+
+    final_value = holdings.sum(axis=0) + idle
+    years = max(len(growth) - 1, 1) / periods_per_year
+    mean = sum_r / max(n_obs, 1)
+    var = np.maximum(sum_r2 / max(n_obs, 1) - mean ** 2, 0.0)
+    return {
+        'final_value': final_value,
+        'contributed': contributed,
+        'profit': final_value - contributed,
+        'twr_annual_pct': (nav ** (1 / years) - 1) * 100,
+        'volatility_pct': np.sqrt(var * periods_per_year) * 100,
+        'max_drawdown_pct': max_dd * 100,
+        'rebalances': rebalances,
+        'costs': costs,
+        'idle_cash': idle,
+    }
+
+
+def _simulate_chunk(args):
+    returns, contribution_days, targets, rf_col, chunk, initial, cost_bps, periods_per_year = args
+    result = simulate(returns, contribution_days, targets, rf_col, chunk[:, 0], chunk[:, 1], chunk[:, 2],
+                      initial=initial, cost_bps=cost_bps, periods_per_year=periods_per_year)
+    return pd.DataFrame(dict(band_pp=chunk[:, 0], contribution=chunk[:, 1], rf_cap_pct=chunk[:, 2], **result))
+
+
+def run_grid(returns, contribution_days, targets, rf_col, grid, initial=0.0, cost_bps=0.0, max_workers=None,
+             periods_per_year=252):
+    """Splits the (band, contribution, rf_cap) grid into chunks simulated on a process pool."""
+    grid = np.asarray(grid, dtype=float).reshape(-1, 3)
+    max_workers = max(1, min(max_workers or Settings.BACKTEST_MAX_WORKERS, len(grid)))
+    chunks = np.array_split(grid, max_workers)
+    tasks = [
+        (returns, contribution_days, targets, rf_col, chunk, initial, cost_bps, periods_per_year)
+        for chunk in chunks if len(chunk)
+    ]
+    if max_workers == 1:
+        frames = [_simulate_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            frames = list(pool.map(_simulate_chunk, tasks))
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_history(portfolio_data, years, refresh=False):
+    """Closes for the portfolio's priced tickers from the PriceStore, downloading older bars if missing."""
+    tickers = [item['ticker'] for item in portfolio_data if item.get('category') != "RENDA_FIXA"]
+    if any(_needs_usd(item['ticker'], item.get('category')) for item in portfolio_data):
+        tickers.append("BRL=X")
+    tickers = list(dict.fromkeys(tickers))
+    start = (datetime.now() - timedelta(days=int(365.25 * years))).strftime('%Y-%m-%d')
+
+    store = PriceStore(Settings.PRICE_CACHE_PATH)
+    try:
+        coverage = store.coverage(tickers)
+        # 5-day slack for weekends/holidays at the window start
+        slack = (datetime.strptime(start, '%Y-%m-%d') + timedelta(days=5)).strftime('%Y-%m-%d')
+        stale = [t for t in tickers if refresh or t not in coverage or coverage[t][0] > slack]
+        if stale:
+            from src.data_collector import DataCollector
+            logger.info(f"Downloading {years}y of history for {len(stale)} tickers...")
+            closes = DataCollector(portfolio_data)._download_closes(stale, start=start)
+            store.upsert(closes)
+        return store.load_closes(tickers, start=start)
+    finally:
+        store.close()
+
+
+def _parse_list(value):
+    return [float(v) for v in value.split(',') if v.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest the rebalancing and contribution rules")
+    parser.add_argument("--years", type=int, default=Settings.BACKTEST_YEARS)
+    parser.add_argument("--bands", type=_parse_list, default=[Settings.REBALANCE_BAND_PP],
+                        help="Band widths in pp, comma separated")
+    parser.add_argument("--amounts", type=_parse_list, default=[Settings.MONTHLY_CONTRIBUTION],
+                        help="Monthly contributions in R$, comma separated")
+    parser.add_argument("--rf-caps", type=_parse_list, default=[Settings.RF_PRIORITY_CAP_PCT],
+                        help="Fixed income caps in %%, comma separated")
+    parser.add_argument("--initial", type=float, default=0.0, help="Initial capital (R$)")
+    parser.add_argument("--cost-bps", type=float, default=Settings.BACKTEST_COST_BPS)
+    parser.add_argument("--workers", type=int, default=Settings.BACKTEST_MAX_WORKERS)
+    parser.add_argument("--refresh", action="store_true", help="Re-download the price history")
+    parser.add_argument("--output", default=Settings.BACKTEST_OUTPUT_PATH)
+    args = parser.parse_args(argv)
+
+    from src.sheets_manager import SheetsManager
+    portfolio_data = SheetsManager.get_portfolio_from_sheets()
+    if not portfolio_data:
+        logger.error("Failed to load portfolio data. Aborting backtest.")
+        return None
+
+    closes = business_days(load_history(portfolio_data, args.years, refresh=args.refresh))
+    if len(closes) < 2:
+        logger.error("No price history available. Aborting backtest.")
+        return None
+
+    categories = list(Settings.TARGET_ALLOCATION)
+    targets = np.array([Settings.TARGET_ALLOCATION[c] for c in categories])
+    cdi_daily = load_cdi_daily(closes.index)
+    returns = category_returns(closes, portfolio_data, cdi_daily, categories)
+    months = closes.index.to_period('M')
+    contribution_days = np.r_[True, months[1:] != months[:-1]]
+    span_years = (closes.index[-1] - closes.index[0]).days / 365.25
+    periods_per_year = (len(closes) - 1) / span_years if span_years > 0 else 252
+
+    grid = list(itertools.product(args.bands, args.amounts, args.rf_caps))
+    logger.info(f"Backtesting {len(grid)} parameter sets over {len(closes)} days "
+                f"({closes.index[0]:%Y-%m-%d} to {closes.index[-1]:%Y-%m-%d})...")
+    results = run_grid(returns, contribution_days, targets, categories.index(RF_CATEGORY), grid,
+                       initial=args.initial, cost_bps=args.cost_bps, max_workers=args.workers,
+                       periods_per_year=periods_per_year)
+    results = results.sort_values('final_value', ascending=False)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    results.to_csv(args.output, index=False)
+    logger.info(f"Backtest results saved to {args.output}")
+    print(results.head(10).to_string(index=False))
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    main()
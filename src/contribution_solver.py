@@ -0,0 +1,124 @@
+import logging
+import numpy as np
+import pandas as pd
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+
+def lot_step(ticker, category):
+    """Smallest quantity that can be bought: B3 lots, fractional F tickers, crypto decimals, RF in reais."""
+    if category == "RENDA_FIXA":
+        return Settings.RF_STEP_BRL
+    if category == "CRYPTO":
+        return 10.0 ** -Settings.CRYPTO_DECIMALS
+    if category in ("US_STOCKS", "US_REITS"):
+        return 10.0 ** -Settings.US_FRACTIONAL_DECIMALS
+    if ticker.endswith(".SA"):
+        symbol = ticker[:-3]
+        # Ações no lote padrão (ex.: PETR4) também podem ser compradas no fracionário (PETR4F)
+        if category == "BR_STOCKS" and not symbol.endswith("F") and not Settings.B3_FRACTIONAL:
+            return Settings.B3_STANDARD_LOT
+    return 1.0
+
+
+def _water_fill(deficit, budget):
+    """
+    Continuous optimum of min sum (d_i + y_i)^2 with sum y_i = budget, y_i >= 0:
+    raises the most underweight assets to a common level.
+    """
+    order = np.sort(deficit)
+    cumulative = np.cumsum(order)
+    n = np.arange(1, len(order) + 1)
+    levels = (budget + cumulative) / n
+    # Último k em que o nível fica acima do k-ésimo desvio
+    k = np.nonzero(levels >= order)[0][-1]
+    return np.maximum(levels[k] - deficit, 0.0)
+
+
+def _local_search(deviation, lot_cost, lots, remaining, max_passes):
+    """
+    Improves an integer solution with lot moves until none helps: add lots (the leftover
+    cash water-filled over the affordable assets, each capped where it is closest to
+    target; one lot of the best asset when that buys nothing) or swap one bought lot
+    of asset i for one lot of asset j.
+    """
+    for _ in range(max_passes):
+        add_gain = lot_cost * (2 * deviation + lot_cost)
+        remove_gain = np.where(lots > 0, lot_cost * (lot_cost - 2 * deviation), np.inf)
+
+        affordable = lot_cost <= remaining + 1e-9
+        best_add = np.argmin(np.where(affordable, add_gain, np.inf))
+        add_value = add_gain[best_add] if affordable[best_add] else np.inf
+
+        # swap[i, j]: take one lot from i, buy one lot of j (i != j)
+        swap = remove_gain[:, None] + add_gain[None, :]
+        feasible = lot_cost[None, :] - lot_cost[:, None] <= remaining + 1e-9
+        np.fill_diagonal(feasible, False)
+        swap = np.where(feasible, swap, np.inf)
+        i, j = np.unravel_index(np.argmin(swap), swap.shape)
+        swap_value = swap[i, j]
+
+        if min(add_value, swap_value) >= -1e-9:
+            break
+        if add_value <= swap_value:
+            # Reparte o caixa entre os ativos que cabem, sem passar do ponto mais próximo da meta:
+            # lotes pequenos (cripto, RF) recebem muitos lotes num passo só
+            added = np.zeros_like(lots)
+            added[affordable] = np.minimum(
+                np.floor(_water_fill(deviation[affordable], remaining) / lot_cost[affordable] + 1e-9),
+                np.maximum(np.round(-deviation[affordable] / lot_cost[affordable]), 0.0))
+            if not added.any():
+                added[best_add] = 1
+            lots += added
+            deviation += added * lot_cost
+            remaining -= float(np.sum(added * lot_cost))
+        else:
+            lots[i] -= 1
+            lots[j] += 1
+            deviation[i] -= lot_cost[i]
+            deviation[j] += lot_cost[j]
+            remaining += lot_cost[i] - lot_cost[j]
+    return lots, remaining
+
+
+def solve_contribution(assets, budget, max_passes=None):
+    """
+    Buy quantities per asset for `budget` (BRL), given `assets` with ticker, category,
+    value_brl, unit_price_brl and target_pct (sheet Meta). Minimizes the squared distance
+    from the target values after the contribution, buying only whole lots and never
+    spending more than the budget.
+
+    Water-filling gives the continuous optimum, which is rounded down to lots; a
+    greedy/swap local search then spends the leftover cash.
+    Returns (orders DataFrame, leftover cash).
+    """
+    max_passes = max_passes or Settings.SOLVER_MAX_PASSES
+    columns = ["ticker", "category", "quantity", "unit_price_brl", "cost_brl"]
+    assets = assets[(assets['target_pct'] > 0) & (assets['unit_price_brl'] > 0)].reset_index(drop=True)
+    if assets.empty or budget <= 0:
+        return pd.DataFrame(columns=columns), budget
+
+    total_after = assets['value_brl'].sum() + budget
+    targets = assets['target_pct'].to_numpy() / assets['target_pct'].sum()
+    deviation = assets['value_brl'].to_numpy() - targets * total_after
+
+    step = np.array([lot_step(t, c) for t, c in zip(assets['ticker'], assets['category'])])
+    lot_cost = step * assets['unit_price_brl'].to_numpy()
+
+    ideal = _water_fill(deviation, budget)
+    lots = np.floor(ideal / lot_cost + 1e-9)
+    deviation = deviation + lots * lot_cost
+    remaining = budget - float(np.sum(lots * lot_cost))
+    lots, remaining = _local_search(deviation, lot_cost, lots, remaining, max_passes)
+
+    bought = lots > 0
+    quantity = lots[bought] * step[bought]
+    orders = pd.DataFrame({
+        "ticker": assets.loc[bought, 'ticker'].to_numpy(),
+        "category": assets.loc[bought, 'category'].to_numpy(),
+        "quantity": quantity,
+        "unit_price_brl": assets.loc[bought, 'unit_price_brl'].to_numpy(),
+        "cost_brl": lots[bought] * lot_cost[bought],
+    }, columns=columns)
+    return orders.sort_values('cost_brl', ascending=False, ignore_index=True), max(remaining, 0.0)
@@ -3,9 +3,16 @@ import pandas as pd
 import json
 import logging
 import requests
-from datetime import datetime
-from bcb import sgs, currency
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
 from config.settings import Settings
+from src.rate_limiter import TokenBucket
+from src.price_store import PriceStore
+from src.fundamentals_cache import FundamentalsCache
+from src.indicators_service import IndicatorsService
+from src.metrics import metrics
+from src.price_panel import PricePanel
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +20,8 @@ class DataCollector:
     def __init__(self, portfolio_data):
         self.portfolio_data = portfolio_data
         self.tickers = [item['ticker'] for item in self.portfolio_data]
+        # Filled by get_market_data: 1y closes as a float32 PricePanel
+        self.price_panel = PricePanel.from_frame(None)
         
         # Check if we need USD conversion
         has_international = any(
@@ -25,20 +34,32 @@ class DataCollector:
         if has_international and "BRL=X" not in self.tickers:
             self.tickers.append("BRL=X")
 
+        # Benchmark for beta in the risk metrics
+        if Settings.RISK_BENCHMARK and Settings.RISK_BENCHMARK not in self.tickers:
+            self.tickers.append(Settings.RISK_BENCHMARK)
+
     def get_market_data(self):
         """Fetches prices, variations, and fundamentals for all assets."""
         logger.info("Fetching market data for tickers: %s", self.tickers)
         results = {}
 
         indicators = self.get_economic_indicators()
-        cdi_diario = (indicators.get('cdi', 0.11) / 100) / 252
+        cdi_diario = indicators.get('cdi_diario', 0.0) # % a.d.
         
+        # 1y close panel from the local price store, fetching only the missing bars
+        price_panel = self._load_price_panel(
+            [t for t in self.tickers if not self._is_renda_fixa(t)]
+        )
+        self.price_panel = PricePanel.from_frame(price_panel)
+        logger.info(f"Price panel: {len(self.price_panel)} tickers x {len(self.price_panel.dates)} days "
+                    f"({self.price_panel.nbytes / 1024:.0f} KiB)")
+
         for ticker in self.tickers:
             # Mock Logic for Renda Fixa
-            if ticker == "RDB-NUBANK" or ticker.startswith("RDB"):
+            if self._is_renda_fixa(ticker):
                 results[ticker] = {
                     "price": 1.0, 
-                    "change_1d": cdi_diario * 100, 
+                    "change_1d": cdi_diario, 
                     "change_12m": indicators.get('cdi', 11.0),
                     "dy_12m": 0.0,
                     "p_vp": 1.0,
@@ -52,90 +73,31 @@ class DataCollector:
 
             try:
                 logger.info(f"Processing {ticker}...")
-                # Removed custom session to fix ValueError with yfinance
-                stock = yf.Ticker(ticker)
                 
-                # Get history for price and variation
-                try:
-                    hist = stock.history(period="1y")
-                except Exception as e:
-                    logger.warning(f"Failed to fetch history for {ticker}: {e}")
-                    hist = pd.DataFrame()
+                if ticker in price_panel.columns:
+                    closes = price_panel[ticker].dropna()
+                else:
+                    closes = pd.Series(dtype=float)
                 
-                if not hist.empty:
-                    current_price = hist['Close'].iloc[-1]
-                    
-                    # 1D Variation
-                    if len(hist) >= 2:
-                        prev_close = hist['Close'].iloc[-2]
-                        change_1d = ((current_price - prev_close) / prev_close) * 100
-                    else:
-                        change_1d = 0.0
-                        
-                    # 12M Variation
-                    if len(hist) > 0:
-                        price_12m_ago = hist['Close'].iloc[0]
-                        change_12m = ((current_price - price_12m_ago) / price_12m_ago) * 100
-                    else:
-                        change_12m = 0.0
+                if not closes.empty:
+                    current_price, change_1d, change_12m = self._price_changes(closes)
                 else:
-                    # Fallback: Try fast_info if history fails
+                    # Fallback: Try fast_info only for tickers missing from the batch
                     logger.info(f"History empty for {ticker}, trying fast_info...")
-                    current_price = stock.fast_info.get('last_price', 0.0)
+                    metrics.incr("fallback.fast_info")
+                    with metrics.span("fetch.fast_info", ticker=ticker):
+                        # Removed custom session to fix ValueError with yfinance
+                        current_price = yf.Ticker(ticker).fast_info.get('last_price', 0.0)
                     change_1d = 0.0
                     change_12m = 0.0
 
                 if ticker == "BRL=X":
                     logger.info(f"💵 Cotação Dólar (BRL=X): R$ {current_price:.4f}")
 
-                # Fundamentals
-                try:
-                    info = stock.info
-                    
-                    # Dividend Yield
-                    dy = info.get('dividendYield', 0)
-                    if dy is None: dy = 0
-                    dy = dy * 100 # Convert to percentage
-                    
-                    # Price to Book
-                    p_vp = info.get('priceToBook', 0)
-                    if p_vp is None: p_vp = 0
-                    
-                    # P/E Ratio
-                    pe = info.get('trailingPE', 0)
-                    if pe is None: pe = 0
-                    
-                    # ROE
-                    roe = info.get('returnOnEquity', 0)
-                    if roe is None: roe = 0
-                    roe = roe * 100
-                    
-                    # Sector & Recommendation
-                    sector = info.get('sector', 'Unknown')
-                    recommendation = info.get('recommendationKey', 'None')
-                    
-                    name = info.get('shortName', ticker)
-                except Exception as e:
-                    logger.warning(f"Could not fetch info for {ticker}: {e}")
-                    dy = 0
-                    p_vp = 0
-                    pe = 0
-                    roe = 0
-                    sector = "Unknown"
-                    recommendation = "None"
-                    name = ticker
-
                 results[ticker] = {
                     "price": current_price,
                     "change_1d": change_1d,
-                    "change_12m": change_12m,
-                    "dy_12m": dy,
-                    "p_vp": p_vp,
-                    "pe": pe,
-                    "roe": roe,
-                    "sector": sector,
-                    "recommendation": recommendation,
-                    "name": name
+                    "change_12m": change_12m
                 }
                 
             except Exception as e:
@@ -146,45 +108,259 @@ class DataCollector:
                     "sector": "Unknown", "recommendation": "None", "name": ticker
                 }
 
-        return results
+        # Fundamentals (stock.info) on a bounded, rate-limited worker pool
+        pending = [t for t, data in results.items() if 'name' not in data]
+        fundamentals = self._fetch_all_fundamentals(pending)
+        for ticker in pending:
+            results[ticker].update(fundamentals[ticker])
 
-    def get_economic_indicators(self):
-        """Fetches Selic, CDI, and PTAX using python-bcb."""
-        indicators = {}
-        
-        try:
-            # Selic Meta (432)
-            selic_series = sgs.get({'selic': 432}, last=1)
-            indicators['selic_meta'] = float(selic_series['selic'].iloc[-1])
-        except Exception as e:
-            logger.error(f"Error fetching Selic via BCB: {e}")
-            indicators['selic_meta'] = 0.0
+        return results
 
-        try:
-            # CDI (12) - Taxa DI % a.a.
-            # Using Selic as proxy for CDI if we can't find the exact annualized CDI series easily, 
-            # but usually CDI follows Selic Over.
-            indicators['cdi'] = indicators['selic_meta'] - 0.10
-        except Exception:
-            indicators['cdi'] = 0.0
+    @staticmethod
+    def _default_fundamentals(ticker):
+        return {
+            "dy_12m": 0, "p_vp": 0, "pe": 0, "roe": 0,
+            "sector": "Unknown", "recommendation": "None", "name": ticker
+        }
 
+    def _fetch_fundamentals(self, ticker):
+        """Fetches stock.info for one ticker. Returns None on failure."""
         try:
-            # PTAX (USD)
-            from datetime import timedelta # Certifique-se de importar timedelta no topo ou aqui
+            with metrics.span("fetch.info", ticker=ticker):
+                info = yf.Ticker(ticker).info
+            if not info:
+                raise ValueError("empty info")
             
-            today = datetime.now()
-            start_date = (today - timedelta(days=5)).strftime('%Y-%m-%d')
-            end_date = today.strftime('%Y-%m-%d')
+            # Dividend Yield
+            dy = info.get('dividendYield', 0)
+            if dy is None: dy = 0
+            dy = dy * 100 # Convert to percentage
             
-            # Pega o intervalo dos últimos 5 dias para garantir que pegue o último dia útil
-            ptax = currency.get('USD', start=start_date, end=end_date)
+            # Price to Book
+            p_vp = info.get('priceToBook', 0)
+            if p_vp is None: p_vp = 0
             
-            if not ptax.empty:
-                indicators['ptax_venda'] = ptax['USD'].iloc[-1]
-            else:
-                indicators['ptax_venda'] = 0.0
+            # P/E Ratio
+            pe = info.get('trailingPE', 0)
+            if pe is None: pe = 0
+            
+            # ROE
+            roe = info.get('returnOnEquity', 0)
+            if roe is None: roe = 0
+            roe = roe * 100
+            
+            return {
+                "dy_12m": dy,
+                "p_vp": p_vp,
+                "pe": pe,
+                "roe": roe,
+                # Sector & Recommendation
+                "sector": info.get('sector', 'Unknown'),
+                "recommendation": info.get('recommendationKey', 'None'),
+                "name": info.get('shortName', ticker)
+            }
         except Exception as e:
-            logger.error(f"Error fetching PTAX via BCB: {e}")
-            indicators['ptax_venda'] = 0.0
+            logger.warning(f"Could not fetch info for {ticker}: {e}")
+            return None
+
+    def _fetch_all_fundamentals(self, tickers):
+        """
+        Runs _fetch_fundamentals concurrently (Settings.FUNDAMENTALS_MAX_WORKERS),
+        throttled by a token bucket. Fresh entries come from the FundamentalsCache and a
+        fetch only replaces the fields whose TTL expired. A ticker that fails, is still
+        running after Settings.FUNDAMENTALS_TIMEOUT seconds, or hasn't finished when
+        Settings.FUNDAMENTALS_STAGE_TIMEOUT expires (e.g. queued behind hung workers)
+        gets its stale cached values, or the defaults.
+        """
+        results = {}
+        if not tickers:
+            return results
+
+        cache = FundamentalsCache(
+            Settings.FUNDAMENTALS_CACHE_PATH,
+            Settings.FUNDAMENTALS_TTL,
+            max_entries=Settings.FUNDAMENTALS_CACHE_SIZE
+        )
+        to_fetch = []
+        for ticker in tickers:
+            cached = cache.get(ticker)
+            if cached is not None:
+                results[ticker] = cached
+            else:
+                to_fetch.append(ticker)
+
+        def fallback(ticker):
+            stale = cache.get_stale(ticker)
+            if stale is not None:
+                logger.warning(f"Using stale cached fundamentals for {ticker}")
+                metrics.incr("fallback.fundamentals_stale")
+                return dict(stale, **cache.get_fresh(ticker))
+            metrics.incr("fallback.fundamentals_default")
+            return self._default_fundamentals(ticker)
+
+        limiter = TokenBucket(Settings.FUNDAMENTALS_RATE_LIMIT, Settings.FUNDAMENTALS_BURST)
+        timeout = Settings.FUNDAMENTALS_TIMEOUT
+        started_at = {}
+        stage_deadline = time.monotonic() + Settings.FUNDAMENTALS_STAGE_TIMEOUT
+
+        def task(ticker):
+            limiter.acquire()
+            started_at[ticker] = time.monotonic()
+            fields = self._fetch_fundamentals(ticker)
+            if fields is None:
+                return fallback(ticker)
+            # Campos ainda válidos (ex.: nome, setor) ficam com o valor e o carimbo do cache
+            fresh = cache.get_fresh(ticker)
+            cache.put(ticker, {field: value for field, value in fields.items() if field not in fresh})
+            return dict(fields, **fresh)
+
+        executor = ThreadPoolExecutor(max_workers=max(1, Settings.FUNDAMENTALS_MAX_WORKERS))
+        try:
+            futures = {executor.submit(task, ticker): ticker for ticker in to_fetch}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[futures[future]] = future.result()
 
-        return indicators
+                now = time.monotonic()
+                if now > stage_deadline:
+                    # Workers travados: os tickers ainda na fila nunca começariam
+                    logger.warning(f"Fundamentals stage timed out with {len(pending)} tickers pending")
+                    for future in pending:
+                        results[futures[future]] = fallback(futures[future])
+                    break
+                for future in list(pending):
+                    ticker = futures[future]
+                    start = started_at.get(ticker)
+                    if start is not None and now - start > timeout:
+                        logger.warning(f"Timeout fetching info for {ticker} after {timeout}s")
+                        results[ticker] = fallback(ticker)
+                        pending.discard(future)
+        finally:
+            # Don't block the job on workers stuck past their timeout
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        cache.save()
+        stats = cache.stats()
+        for key, value in stats.items():
+            metrics.incr(f"cache.fundamentals.{key}", value)
+        logger.info(f"Fundamentals cache: {stats['hits']} hits, {stats['misses']} misses, {stats['stale']} stale.")
+        return results
+
+    @staticmethod
+    def _is_renda_fixa(ticker):
+        return ticker == "RDB-NUBANK" or ticker.startswith("RDB")
+
+    def _load_price_panel(self, tickers):
+        """
+        Returns the 1y close panel (dates x tickers) backed by the local PriceStore.
+        Cached tickers only download bars from their previous cached date on; that
+        overlap bar is compared with the cache and, if it was revised (split or
+        adjusted-close change), the ticker is invalidated and fully refetched.
+        """
+        today = datetime.now()
+        window_start = (today - timedelta(days=365)).strftime('%Y-%m-%d')
+        coverage_limit = (today - timedelta(days=365 - 7)).strftime('%Y-%m-%d')
+        stale_limit = (today - timedelta(days=Settings.PRICE_CACHE_MAX_GAP_DAYS)).strftime('%Y-%m-%d')
+
+        store = PriceStore(Settings.PRICE_CACHE_PATH)
+        try:
+            coverage = store.coverage(tickers)
+            full_fetch = []
+            delta_groups = {}
+            for ticker in tickers:
+                if ticker not in coverage:
+                    full_fetch.append(ticker)
+                    continue
+                first, prev, last = coverage[ticker]
+                # Cache doesn't reach back to the 1y window or is too old to patch
+                if first > coverage_limit or last < stale_limit:
+                    full_fetch.append(ticker)
+                else:
+                    delta_groups.setdefault(prev, []).append(ticker)
+
+            for start, group in delta_groups.items():
+                fresh = self._download_closes(group, start=start)
+                revised = []
+                for ticker in group:
+                    if ticker not in fresh.columns:
+                        continue
+                    series = fresh[ticker].dropna()
+                    series.index = pd.DatetimeIndex(series.index).strftime('%Y-%m-%d')
+                    cached = store.get_close(ticker, start)
+                    if start not in series.index or cached is None or \
+                            abs(series[start] - cached) > abs(cached) * 1e-4:
+                        revised.append(ticker)
+
+                if revised:
+                    logger.info(f"Price history revised for {revised}, invalidating cache.")
+                    metrics.incr("cache.prices.revised", len(revised))
+                    store.drop(revised)
+                    full_fetch.extend(revised)
+                store.upsert(fresh.drop(columns=revised, errors='ignore'))
+
+            if full_fetch:
+                store.drop(full_fetch)
+                store.upsert(self._download_closes(full_fetch, period="1y"))
+
+            logger.info(f"Price cache: {len(tickers) - len(full_fetch)} delta, {len(full_fetch)} full fetches.")
+            metrics.incr("cache.prices.delta", len(tickers) - len(full_fetch))
+            metrics.incr("cache.prices.full", len(full_fetch))
+            return store.load_closes(tickers, start=window_start)
+        finally:
+            store.close()
+
+    def _download_closes(self, tickers, **kwargs):
+        """Downloads a close panel (dates x tickers) in chunked batch requests."""
+        frames = []
+        chunk_size = max(1, Settings.PRICE_BATCH_SIZE)
+        for i in range(0, len(tickers), chunk_size):
+            chunk = tickers[i:i + chunk_size]
+            try:
+                with metrics.span("fetch.prices"):
+                    data = yf.download(
+                        chunk,
+                        auto_adjust=True,
+                        group_by="column",
+                        progress=False,
+                        threads=True,
+                        **kwargs
+                    )
+            except Exception as e:
+                logger.warning(f"Batch download failed for {chunk}: {e}")
+                continue
+
+            if data is None or data.empty or 'Close' not in data:
+                continue
+
+            closes = data['Close']
+            if isinstance(closes, pd.Series):
+                closes = closes.to_frame(name=chunk[0])
+            frames.append(closes)
+
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1)
+
+    @staticmethod
+    def _price_changes(closes):
+        """Derives (price, change_1d, change_12m) from a 1y close series."""
+        current_price = closes.iloc[-1]
+
+        # 1D Variation
+        if len(closes) >= 2:
+            prev_close = closes.iloc[-2]
+            change_1d = ((current_price - prev_close) / prev_close) * 100
+        else:
+            change_1d = 0.0
+
+        # 12M Variation
+        price_12m_ago = closes.iloc[0]
+        change_12m = ((current_price - price_12m_ago) / price_12m_ago) * 100
+
+        return current_price, change_1d, change_12m
+
+    def get_economic_indicators(self):
+        """Fetches Selic, CDI, and PTAX using python-bcb (memoized for the run)."""
+        return IndicatorsService().get()
@@ -0,0 +1,94 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class FundamentalsCache:
+    """
+    LRU cache for stock.info fundamentals with per-field TTLs, persisted as JSON.
+    Each field keeps its own timestamp: fields within their TTL are served from the
+    cache and a fetch only refreshes the expired ones. Expired values are kept so they
+    can be served (marked stale) when the network fails.
+    """
+
+    def __init__(self, path, ttl, max_entries=500, default_ttl=86400):
+        self.path = path
+        self.ttl = ttl
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    self.entries = OrderedDict(json.load(f))
+        except Exception as e:
+            logger.warning(f"Failed to load fundamentals cache: {e}")
+            self.entries = OrderedDict()
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with self.lock:
+                data = json.dumps(self.entries)
+            with open(self.path, 'w') as f:
+                f.write(data)
+        except Exception as e:
+            logger.warning(f"Failed to save fundamentals cache: {e}")
+
+    def _fresh_fields(self, entry, now):
+        return {
+            field: value for field, value in entry['fields'].items()
+            if now - entry['fetched_at'].get(field, 0) < self.ttl.get(field, self.default_ttl)
+        }
+
+    def get(self, ticker):
+        """Returns the cached fields if every field is within its TTL, else None."""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(ticker)
+            if entry and len(self._fresh_fields(entry, now)) == len(entry['fields']):
+                self.entries.move_to_end(ticker)
+                self.hits += 1
+                return dict(entry['fields'])
+            self.misses += 1
+            return None
+
+    def get_fresh(self, ticker):
+        """Returns only the fields still within their TTL (possibly empty)."""
+        with self.lock:
+            entry = self.entries.get(ticker)
+            return self._fresh_fields(entry, time.time()) if entry else {}
+
+    def get_stale(self, ticker):
+        """Returns the last known fields (flagged with stale=True) regardless of TTL."""
+        with self.lock:
+            entry = self.entries.get(ticker)
+            if not entry:
+                return None
+            self.stale += 1
+            return dict(entry['fields'], stale=True)
+
+    def put(self, ticker, fields):
+        """Stores `fields` (stamped now) over the entry's other fields, which keep their timestamps."""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.setdefault(ticker, {'fields': {}, 'fetched_at': {}})
+            entry['fields'].update(fields)
+            entry['fetched_at'].update({field: now for field in fields})
+            self.entries.move_to_end(ticker)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "stale": self.stale}
@@ -0,0 +1,101 @@
+import os
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+class HistoryStore:
+    """
+    Daily portfolio value history as an append-only, date-sorted JSON lines file.
+    Only the tail of the file is read or written on a normal run, so lookups of the
+    previous entry are O(1) and each daily update touches a single line.
+    """
+
+    def __init__(self, path="data/history.jsonl", legacy_path="data/history.json"):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if not os.path.exists(path) and legacy_path and os.path.exists(legacy_path):
+            self.import_json(legacy_path)
+
+    def _tail(self, n=2):
+        """Returns the last n lines as [(offset, entry)], oldest first."""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            pos = end
+            buffer = b""
+            while pos > 0 and buffer.count(b"\n") <= n:
+                step = min(4096, pos)
+                pos -= step
+                f.seek(pos)
+                buffer = f.read(step) + buffer
+
+        lines = buffer.split(b"\n")
+        offsets = []
+        offset = pos
+        for line in lines:
+            offsets.append(offset)
+            offset += len(line) + 1
+
+        tail = [(off, line) for off, line in zip(offsets, lines) if line.strip()]
+        # A primeira linha do buffer pode estar incompleta
+        if pos > 0 and tail and tail[0][0] == pos:
+            tail = tail[1:]
+        return [(off, json.loads(line)) for off, line in tail[-n:]]
+
+    def last_before(self, date):
+        """Most recent entry dated strictly before `date` (dates are 'YYYY-MM-DD')."""
+        for _, entry in reversed(self._tail(2)):
+            if entry['date'] < date:
+                return entry
+        return None
+
+    def upsert(self, date, value):
+        """Appends today's value, or rewrites only the last line if it is already today's."""
+        line = json.dumps({"date": date, "value": value}) + "\n"
+        tail = self._tail(1)
+
+        if tail and tail[0][1]['date'] == date:
+            with open(self.path, 'r+b') as f:
+                f.truncate(tail[0][0])
+                f.seek(0, os.SEEK_END)
+                f.write(line.encode())
+        elif not tail or tail[0][1]['date'] < date:
+            with open(self.path, 'a+b') as f:
+                # Última linha sem "\n" (editada à mão ou gravação interrompida): fecha antes de anexar
+                f.seek(0, os.SEEK_END)
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        line = "\n" + line
+                f.write(line.encode())
+        else:
+            # Data fora de ordem: reescreve o arquivo (caso raro)
+            history = {entry['date']: entry['value'] for entry in self.load_all()}
+            history[date] = value
+            self._write_all(history)
+
+    def load_all(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'r') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _write_all(self, history):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            for date in sorted(history):
+                f.write(json.dumps({"date": date, "value": history[date]}) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def import_json(self, legacy_path):
+        """One-time import of the legacy history.json (list of {date, value})."""
+        try:
+            with open(legacy_path, 'r') as f:
+                entries = json.load(f)
+            self._write_all({entry['date']: entry['value'] for entry in entries})
+            logger.info(f"Imported {len(entries)} entries from {legacy_path} into {self.path}")
+        except Exception as e:
+            logger.error(f"Failed to import {legacy_path}: {e}")
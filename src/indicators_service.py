@@ -0,0 +1,175 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from bcb import sgs, currency
+from config.settings import Settings
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# SGS series stored locally: Selic Meta (432, % a.a.) and CDI (12, % a.d.)
+SGS_SERIES = {'selic': 432, 'cdi': 12}
+
+class IndicatorsService:
+    """
+    Selic, CDI and PTAX from BCB, memoized for the whole run. The SGS and PTAX
+    series are kept in a local JSON store so each run only appends new observations.
+    """
+
+    _memo = {}
+    _lock = threading.Lock()
+
+    def __init__(self, path=None):
+        self.path = path or Settings.INDICATORS_STORE_PATH
+
+    def get(self):
+        """Returns the indicators dict, fetching from BCB at most once per day and process."""
+        today = datetime.now().strftime('%Y-%m-%d')
+        with self._lock:
+            if today not in self._memo:
+                self._memo.clear()
+                self._memo[today] = self._compute()
+            return dict(self._memo[today])
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._memo.clear()
+
+    def history(self, name, start):
+        """
+        Stored daily series ('selic', 'cdi' or 'ptax') as {'YYYY-MM-DD': value} from
+        `start` on. When the store doesn't reach back that far, the missing older
+        range is downloaded from BCB once and appended to it.
+        """
+        with self._lock:
+            store = self._load_store()
+            series = store.setdefault('ptax', {}) if name == 'ptax' else \
+                store.setdefault('sgs', {}).setdefault(name, {})
+            # 5 dias de folga para fins de semana/feriados no início da janela
+            slack = (datetime.strptime(start, '%Y-%m-%d') + timedelta(days=5)).strftime('%Y-%m-%d')
+            if not series or min(series) > slack:
+                end = min(series) if series else datetime.now().strftime('%Y-%m-%d')
+                try:
+                    with metrics.span("fetch.bcb_history", series=name):
+                        series.update(self._download(name, start, end))
+                    self._save_store(store)
+                except Exception as e:
+                    logger.error(f"Error downloading {name} history since {start} via BCB: {e}")
+            return {date: value for date, value in series.items() if date >= start}
+
+    @staticmethod
+    def _download(name, start, end):
+        """Daily observations of one series in windows of up to 5 years (SGS caps daily queries at 10)."""
+        observations = {}
+        window_start = datetime.strptime(start, '%Y-%m-%d')
+        last = datetime.strptime(end, '%Y-%m-%d')
+        while window_start <= last:
+            window_end = min(window_start + timedelta(days=5 * 365), last)
+            window = dict(start=window_start.strftime('%Y-%m-%d'), end=window_end.strftime('%Y-%m-%d'))
+            if name == 'ptax':
+                df = currency.get('USD', **window)
+                values = None if df.empty else df['USD']
+            else:
+                values = sgs.get({name: SGS_SERIES[name]}, **window).get(name)
+            if values is not None:
+                for date, value in values.dropna().items():
+                    observations[date.strftime('%Y-%m-%d')] = float(value)
+            window_start = window_end + timedelta(days=1)
+        return observations
+
+    def _load_store(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load indicators store: {e}")
+        return {}
+
+    def _save_store(self, store):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, 'w') as f:
+                json.dump(store, f)
+        except Exception as e:
+            logger.error(f"Failed to save indicators store: {e}")
+
+    @staticmethod
+    def _start_date(series, today):
+        """Re-requests from the last stored observation (or a fresh window if empty)."""
+        if series:
+            return max(series)
+        return (today - timedelta(days=Settings.INDICATORS_HISTORY_DAYS)).strftime('%Y-%m-%d')
+
+    def _update_sgs(self, store, today):
+        sgs_store = store.setdefault('sgs', {})
+        for name in SGS_SERIES:
+            sgs_store.setdefault(name, {})
+
+        start = min(self._start_date(sgs_store[name], today) for name in SGS_SERIES)
+        # Uma única chamada para todas as séries SGS
+        df = sgs.get(SGS_SERIES, start=start, end=today.strftime('%Y-%m-%d'))
+        for name in SGS_SERIES:
+            if name not in df:
+                continue
+            for date, value in df[name].dropna().items():
+                sgs_store[name][date.strftime('%Y-%m-%d')] = float(value)
+
+    def _update_ptax(self, store, today):
+        ptax_store = store.setdefault('ptax', {})
+        start = self._start_date(ptax_store, today)
+        if not ptax_store:
+            # Pega ao menos os últimos 5 dias para garantir o último dia útil
+            start = min(start, (today - timedelta(days=5)).strftime('%Y-%m-%d'))
+        ptax = currency.get('USD', start=start, end=today.strftime('%Y-%m-%d'))
+        if not ptax.empty:
+            for date, value in ptax['USD'].dropna().items():
+                ptax_store[date.strftime('%Y-%m-%d')] = float(value)
+
+    @staticmethod
+    def _last(series):
+        return series[max(series)] if series else None
+
+    def _compute(self):
+        today = datetime.now()
+        store = self._load_store()
+
+        try:
+            with metrics.span("fetch.bcb_sgs"):
+                self._update_sgs(store, today)
+        except Exception as e:
+            logger.error(f"Error fetching SGS series via BCB: {e}")
+            metrics.incr("error.bcb")
+
+        try:
+            with metrics.span("fetch.bcb_ptax"):
+                self._update_ptax(store, today)
+        except Exception as e:
+            logger.error(f"Error fetching PTAX via BCB: {e}")
+            metrics.incr("error.bcb")
+
+        self._save_store(store)
+
+        indicators = {}
+        sgs_store = store.get('sgs', {})
+
+        selic = self._last(sgs_store.get('selic', {}))
+        indicators['selic_meta'] = selic if selic is not None else 0.0
+
+        cdi_diario = self._last(sgs_store.get('cdi', {}))
+        if cdi_diario is not None:
+            # SGS 12 é a taxa DI diária (% a.d.); anualiza por 252 dias úteis
+            indicators['cdi_diario'] = cdi_diario
+            indicators['cdi'] = round(((1 + cdi_diario / 100) ** 252 - 1) * 100, 2)
+        else:
+            # Fallback: Selic como proxy do CDI
+            indicators['cdi'] = indicators['selic_meta'] - 0.10 if selic is not None else 0.0
+            indicators['cdi_diario'] = ((1 + indicators['cdi'] / 100) ** (1 / 252) - 1) * 100
+
+        ptax = self._last(store.get('ptax', {}))
+        indicators['ptax_venda'] = ptax if ptax is not None else 0.0
+
+        return indicators
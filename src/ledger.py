@@ -0,0 +1,201 @@
+import os
+import json
+import hashlib
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BUY_TYPES = {"COMPRA", "C", "BUY"}
+SELL_TYPES = {"VENDA", "V", "SELL"}
+INCOME_TYPES = {"DIVIDENDO", "DIVIDENDOS", "JCP", "RENDIMENTO", "RENDIMENTOS", "PROVENTO", "DIV"}
+
+
+class Ledger:
+    """
+    FIFO cost basis per ticker (in BRL) built from the transactions tab.
+
+    The checkpoint file keeps the open lots, realized P/L and dividends together
+    with how many rows were processed, a hash of those rows and the last trade
+    date applied. When the sheet only gained rows at the end, a run processes just
+    the new ones; any edit to already processed rows, or a new row dated before
+    the last applied trade, triggers a full rebuild.
+    """
+
+    def __init__(self, state_path="data/cache/ledger.json"):
+        self.state_path = state_path
+        self.state = self._load_state()
+
+    @staticmethod
+    def _empty_state():
+        return {"rows": 0, "prefix_hash": None, "last_date": None, "positions": {}}
+
+    def _load_state(self):
+        try:
+            if os.path.exists(self.state_path):
+                with open(self.state_path, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load ledger checkpoint: {e}")
+        return self._empty_state()
+
+    def _save_state(self):
+        try:
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+            tmp_path = self.state_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.state, f)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            logger.error(f"Failed to save ledger checkpoint: {e}")
+
+    @staticmethod
+    def _split_rows(content):
+        lines = content.replace(b"\r\n", b"\n").split(b"\n")
+        return lines[0], [line for line in lines[1:] if line.strip()]
+
+    @staticmethod
+    def _hash_rows(header, rows):
+        digest = hashlib.sha256(header)
+        for row in rows:
+            digest.update(b"\n" + row)
+        return digest.hexdigest()
+
+    def sync(self, content, parse, ptax=None, usd_tickers=()):
+        """
+        Applies the rows appended since the last checkpoint. `parse` turns CSV bytes
+        (header + rows) into the transactions DataFrame; `ptax(start)` returns the PTAX
+        history {date: rate} from `start`, fetched only for the dates of USD trades
+        without an explicit rate. If some trade still has no PTAX, this run uses a
+        fallback rate but keeps the previous checkpoint, so the rows are redone.
+        """
+        header, rows = self._split_rows(content)
+        done = self.state.get("rows", 0)
+        if done > len(rows) or self._hash_rows(header, rows[:done]) != self.state.get("prefix_hash"):
+            if done:
+                logger.info("Transactions sheet changed before the checkpoint; rebuilding the ledger.")
+            self.state = self._empty_state()
+            done = 0
+
+        new_rows = rows[done:]
+        exact = True
+        if new_rows:
+            usd_tickers = set(usd_tickers)
+            transactions = parse(b"\n".join([header, *new_rows]))
+            last_date = self.state.get("last_date")
+            if done and last_date and (transactions['date'] < pd.Timestamp(last_date)).any():
+                # Compra retroativa: o FIFO das vendas já lançadas mudaria
+                logger.info("Transactions dated before the checkpoint were added; rebuilding the ledger.")
+                self.state = self._empty_state()
+                transactions = parse(b"\n".join([header, *rows]))
+            exact = self._apply(transactions, self._ptax_series(transactions, ptax, usd_tickers), usd_tickers)
+            logger.info(f"Ledger: {len(new_rows)} new transactions processed ({len(rows)} total).")
+
+        if not exact:
+            logger.warning("Ledger checkpoint not saved: USD trades without PTAX will be reprocessed next run.")
+            return self
+        self.state["rows"] = len(rows)
+        self.state["prefix_hash"] = self._hash_rows(header, rows)
+        self._save_state()
+        return self
+
+    @staticmethod
+    def _needs_ptax(transactions, usd_tickers):
+        is_usd = (transactions['currency'] == "USD") | \
+            ((transactions['currency'] == "") & transactions['ticker'].isin(usd_tickers))
+        return is_usd & ~(transactions['fx'] > 0)
+
+    def _ptax_series(self, transactions, ptax, usd_tickers):
+        """PTAX from a week before the oldest USD trade without a rate (covers the previous business day)."""
+        dates = transactions.loc[self._needs_ptax(transactions, usd_tickers), 'date'].dropna()
+        history = ptax((dates.min() - pd.Timedelta(days=7)).strftime('%Y-%m-%d')) if ptax and not dates.empty else {}
+        if not history:
+            return pd.Series(dtype=float)
+        series = pd.Series(history, dtype=float)
+        series.index = pd.to_datetime(series.index)
+        return series.sort_index()
+
+    def _fx_rate(self, row, ptax, usd_tickers):
+        """
+        (rate, exact): exact is False when the PTAX series was unavailable and the rate
+        is a fallback for this run only. A trade dated before the series starts will
+        never get an exact rate, so it uses the first PTAX and is checkpointed.
+        """
+        is_usd = row['currency'] == "USD" or (not row['currency'] and row['ticker'] in usd_tickers)
+        if not is_usd:
+            return 1.0, True
+        if pd.notna(row['fx']) and row['fx'] > 0:
+            return row['fx'], True
+        if ptax.empty:
+            logger.warning(f"No PTAX for {row['ticker']} on {row['date']:%Y-%m-%d}; using 0.0 for this run only.")
+            return 0.0, False
+        # PTAX do dia (ou do último dia útil anterior)
+        rate = ptax.asof(row['date'])
+        if pd.isna(rate):
+            rate = ptax.iloc[0]
+            logger.warning(f"{row['ticker']} on {row['date']:%Y-%m-%d} predates the PTAX series; "
+                           f"using the first rate ({rate}).")
+        return rate, True
+
+    def _apply(self, transactions, ptax, usd_tickers):
+        """Applies the transactions in date order; returns False if any used a fallback rate."""
+        positions = self.state.setdefault("positions", {})
+        exact = True
+        for _, row in transactions.sort_values('date', kind='stable').iterrows():
+            if not row['ticker']:
+                continue
+            if pd.isna(row['date']):
+                logger.warning(f"Transaction of {row['ticker']} without a valid date; skipped.")
+                continue
+            kind = row['type']
+            fx, exact_rate = self._fx_rate(row, ptax, usd_tickers)
+            exact = exact and exact_rate
+            position = positions.setdefault(row['ticker'], {"lots": [], "realized_brl": 0.0, "dividends_brl": 0.0})
+
+            if kind in BUY_TYPES and row['quantity'] > 0:
+                unit_cost = (row['price'] * row['quantity'] + row['fees']) * fx / row['quantity']
+                position["lots"].append([float(row['quantity']), float(unit_cost)])
+            elif kind in SELL_TYPES and row['quantity'] > 0:
+                proceeds = (row['price'] * row['quantity'] - row['fees']) * fx
+                position["realized_brl"] += float(proceeds - self._consume(position["lots"], row['quantity'], row['ticker']))
+            elif kind in INCOME_TYPES:
+                # Quantidade x valor por cota, ou o valor total em Preço
+                amount = row['price'] * row['quantity'] if row['quantity'] > 0 else row['price']
+                position["dividends_brl"] += float((amount - row['fees']) * fx)
+            else:
+                logger.warning(f"Unknown transaction type '{kind}' for {row['ticker']}; skipped.")
+            self.state["last_date"] = max(self.state.get("last_date") or "", row['date'].strftime('%Y-%m-%d'))
+        return exact
+
+    @staticmethod
+    def _consume(lots, quantity, ticker):
+        """Removes `quantity` from the oldest lots; returns the cost basis sold."""
+        cost = 0.0
+        remaining = quantity
+        while remaining > 1e-12 and lots:
+            lot_qty, unit_cost = lots[0]
+            used = min(lot_qty, remaining)
+            cost += used * unit_cost
+            remaining -= used
+            if used >= lot_qty - 1e-12:
+                lots.pop(0)
+            else:
+                lots[0][0] = lot_qty - used
+        if remaining > 1e-12:
+            logger.warning(f"Sale of {ticker} exceeds the ledger position by {remaining:g}; no cost basis for it.")
+        return cost
+
+    def cost_basis(self):
+        """{ticker: {'quantity', 'avg_cost_brl', 'cost_brl', 'realized_brl', 'dividends_brl'}}"""
+        basis = {}
+        for ticker, position in self.state.get("positions", {}).items():
+            quantity = sum(qty for qty, _ in position["lots"])
+            cost = sum(qty * unit_cost for qty, unit_cost in position["lots"])
+            basis[ticker] = {
+                "quantity": quantity,
+                "avg_cost_brl": cost / quantity if quantity > 0 else 0.0,
+                "cost_brl": cost,
+                "realized_brl": position["realized_brl"],
+                "dividends_brl": position["dividends_brl"],
+            }
+        return basis
@@ -0,0 +1,130 @@
+import time
+import queue
+import smtplib
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+def _is_transient(error):
+    """4xx SMTP replies and dropped connections are worth retrying."""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return False
+
+class SMTPPool:
+    """
+    Reuses up to `size` authenticated SMTP connections across many messages.
+    The pool size is also the cap on messages in flight.
+    """
+
+    def __init__(self, host, port, username, password, size=3, max_retries=3,
+                 backoff=2.0, timeout=30, starttls=True):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = max(1, size)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.starttls = starttls
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        return server
+
+    @contextmanager
+    def connection(self):
+        server = None
+        try:
+            server = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    server = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                server = self._idle.get()
+
+        try:
+            yield server
+        except Exception as e:
+            if isinstance(e, (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)):
+                # Conexão quebrada: descarta e libera a vaga no pool
+                self._discard(server)
+                server = None
+            raise
+        finally:
+            if server is not None:
+                self._idle.put(server)
+
+    def _discard(self, server):
+        try:
+            server.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    def send(self, msg):
+        """Sends one message, retrying transient failures with exponential backoff."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.connection() as server:
+                    with metrics.span("smtp.send"):
+                        server.send_message(msg)
+                return
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_transient(e):
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                logger.warning(f"Transient SMTP error for {msg['To']} ({e}), retrying in {delay:.1f}s")
+                metrics.incr("retry.smtp")
+                time.sleep(delay)
+
+    def send_many(self, messages):
+        """Sends messages in parallel over the pool. Returns [(msg, error or None)]."""
+        def task(msg):
+            try:
+                self.send(msg)
+                return msg, None
+            except Exception as e:
+                return msg, e
+
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(task, messages))
+
+    def close(self):
+        while True:
+            try:
+                server = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                server.quit()
+            except Exception:
+                pass
+            with self._lock:
+                self._created -= 1
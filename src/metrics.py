@@ -0,0 +1,134 @@
+import os
+import io
+import re
+import json
+import time
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+class Metrics:
+    """In-process spans and counters for one run, exported as JSON lines and Prometheus textfile."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.spans = []
+            self.counters = defaultdict(float)
+
+    @contextmanager
+    def span(self, name, **labels):
+        start = time.monotonic()
+        ok = True
+        try:
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            duration = time.monotonic() - start
+            with self.lock:
+                self.spans.append({"name": name, "labels": labels, "seconds": duration, "ok": ok})
+
+    def incr(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def export(self, jsonl_path="logs/metrics.jsonl", prom_path="logs/metrics.prom"):
+        """Appends this run to the JSON lines file and rewrites the Prometheus textfile."""
+        with self.lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+
+        try:
+            os.makedirs(os.path.dirname(jsonl_path) or ".", exist_ok=True)
+            record = {"timestamp": datetime.now().isoformat(), "spans": spans, "counters": counters}
+            with open(jsonl_path, 'a') as f:
+                f.write(json.dumps(record) + "\n")
+
+            os.makedirs(os.path.dirname(prom_path) or ".", exist_ok=True)
+            tmp_path = prom_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(self._to_prometheus(spans, counters))
+            # Troca atômica para o node_exporter nunca ler um arquivo pela metade
+            os.replace(tmp_path, prom_path)
+        except Exception as e:
+            logger.error(f"Failed to export metrics: {e}")
+
+    @staticmethod
+    def _metric_name(name):
+        return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+    @staticmethod
+    def _label_value(value):
+        # Escapes do formato texto do Prometheus (consultas de notícias podem ter aspas)
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    @classmethod
+    def _to_prometheus(cls, spans, counters):
+        sums = defaultdict(float)
+        counts = defaultdict(int)
+        for span in spans:
+            labels = dict(span["labels"], span=span["name"])
+            key = ",".join(f'{cls._metric_name(k)}="{cls._label_value(v)}"' for k, v in sorted(labels.items()))
+            sums[key] += span["seconds"]
+            counts[key] += 1
+
+        lines = [
+            "# HELP invest_ai_span_seconds Time spent per stage/fetch in the last run.",
+            "# TYPE invest_ai_span_seconds summary",
+        ]
+        for key in sorted(sums):
+            lines.append(f"invest_ai_span_seconds_sum{{{key}}} {sums[key]:.6f}")
+            lines.append(f"invest_ai_span_seconds_count{{{key}}} {counts[key]}")
+
+        for name in sorted(counters):
+            metric = "invest_ai_" + cls._metric_name(name) + "_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {counters[name]:g}")
+
+        lines.append("# TYPE invest_ai_last_run_timestamp_seconds gauge")
+        lines.append(f"invest_ai_last_run_timestamp_seconds {time.time():.0f}")
+        return "\n".join(lines) + "\n"
+
+# Instância única compartilhada pelo job
+metrics = Metrics()
+
+def run_profiled(func, mode):
+    """Runs func under cProfile ("cprofile") or pyinstrument ("pyinstrument"), writing to logs/."""
+    os.makedirs("logs", exist_ok=True)
+
+    if mode == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warning("pyinstrument not installed, falling back to cProfile.")
+        else:
+            profiler = Profiler()
+            profiler.start()
+            try:
+                return func()
+            finally:
+                profiler.stop()
+                with open("logs/profile.html", 'w') as f:
+                    f.write(profiler.output_html())
+                logger.info("Profile saved to logs/profile.html")
+
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func)
+    finally:
+        profiler.dump_stats("logs/profile.prof")
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(30)
+        logger.info("Profile saved to logs/profile.prof\n" + stream.getvalue())
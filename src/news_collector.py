@@ -1,42 +1,129 @@
 from GoogleNews import GoogleNews
+import os
+import re
+import json
 import logging
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from config.settings import Settings
+from src.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+def _normalize_title(title):
+    text = unicodedata.normalize('NFKD', title).encode('ascii', 'ignore').decode('ascii').lower()
+    return re.sub(r'[^a-z0-9 ]+', ' ', text).split()
+
+def _shingles(title, size=2):
+    words = _normalize_title(title)
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def _jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
 class NewsCollector:
     def __init__(self):
-        self.googlenews = GoogleNews(lang='pt', region='BR')
+        self.cache_dir = Settings.NEWS_CACHE_DIR
         
-    def get_top_news(self):
+    def _build_queries(self, portfolio_data):
+        """Macro queries first, then one query per held ticker (without the .SA suffix)."""
+        queries = list(Settings.NEWS_MACRO_QUERIES)
+        for item in portfolio_data or []:
+            if item.get('category') == 'RENDA_FIXA':
+                continue
+            query = item['ticker'].replace('.SA', '')
+            if query not in queries:
+                queries.append(query)
+            if len(queries) >= len(Settings.NEWS_MACRO_QUERIES) + Settings.NEWS_MAX_TICKER_QUERIES:
+                break
+        return queries
+
+    def _search(self, query):
+        # Uma instância por busca: o GoogleNews guarda estado entre chamadas
+        googlenews = GoogleNews(lang='pt', region='BR')
+        with metrics.span("fetch.news", query=query):
+            googlenews.search(query)
+            results = googlenews.result()
+        return [
+            {'title': news.get('title'), 'date': news.get('date'), 'link': news.get('link')}
+            for news in results if news.get('title')
+        ]
+
+    def _load_cache(self, path):
+        try:
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.warning(f"Failed to load news cache: {e}")
+        return {}
+
+    def _save_cache(self, path, cache):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(cache, f, ensure_ascii=False)
+        except Exception as e:
+            logger.warning(f"Failed to save news cache: {e}")
+
+    def _collect(self, queries):
+        """Runs the queries concurrently, reusing today's cached results."""
+        cache_path = os.path.join(self.cache_dir, f"{datetime.now().strftime('%Y-%m-%d')}.json")
+        cache = self._load_cache(cache_path)
+        missing = [q for q in queries if q not in cache]
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=Settings.NEWS_MAX_WORKERS) as executor:
+                futures = {q: executor.submit(self._search, q) for q in missing}
+                for query, future in futures.items():
+                    try:
+                        cache[query] = future.result()
+                    except Exception as e:
+                        logger.warning(f"Erro ao buscar notícias para '{query}': {e}")
+            self._save_cache(cache_path, cache)
+
+        metrics.incr("cache.news.hits", len(queries) - len(missing))
+        metrics.incr("cache.news.misses", len(missing))
+        return {q: cache.get(q, []) for q in queries}
+
+    def _rank(self, results_by_query):
+        """
+        Clusters near-duplicate headlines (Jaccard over word shingles) and scores each
+        cluster by how many results/queries reported it, its best position and macro weight.
+        """
+        macro = set(Settings.NEWS_MACRO_QUERIES)
+        clusters = []
+        for query, results in results_by_query.items():
+            for position, news in enumerate(results):
+                shingles = _shingles(news['title'])
+                score = (2.0 if query in macro else 1.0) / (1 + position)
+                for cluster in clusters:
+                    if _jaccard(shingles, cluster['shingles']) >= Settings.NEWS_DUP_THRESHOLD:
+                        cluster['score'] += score + 1.0
+                        cluster['queries'].add(query)
+                        break
+                else:
+                    clusters.append({'news': news, 'shingles': shingles, 'score': score, 'queries': {query}})
+
+        clusters.sort(key=lambda c: (len(c['queries']), c['score']), reverse=True)
+        return [c['news'] for c in clusters]
+
+    def get_top_news(self, portfolio_data=None):
         """
-        Busca as top 5 notícias sobre 'Mercado Financeiro' e 'Ibovespa'.
-        Retorna uma string formatada com as manchetes.
+        Busca notícias do mercado (consultas macro + ativos da carteira), remove
+        manchetes quase duplicadas e retorna as top N formatadas.
         """
         try:
             logger.info("Buscando notícias do mercado financeiro...")
-            self.googlenews.clear()
-            
-            # Busca combinada para ter um contexto geral
-            self.googlenews.search('Mercado Financeiro Ibovespa')
-            results = self.googlenews.result()
-            
-            # Filtra e formata
-            top_news = []
-            seen_titles = set()
-            
-            for news in results:
-                title = news.get('title')
-                date = news.get('date')
-                link = news.get('link')
-                
-                # Evita duplicatas e notícias muito antigas (embora a busca seja recente)
-                if title and title not in seen_titles:
-                    seen_titles.add(title)
-                    top_news.append(f"- {title} ({date})")
-                
-                if len(top_news) >= 5:
-                    break
+            queries = self._build_queries(portfolio_data)
+            ranked = self._rank(self._collect(queries))
+
+            top_news = [f"- {news['title']} ({news['date']})" for news in ranked[:Settings.NEWS_TOP_N]]
             
             if not top_news:
                 return "Nenhuma notícia relevante encontrada hoje."
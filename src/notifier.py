@@ -1,87 +1,229 @@
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
+from email.mime.image import MIMEImage
 from config.settings import Settings
 import logging
 import os
+import base64
+import threading
 import markdown
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+from src.mailer import SMTPPool
 
 logger = logging.getLogger(__name__)
 
+CHART_CID = "allocation_chart"
+
 class Notifier:
+    # Jinja environment shared across instances; compiled templates persist in a bytecode cache
+    _env = None
+    _env_lock = threading.Lock()
+
     def __init__(self):
         self.template_dir = 'templates'
         os.makedirs(self.template_dir, exist_ok=True)
-        self.env = Environment(loader=FileSystemLoader(self.template_dir))
+        with Notifier._env_lock:
+            if Notifier._env is None:
+                os.makedirs(Settings.JINJA_CACHE_DIR, exist_ok=True)
+                Notifier._env = Environment(
+                    loader=FileSystemLoader(self.template_dir),
+                    bytecode_cache=FileSystemBytecodeCache(Settings.JINJA_CACHE_DIR),
+                    auto_reload=False
+                )
+        self.env = Notifier._env
 
-    def send_email(self, subject, context):
-        if not Settings.EMAIL_SENDER or not Settings.EMAIL_PASSWORD:
-            logger.warning("Email credentials not set. Skipping email.")
-            return
+    def _format_context(self, context):
+        """Formats the report data once; shared by every recipient's render."""
+        # Format numbers for display
+        formatted_context = context.copy()
+        formatted_context['total_value'] = f"{context['total_value']:,.2f}"
 
-        msg = MIMEMultipart()
-        msg['From'] = Settings.EMAIL_SENDER
+        # Chart: inline SVG markup, or PNG as CID attachment (multipart/related) / inline data URI
+        formatted_context['chart_svg'] = context.get('allocation_chart_svg') or ""
+        formatted_context['history_svg'] = context.get('history_chart_svg') or ""
+        chart_png = context.get('allocation_chart_png')
+        if not chart_png:
+            formatted_context['chart_src'] = ""
+        elif Settings.EMAIL_CHART_MODE == "inline":
+            formatted_context['chart_src'] = "data:image/png;base64," + base64.b64encode(chart_png).decode('ascii')
+        else:
+            formatted_context['chart_src'] = f"cid:{CHART_CID}"
+        
+        # Convert AI markdown to HTML
+        if 'ai_analysis' in formatted_context and formatted_context['ai_analysis']:
+             formatted_context['ai_analysis'] = markdown.markdown(formatted_context['ai_analysis'])
+        
+        # Format profit/loss from the ledger
+        pnl = context.get('pnl')
+        if pnl:
+            formatted_context['pnl'] = {key: f"{value:,.2f}" for key, value in pnl.items()}
+        else:
+            formatted_context['pnl'] = None
+
+        # Format per-ticker buy orders
+        orders = context.get('orders')
+        if orders and not orders['orders'].empty:
+            formatted_context['orders'] = {
+                'rows': [
+                    {
+                        'ticker': row['ticker'],
+                        'quantity': f"{row['quantity']:,.8f}".rstrip('0').rstrip('.'),
+                        'unit_price': f"{row['unit_price_brl']:,.2f}",
+                        'cost': f"{row['cost_brl']:,.2f}"
+                    }
+                    for _, row in orders['orders'].iterrows()
+                ],
+                'spent': f"{orders['spent']:,.2f}",
+                'leftover': f"{orders['leftover']:,.2f}"
+            }
+        else:
+            formatted_context['orders'] = None
 
-        raw_receivers = Settings.EMAIL_RECEIVER
-        recipients_list = [email.strip() for email in raw_receivers.split(',')]
-        msg['To'] = ", ".join(recipients_list)
+        # Format risk metrics
+        risk = context.get('risk')
+        if risk:
+            formatted_context['risk'] = {
+                'volatility_pct': f"{risk['volatility_pct']:.1f}",
+                'max_drawdown_pct': f"{risk['max_drawdown_pct']:.1f}",
+                'beta': f"{risk['beta']:.2f}" if risk.get('beta') is not None else "n/d",
+                'benchmark': risk.get('benchmark') or "benchmark",
+                'confidence': f"{risk['confidence'] * 100:.0f}",
+                'var_pct': f"{risk['var_pct']:.2f}",
+                'var_brl': f"{risk['var_brl']:,.2f}",
+                'cvar_pct': f"{risk['cvar_pct']:.2f}",
+                'cvar_brl': f"{risk['cvar_brl']:,.2f}",
+                'top_contributors': [
+                    {'ticker': c['ticker'], 'pct': f"{c['pct']:.1f}"}
+                    for c in risk['risk_contribution'][:5]
+                ]
+            }
+        else:
+            formatted_context['risk'] = None
 
+        # Format goal projection (percentile bands per horizon)
+        projection = context.get('projection')
+        if projection:
+            percentiles = list(projection['horizons'][0]['percentiles'])
+            formatted_context['projection'] = {
+                'paths': f"{projection['paths']:,}",
+                'percentiles': percentiles,
+                'horizons': [
+                    {
+                        'years': h['years'],
+                        'contributed': f"{h['contributed']:,.2f}",
+                        'values': [f"{h['percentiles'][p]:,.2f}" for p in percentiles]
+                    }
+                    for h in projection['horizons']
+                ]
+            }
+        else:
+            formatted_context['projection'] = None
+
+        # Format suggestions list
+        suggestions_list = []
+        for _, row in context['suggestions'].iterrows():
+            suggestions_list.append({
+                'category': row['category'],
+                'current_pct': f"{row['current_pct']:.1f}",
+                'target_pct': f"{row['target_pct']:.1f}",
+                'status': row['status']
+            })
+        formatted_context['suggestions'] = suggestions_list
+        
+        # Format contribution
+        formatted_context['contribution_amount'] = f"{context.get('contribution_amount', Settings.MONTHLY_CONTRIBUTION):,.2f}"
+        if isinstance(context['contribution'], str):
+            formatted_context['contribution_is_str'] = True
+            formatted_context['contribution'] = context['contribution']
+        else:
+            formatted_context['contribution_is_str'] = False
+            contribution_list = []
+            for _, row in context['contribution'].iterrows():
+                contribution_list.append({
+                    'category': row['category'],
+                    'contribution': f"{row['contribution']:,.2f}"
+                })
+            formatted_context['contribution'] = contribution_list
+
+        return formatted_context
+
+    def _build_message(self, subject, recipient, body, subtype='html', chart_png=None):
+        msg = MIMEMultipart('related') if chart_png else MIMEMultipart()
+        msg['From'] = Settings.EMAIL_SENDER
+        msg['To'] = recipient
         msg['Subject'] = subject
+        msg.attach(MIMEText(body, subtype))
+        if chart_png:
+            image = MIMEImage(chart_png, 'png')
+            image.add_header('Content-ID', f"<{CHART_CID}>")
+            image.add_header('Content-Disposition', 'inline', filename=f"{CHART_CID}.png")
+            msg.attach(image)
+        return msg
+
+    def send_email(self, subject, context, recipients=None, personalize=None):
+        """
+        Renders and sends one message per recipient over a pooled SMTP connection.
+        `personalize(recipient)` may return extra template context for that recipient.
+        """
+        if not Settings.EMAIL_SENDER or not Settings.EMAIL_PASSWORD:
+            logger.warning("Email credentials not set. Skipping email.")
+            return
+
+        raw_receivers = recipients or Settings.EMAIL_RECEIVER
+        recipients_list = [email.strip() for email in raw_receivers.split(',') if email.strip()]
 
+        messages = []
         try:
             template = self.env.get_template('email_template.html')
-            
-            # Format numbers for display
-            formatted_context = context.copy()
-            formatted_context['total_value'] = f"{context['total_value']:,.2f}"
-            
-            # Convert AI markdown to HTML
-            if 'ai_analysis' in formatted_context and formatted_context['ai_analysis']:
-                 formatted_context['ai_analysis'] = markdown.markdown(formatted_context['ai_analysis'])
-            
-            # Format suggestions list
-            suggestions_list = []
-            for _, row in context['suggestions'].iterrows():
-                suggestions_list.append({
-                    'category': row['category'],
-                    'current_pct': f"{row['current_pct']:.1f}",
-                    'target_pct': f"{row['target_pct']:.1f}",
-                    'status': row['status']
-                })
-            formatted_context['suggestions'] = suggestions_list
-            
-            # Format contribution
-            if isinstance(context['contribution'], str):
-                formatted_context['contribution_is_str'] = True
-                formatted_context['contribution'] = context['contribution']
-            else:
-                formatted_context['contribution_is_str'] = False
-                contribution_list = []
-                for _, row in context['contribution'].iterrows():
-                    contribution_list.append({
-                        'category': row['category'],
-                        'contribution': f"{row['contribution']:,.2f}"
-                    })
-                formatted_context['contribution'] = contribution_list
-
-            html_content = template.render(formatted_context)
-            msg.attach(MIMEText(html_content, 'html'))
+            formatted_context = self._format_context(context)
+
+            for recipient in recipients_list:
+                recipient_context = dict(formatted_context, recipient=recipient)
+                # SVG for clients that render it; PNG fallback for the others
+                use_png = Settings.recipient_needs_png(recipient) or not formatted_context['chart_svg']
+                if use_png:
+                    recipient_context['chart_svg'] = ""
+                    recipient_context['history_svg'] = ""
+                else:
+                    recipient_context['chart_src'] = ""
+                attached_png = None
+                if recipient_context['chart_src'].startswith("cid:"):
+                    attached_png = context['allocation_chart_png']
+
+                if personalize:
+                    recipient_context.update(personalize(recipient) or {})
+                html_content = template.render(recipient_context)
+                messages.append(self._build_message(subject, recipient, html_content, chart_png=attached_png))
             
         except Exception as e:
             logger.error(f"Error rendering email template: {e}")
             # Fallback to simple text if template fails
-            msg.attach(MIMEText("Erro ao gerar relatório HTML. Verifique os logs.", 'plain'))
+            messages = [
+                self._build_message(subject, recipient, "Erro ao gerar relatório HTML. Verifique os logs.", 'plain')
+                for recipient in recipients_list
+            ]
 
+        pool = SMTPPool(
+            Settings.SMTP_HOST,
+            Settings.SMTP_PORT,
+            Settings.EMAIL_SENDER,
+            Settings.EMAIL_PASSWORD,
+            size=min(Settings.SMTP_MAX_CONNECTIONS, max(1, len(messages))),
+            max_retries=Settings.SMTP_MAX_RETRIES,
+            backoff=Settings.SMTP_RETRY_BACKOFF,
+            timeout=Settings.SMTP_TIMEOUT
+        )
         try:
-            # Gmail SMTP
-            server = smtplib.SMTP('smtp.gmail.com', 587)
-            server.starttls()
-            server.login(Settings.EMAIL_SENDER, Settings.EMAIL_PASSWORD)
-            server.send_message(msg)
-            server.quit()
-            logger.info(f"Email sent successfully to: {recipients_list}")
-        except Exception as e:
-            logger.error(f"Failed to send email: {e}")
-            raise e
\ No newline at end of file
+            results = pool.send_many(messages)
+        finally:
+            pool.close()
+
+        failed = [(msg['To'], error) for msg, error in results if error is not None]
+        sent = [msg['To'] for msg, error in results if error is None]
+        if sent:
+            logger.info(f"Email sent successfully to: {sent}")
+        if failed:
+            for recipient, error in failed:
+                logger.error(f"Failed to send email to {recipient}: {error}")
+            raise failed[0][1]
@@ -0,0 +1,123 @@
+import time
+import queue
+import logging
+import threading
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class PipelineAbort(Exception):
+    """Raised by a stage to stop the run early without treating it as a failure."""
+
+class Stage:
+    def __init__(self, name, func, inputs=()):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+
+class Pipeline:
+    """
+    Runs stages as a DAG on worker threads: each stage starts as soon as all of its
+    inputs are done and receives their results positionally, in declared order.
+    Workers are daemon threads, so a stage still blocked when the deadline expires
+    does not keep the process alive after the run is abandoned.
+    """
+
+    def __init__(self, stages, max_workers=4, deadline=None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max_workers
+        self.deadline = deadline
+        self.results = {}
+        self.timings = {}
+        self._validate()
+
+    def _validate(self):
+        for stage in self.stages.values():
+            missing = [i for i in stage.inputs if i not in self.stages]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {missing}")
+
+        # Detecta ciclos (Kahn)
+        remaining = {name: set(stage.inputs) for name, stage in self.stages.items()}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Cycle detected between stages: {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+    def _run_stage(self, stage):
+        start = time.monotonic()
+        try:
+            with metrics.span("stage", stage=stage.name):
+                return stage.func(*[self.results[i] for i in stage.inputs])
+        finally:
+            self.timings[stage.name] = (start, time.monotonic())
+
+    def _worker(self, stage, done_queue):
+        try:
+            done_queue.put((stage.name, self._run_stage(stage), None))
+        except BaseException as e:
+            done_queue.put((stage.name, None, e))
+
+    def run(self):
+        """Executes every stage and returns {stage_name: result}."""
+        started_at = time.monotonic()
+        self.results = {}
+        self.timings = {}
+        pending = dict(self.stages)
+        running = set()
+        done_queue = queue.Queue()
+
+        while pending or running:
+            ready = [n for n, s in pending.items() if all(i in self.results for i in s.inputs)]
+            for name in ready[:max(0, self.max_workers - len(running))]:
+                stage = pending.pop(name)
+                logger.info(f"▶️ Stage '{name}' started")
+                threading.Thread(
+                    target=self._worker, args=(stage, done_queue), name=f"stage-{name}", daemon=True
+                ).start()
+                running.add(name)
+
+            timeout = None
+            if self.deadline is not None:
+                timeout = self.deadline - (time.monotonic() - started_at)
+            try:
+                if timeout is not None and timeout <= 0:
+                    raise queue.Empty
+                name, result, error = done_queue.get(timeout=timeout)
+            except queue.Empty:
+                raise TimeoutError(
+                    f"Pipeline deadline of {self.deadline}s exceeded; still running: {sorted(running)}"
+                ) from None
+
+            running.discard(name)
+            if error is not None:
+                raise error
+            self.results[name] = result
+            start, end = self.timings[name]
+            logger.info(f"✅ Stage '{name}' finished in {end - start:.2f}s")
+
+        self._log_critical_path(started_at)
+        return self.results
+
+    def critical_path(self):
+        """Chain of stages that determined the total run time, from first to last."""
+        if not self.timings:
+            return []
+        name = max(self.timings, key=lambda n: self.timings[n][1])
+        path = [name]
+        while self.stages[name].inputs:
+            name = max(self.stages[name].inputs, key=lambda n: self.timings[n][1])
+            path.append(name)
+        return list(reversed(path))
+
+    def _log_critical_path(self, started_at):
+        path = self.critical_path()
+        total = time.monotonic() - started_at
+        steps = " -> ".join(
+            f"{name} ({self.timings[name][1] - self.timings[name][0]:.2f}s)" for name in path
+        )
+        logger.info(f"⏱️ Pipeline finished in {total:.2f}s. Critical path: {steps}")
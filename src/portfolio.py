@@ -1,171 +1,130 @@
 import pandas as pd
-import json
+import numpy as np
 import os
 from datetime import datetime
 from config.settings import Settings
 import logging
+from src.metrics import metrics
+from src.history_store import HistoryStore
+from src.risk import RiskAnalyzer
+from src.contribution_solver import solve_contribution
 
 logger = logging.getLogger(__name__)
 
+# Map internal categories to Target Allocation keys
+CATEGORY_MAP = {
+    "BR_STOCKS": "Ações BR",
+    "FIIS": "FIIs",
+    "ETFS": "ETFs",
+    "US_REITS": "REITs",
+    "US_STOCKS": "Ações EUA",
+    "CRYPTO": "Cripto",
+    "RENDA_FIXA": "Renda Fixa"
+}
+
 class PortfolioManager:
-    def __init__(self, portfolio_data, market_data, indicators):
+    def __init__(self, portfolio_data, market_data, indicators, history_store=None, price_panel=None,
+                 cost_basis=None, risk_state_path=None):
         self.portfolio_data = portfolio_data
         self.market_data = market_data
         self.indicators = indicators
+        # 1y closes (PricePanel) shared from DataCollector, read without copying
+        self.price_panel = price_panel
+        # FIFO cost basis per ticker from the transactions ledger (optional)
+        self.cost_basis = cost_basis or {}
+        self.risk_state_path = risk_state_path
         self.target_alloc = Settings.TARGET_ALLOCATION
         
         # Ensure data dir exists
         os.makedirs("data", exist_ok=True)
+        self.history = history_store or HistoryStore(Settings.HISTORY_PATH, Settings.LEGACY_HISTORY_PATH)
 
-    def _load_history(self):
-        """Loads history data from JSON file."""
-        history_file = "data/history.json"
-        try:
-            if os.path.exists(history_file):
-                with open(history_file, 'r') as f:
-                    return json.load(f)
-            return []
-        except Exception as e:
-            logger.error(f"Failed to load history.json: {e}")
-            return []
+    # Market data fields carried into the portfolio frame, with their defaults
+    MARKET_FIELDS = {
+        "dy_12m": 0, "p_vp": 0, "pe": 0, "roe": 0,
+        "sector": "Unknown", "recommendation": "None",
+        "change_1d": 0, "change_12m": 0
+    }
 
-    def _save_history(self, total_value):
-        """Saves daily total value to history."""
-        history_file = "data/history.json"
-        today = datetime.now().strftime("%Y-%m-%d")
-        
-        history = self._load_history()
-        
-        # Check if today is already in history, update if so
-        updated = False
-        for entry in history:
-            if entry['date'] == today:
-                entry['value'] = total_value
-                updated = True
-                break
-        
-        if not updated:
-            history.append({
-                "date": today,
-                "value": total_value
-            })
-            
-        try:
-            with open(history_file, 'w') as f:
-                json.dump(history, f, indent=2)
-        except Exception as e:
-            logger.error(f"Failed to save history.json: {e}")
+    def _value_positions(self):
+        """Values every position with column operations instead of a per-row loop."""
+        columns = ["ticker", "qty", "price", "value_brl", "category", "name", "target_pct",
+                   *self.MARKET_FIELDS, "profit_loss_pct", "profit_loss_val"]
+        if not self.portfolio_data:
+            return pd.DataFrame(columns=columns)
 
-    def calculate_portfolio(self):
-        portfolio = []
-        total_value = 0
-        
-        # 1. Process Tickers from Sheet Data
-        for item in self.portfolio_data:
-            ticker = item['ticker']
-            qty = item['quantity'] # Note: key is 'quantity' from SheetsManager, not 'qty'
-            category = item.get('category', 'OUTROS')
-            
-            # Market Data
-            data = self.market_data.get(ticker, {})
-            current_price = data.get('price', 0)
-            
-            # --- LOGIC CORRECTIONS ---
-            
-            # 1. Renda Fixa: Value = Qty * 1.0
-            if category == "RENDA_FIXA":
-                value_brl = qty * 1.0
-                current_price = 1.0
-                avg_price_brl = 0 # Not tracking avg price for RF yet
-                
-            # 2. Crypto Logic
-            elif category == "CRYPTO":
-                if ticker.endswith("-BRL"):
-                    value_brl = current_price * qty
-                    avg_price_brl = 0
-                else:
-                    # USDT-USD, BTC-USD, etc.
-                    usd_rate = self.market_data.get('BRL=X', {}).get('price', 0)
-                    
-                    # Fallback de segurança se o Yahoo falhar no dólar
-                    if usd_rate <= 0:
-                        usd_rate = 6.00 # Taxa aproximada segura
-                        logger.warning("Usando taxa de dólar fallback (6.00) para conversão de cripto.")
-                        
-                    value_brl = current_price * qty * usd_rate
-                    avg_price_brl = 0
-
-            # 3. US Stocks/REITs -> Convert to BRL
-            elif category in ["US_REITS", "US_STOCKS"]:
-                usd_rate = self.market_data.get('BRL=X', {}).get('price', 0)
-                if usd_rate <= 0: 
-                    usd_rate = 6.00
-                    logger.warning("Usando taxa de dólar fallback (6.00) para ativos EUA.")
-                    
-                value_brl = current_price * qty * usd_rate
-                avg_price_brl = 0
-                
-            # 4. Brazilian Assets (Stocks, FIIs, ETFs, BDRs)
-            else:
-                value_brl = current_price * qty
-                avg_price_brl = 0
+        positions = pd.DataFrame({
+            "ticker": [item['ticker'] for item in self.portfolio_data],
+            # Note: key is 'quantity' from SheetsManager, not 'qty'
+            "qty": [item['quantity'] for item in self.portfolio_data],
+            "category": [item.get('category', 'OUTROS') for item in self.portfolio_data],
+            # Meta column from the sheet (% of the portfolio)
+            "target_pct": [item.get('target_pct', 0.0) for item in self.portfolio_data]
+        })
 
-            if current_price == 0 and category != "RENDA_FIXA":
-                logger.warning(f"Price for {ticker} is 0. Check data source.")
+        market = pd.DataFrame.from_dict(self.market_data, orient='index')
+        market = market.reindex(columns=["price", "name", *self.MARKET_FIELDS])
+        df = positions.join(market, on='ticker')
 
-            # Safety check for NaN
-            if pd.isna(value_brl):
-                value_brl = 0.0
+        df['price'] = df['price'].fillna(0)
+        df['name'] = df['name'].fillna(df['ticker'])
+        df = df.fillna(self.MARKET_FIELDS)
 
-            total_value += value_brl
-            
-            # Calculate Profit/Loss
-            if avg_price_brl > 0:
-                profit_loss_pct = ((value_brl - (avg_price_brl * qty)) / (avg_price_brl * qty)) * 100
-                profit_loss_val = value_brl - (avg_price_brl * qty)
-            else:
-                profit_loss_pct = 0.0
-                profit_loss_val = 0.0
-
-            portfolio.append({
-                "ticker": ticker,
-                "qty": qty,
-                "price": current_price,
-                "value_brl": value_brl,
-                "category": category,
-                "name": data.get('name', ticker),
-                "dy_12m": data.get('dy_12m', 0),
-                "p_vp": data.get('p_vp', 0),
-                "pe": data.get('pe', 0),
-                "roe": data.get('roe', 0),
-                "sector": data.get('sector', 'Unknown'),
-                "recommendation": data.get('recommendation', 'None'),
-                "change_1d": data.get('change_1d', 0),
-                "change_12m": data.get('change_12m', 0),
-                "profit_loss_pct": profit_loss_pct,
-                "profit_loss_val": profit_loss_val
-            })
-            
+        category = df['category']
+        is_rf = category == "RENDA_FIXA"
+        # CRYPTO cotada em USD (USDT-USD, BTC-USD, etc.) e ativos EUA são convertidos para BRL
+        needs_usd = ((category == "CRYPTO") & ~df['ticker'].str.endswith("-BRL")) | \
+            category.isin(["US_REITS", "US_STOCKS"])
+
+        usd_rate = self.market_data.get('BRL=X', {}).get('price', 0)
+        if needs_usd.any() and not usd_rate > 0:
+            # Fallback de segurança se o Yahoo falhar no dólar
+            usd_rate = 6.00 # Taxa aproximada segura
+            logger.warning("Usando taxa de dólar fallback (6.00) para conversão de cripto/ativos EUA.")
+            metrics.incr("fallback.usd_rate")
+
+        for ticker in df.loc[(df['price'] == 0) & ~is_rf, 'ticker']:
+            logger.warning(f"Price for {ticker} is 0. Check data source.")
+
+        # Renda Fixa: Value = Qty * 1.0
+        df.loc[is_rf, 'price'] = 1.0
+        fx = np.where(needs_usd, usd_rate, 1.0)
+        df['value_brl'] = (df['price'] * df['qty'] * fx).fillna(0.0)
+
+        # Profit/Loss against the ledger's FIFO average cost (BRL, FX at trade date)
+        avg_cost = {ticker: basis['avg_cost_brl'] for ticker, basis in self.cost_basis.items()}
+        avg_price_brl = df['ticker'].map(avg_cost).fillna(0.0)
+        cost = avg_price_brl * df['qty']
+        has_cost = cost > 0
+        df['profit_loss_val'] = np.where(has_cost, df['value_brl'] - cost, 0.0)
+        df['profit_loss_pct'] = np.where(has_cost, df['profit_loss_val'] / cost.where(has_cost, 1) * 100, 0.0)
+
+        return df[columns]
+
+    def calculate_portfolio(self):
+        # 1. Value all positions from Sheet Data at once (joined with market data)
+        df = self._value_positions()
+        total_value = float(df['value_brl'].sum()) if not df.empty else 0
+        
         # 2. History & Variation
-        history = self._load_history()
+        today = datetime.now().strftime("%Y-%m-%d")
         daily_variation_pct = 0.0
         
-        if history:
-            history.sort(key=lambda x: x['date'])
-            today = datetime.now().strftime("%Y-%m-%d")
+        try:
+            last_entry = self.history.last_before(today)
+        except Exception as e:
+            logger.error(f"Failed to load history: {e}")
             last_entry = None
-            for entry in reversed(history):
-                if entry['date'] != today:
-                    last_entry = entry
-                    break
             
-            if last_entry and last_entry['value'] > 0:
-                daily_variation_pct = ((total_value - last_entry['value']) / last_entry['value']) * 100
+        if last_entry and last_entry['value'] > 0:
+            daily_variation_pct = ((total_value - last_entry['value']) / last_entry['value']) * 100
 
         # Save today's value
-        self._save_history(total_value)
+        try:
+            self.history.upsert(today, total_value)
+        except Exception as e:
+            logger.error(f"Failed to save history: {e}")
 
-        df = pd.DataFrame(portfolio)
         if not df.empty:
             df['allocation'] = (df['value_brl'] / total_value) * 100
         else:
@@ -173,21 +132,62 @@ class PortfolioManager:
         
         return df, total_value, daily_variation_pct
 
-    def get_rebalancing_suggestions(self, df, total_value):
-        # Map internal categories to Target Allocation keys
-        cat_map = {
-            "BR_STOCKS": "Ações BR",
-            "FIIS": "FIIs",
-            "ETFS": "ETFs",
-            "US_REITS": "REITs",
-            "US_STOCKS": "Ações EUA",
-            "CRYPTO": "Cripto",
-            "RENDA_FIXA": "Renda Fixa"
+    def calculate_pnl(self, df):
+        """Unrealized, realized and dividend totals (BRL) when a ledger is available."""
+        if not self.cost_basis:
+            return None
+        return {
+            'unrealized_brl': float(df['profit_loss_val'].sum()) if not df.empty else 0.0,
+            'realized_brl': sum(basis['realized_brl'] for basis in self.cost_basis.values()),
+            'dividends_brl': sum(basis['dividends_brl'] for basis in self.cost_basis.values())
         }
-        
+
+    def calculate_risk(self, df, total_value):
+        """Volatility, drawdown, beta, risk contribution and 1-day VaR/CVaR from the price panel."""
+        try:
+            analyzer = RiskAnalyzer.from_portfolio(
+                self.price_panel, df,
+                cdi_diario=self.indicators.get('cdi_diario', 0.0),
+                benchmark_ticker=Settings.RISK_BENCHMARK,
+                confidence=Settings.RISK_VAR_CONFIDENCE,
+                state_path=self.risk_state_path
+            )
+            if analyzer is None:
+                logger.warning("Not enough price history for risk metrics.")
+                return None
+            risk = analyzer.compute()
+            risk['benchmark'] = Settings.RISK_BENCHMARK
+            risk['var_brl'] = risk['var_pct'] / 100 * total_value
+            risk['cvar_brl'] = risk['cvar_pct'] / 100 * total_value
+            return risk
+        except Exception as e:
+            logger.error(f"Failed to compute risk metrics: {e}")
+            return None
+
+    def suggest_orders(self, df, amount):
+        """
+        Concrete buy orders for `amount` per ticker, using the sheet's Meta targets and
+        tradable lot sizes. Returns {'orders', 'spent', 'leftover'} or None without Meta.
+        """
+        if df.empty or not (df['target_pct'] > 0).any():
+            return None
+        try:
+            assets = df[['ticker', 'category', 'value_brl', 'target_pct']].copy()
+            # Unit price in BRL (already FX-converted; RF is quoted in reais)
+            assets['unit_price_brl'] = np.where(df['qty'] > 0, df['value_brl'] / df['qty'].where(df['qty'] > 0, 1), 0.0)
+            with metrics.span("solver.contribution"):
+                orders, leftover = solve_contribution(assets, amount)
+            return {'orders': orders, 'spent': amount - leftover, 'leftover': leftover}
+        except Exception as e:
+            logger.error(f"Failed to solve contribution orders: {e}")
+            return None
+
+    def get_rebalancing_suggestions(self, df, total_value):
+        band = Settings.REBALANCE_BAND_PP
+
         # Group by category
         if not df.empty:
-            df['target_cat'] = df['category'].map(cat_map)
+            df['target_cat'] = df['category'].map(CATEGORY_MAP)
             current_alloc = df.groupby('target_cat')['value_brl'].sum() / total_value
         else:
             current_alloc = pd.Series()
@@ -199,9 +199,9 @@ class PortfolioManager:
             diff = (current_pct * 100) - (target_pct * 100)
             
             status = "OK"
-            if diff > 5:
+            if diff > band:
                 status = "VENDER"
-            elif diff < -5:
+            elif diff < -band:
                 status = "COMPRAR"
                 
             suggestions.append({
@@ -217,6 +217,7 @@ class PortfolioManager:
     def suggest_contribution(self, amount, df_suggestions):
         # Simple logic: Distribute amount to categories with biggest negative deviation (COMPRAR)
         # Prioritize Variable Income if RF > 40% (User rule: "priorizar variável enquanto RF >40%")
+        # The 40% cap is Settings.RF_PRIORITY_CAP_PCT
         
         # Check RF allocation
         rf_row = df_suggestions[df_suggestions['category'] == "Renda Fixa"]
@@ -225,7 +226,7 @@ class PortfolioManager:
         # Filter candidates
         candidates = df_suggestions[df_suggestions['diff'] < 0].copy()
         
-        if rf_pct > 40:
+        if rf_pct > Settings.RF_PRIORITY_CAP_PCT:
             # Exclude RF from contributions
             candidates = candidates[candidates['category'] != "Renda Fixa"]
             
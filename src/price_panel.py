@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+class PricePanel:
+    """
+    Daily closes as a C-contiguous float32 matrix (tickers x dates) on a common
+    calendar, forward-filled across market holidays. Rows are NumPy views, so
+    consumers can read a ticker's history without copying.
+    """
+
+    def __init__(self, tickers, dates, values):
+        self.tickers = list(tickers)
+        self.dates = np.asarray(dates, dtype='datetime64[D]')
+        self.values = np.ascontiguousarray(values, dtype=np.float32)
+        self._index = {ticker: i for i, ticker in enumerate(self.tickers)}
+
+    @classmethod
+    def from_frame(cls, closes):
+        """Builds the panel from a close DataFrame (dates x tickers)."""
+        if closes is None or closes.empty:
+            return cls([], np.array([], dtype='datetime64[D]'), np.empty((0, 0), dtype=np.float32))
+        closes = closes.sort_index().ffill()
+        dates = pd.DatetimeIndex(closes.index).values.astype('datetime64[D]')
+        values = closes.to_numpy(dtype=np.float32, na_value=np.nan).T
+        return cls(closes.columns, dates, values)
+
+    def __contains__(self, ticker):
+        return ticker in self._index
+
+    def __len__(self):
+        return len(self.tickers)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.dates.nbytes
+
+    def row(self, ticker):
+        """Close history of one ticker (a view into the panel)."""
+        return self.values[self._index[ticker]]
+
+    def rows(self, tickers):
+        """Sub-matrix for the given tickers (a view when they are contiguous, else a copy)."""
+        idx = [self._index[t] for t in tickers]
+        if idx and idx == list(range(idx[0], idx[0] + len(idx))):
+            return self.values[idx[0]:idx[0] + len(idx)]
+        return self.values[idx]
+
+    def returns(self, tickers=None):
+        """Simple daily returns (tickers x dates-1); NaN where a price is missing."""
+        prices = self.values if tickers is None else self.rows(tickers)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return prices[:, 1:] / prices[:, :-1] - 1
+
+    def business_days(self):
+        """
+        The panel sampled on weekdays only. Crypto trades every day, so the union
+        calendar would give B3/US assets zero-return weekend rows; on weekdays the
+        weekend crypto move lands in Monday's return instead.
+        """
+        mask = np.is_busday(self.dates)
+        if mask.all():
+            return self
+        return PricePanel(self.tickers, self.dates[mask], self.values[:, mask])
+
+    def to_frame(self):
+        return pd.DataFrame(self.values.T, index=pd.DatetimeIndex(self.dates), columns=self.tickers, copy=False)
@@ -0,0 +1,86 @@
+import os
+import sqlite3
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+class PriceStore:
+    """Persistent daily close cache (SQLite), keyed by ticker + date."""
+
+    def __init__(self, path="data/prices.db"):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS prices ("
+            " ticker TEXT NOT NULL,"
+            " date TEXT NOT NULL,"
+            " close REAL NOT NULL,"
+            " PRIMARY KEY (ticker, date))"
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def coverage(self, tickers):
+        """Returns {ticker: (first_date, prev_date, last_date)} for cached tickers."""
+        coverage = {}
+        for ticker in tickers:
+            rows = self.conn.execute(
+                "SELECT date FROM prices WHERE ticker = ? ORDER BY date DESC LIMIT 2",
+                (ticker,)
+            ).fetchall()
+            if not rows:
+                continue
+            first = self.conn.execute(
+                "SELECT MIN(date) FROM prices WHERE ticker = ?", (ticker,)
+            ).fetchone()[0]
+            last = rows[0][0]
+            prev = rows[1][0] if len(rows) > 1 else last
+            coverage[ticker] = (first, prev, last)
+        return coverage
+
+    def get_close(self, ticker, date):
+        row = self.conn.execute(
+            "SELECT close FROM prices WHERE ticker = ? AND date = ?", (ticker, date)
+        ).fetchone()
+        return row[0] if row else None
+
+    def upsert(self, closes):
+        """Writes a close panel (dates x tickers) into the store."""
+        if closes is None or closes.empty:
+            return 0
+        dates = pd.DatetimeIndex(closes.index).strftime('%Y-%m-%d')
+        rows = []
+        for ticker in closes.columns:
+            series = pd.Series(closes[ticker].values, index=dates).dropna()
+            rows.extend((ticker, date, float(value)) for date, value in series.items())
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO prices (ticker, date, close) VALUES (?, ?, ?)", rows
+        )
+        self.conn.commit()
+        return len(rows)
+
+    def drop(self, tickers):
+        """Invalidates every cached bar of the given tickers."""
+        self.conn.executemany("DELETE FROM prices WHERE ticker = ?", [(t,) for t in tickers])
+        self.conn.commit()
+
+    def load_closes(self, tickers, start=None):
+        """Returns cached closes as a DataFrame (dates x tickers)."""
+        if not tickers:
+            return pd.DataFrame()
+        placeholders = ",".join("?" * len(tickers))
+        query = f"SELECT ticker, date, close FROM prices WHERE ticker IN ({placeholders})"
+        params = list(tickers)
+        if start:
+            query += " AND date >= ?"
+            params.append(start)
+        df = pd.read_sql_query(query, self.conn, params=params)
+        if df.empty:
+            return pd.DataFrame()
+        panel = df.pivot(index='date', columns='ticker', values='close')
+        panel.index = pd.to_datetime(panel.index)
+        return panel.sort_index()
@@ -0,0 +1,142 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from config.settings import Settings
+from src.portfolio import CATEGORY_MAP
+from src.backtest import RF_CATEGORY, category_returns, allocation_pct, contribution_shares, band_breach
+
+logger = logging.getLogger(__name__)
+
+# Business days in one simulated month
+MONTH_DAYS = 21
+
+# Paths per independent random stream; chunks for the pool are whole streams
+STREAM_PATHS = 5000
+
+
+def monthly_blocks(daily_returns, block=MONTH_DAYS):
+    """
+    Overlapping `block`-day compounded returns (C x W) from business-day returns.
+    Sampling whole windows keeps the historical co-movement between categories.
+    """
+    log_growth = np.log1p(np.asarray(daily_returns, dtype=float))
+    cumulative = np.vstack([np.zeros(log_growth.shape[1]), np.cumsum(log_growth, axis=0)])
+    return np.ascontiguousarray(np.expm1(cumulative[block:] - cumulative[:-block]).T)
+
+
+def path_streams(seed, n_paths):
+    """
+    (SeedSequence, size) per group of up to STREAM_PATHS paths. A path's draws depend
+    only on the seed and its index, not on how the paths are chunked or on the
+    number of workers.
+    """
+    sizes = np.diff(np.r_[np.arange(0, n_paths, STREAM_PATHS), n_paths]).tolist()
+    return list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+
+
+def simulate_paths(blocks, start_holdings, targets, rf_col, months, amount, band_pp, rf_cap_pct, n_paths,
+                   seed=None, streams=None):
+    """
+    Wealth of `n_paths` bootstrapped paths, one (categories x paths) step per
+    month: a random historical month of returns, the suggest_contribution split,
+    then the band rebalance. Returns wealth per path at each month end (months x n_paths).
+    `streams` (from path_streams) overrides `seed`/`n_paths` when simulating one chunk.
+    """
+    streams = streams or path_streams(seed, n_paths)
+    rngs = [(np.random.default_rng(child), size) for child, size in streams]
+    n_paths = sum(size for _, size in streams)
+    targets = np.asarray(targets, dtype=float)
+    target_pct = targets * 100
+    growth = 1 + blocks
+    holdings = np.tile(np.asarray(start_holdings, dtype=float)[:, None], (1, n_paths))
+    idle = np.zeros(n_paths)
+    wealth = np.empty((months, n_paths))
+
+    for m in range(months):
+        draws = np.concatenate([rng.integers(0, growth.shape[1], size) for rng, size in rngs])
+        holdings *= np.take(growth, draws, axis=1)
+
+        _, pct = allocation_pct(holdings)
+        share = contribution_shares(pct, target_pct, rf_col, rf_cap_pct)
+        holdings += share * amount
+        idle += np.where(share.any(axis=0), 0.0, amount)
+
+        total, pct = allocation_pct(holdings)
+        breach = band_breach(pct, target_pct, band_pp) & (total > 0)
+        holdings[:, breach] = targets[:, None] * total[breach]
+
+        np.add(holdings.sum(axis=0), idle, out=wealth[m])
+    return wealth
+
+
+def _simulate_chunk(args):
+    blocks, start_holdings, targets, rf_col, months, amount, band_pp, rf_cap_pct, streams = args
+    return simulate_paths(blocks, start_holdings, targets, rf_col, months, amount, band_pp, rf_cap_pct,
+                          None, streams=streams)
+
+
+def project(blocks, start_holdings, targets, rf_col, years=(5, 10, 20), n_paths=10_000,
+            amount=250.0, band_pp=5.0, rf_cap_pct=40.0, percentiles=(10, 50, 90),
+            max_workers=1, seed=None):
+    """
+    Percentile bands of future wealth at each horizon (nominal BRL). Paths are split
+    into chunks of whole random streams, optionally on a process pool; the same
+    seed gives the same bands for any number of workers.
+    """
+    months = 12 * max(years)
+    streams = path_streams(seed, n_paths)
+    max_workers = max(1, min(max_workers, len(streams)))
+    tasks = [
+        (blocks, start_holdings, targets, rf_col, months, amount, band_pp, rf_cap_pct,
+         [streams[i] for i in chunk])
+        for chunk in np.array_split(np.arange(len(streams)), max_workers)
+    ]
+    if max_workers == 1:
+        wealth = _simulate_chunk(tasks[0])
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            wealth = np.hstack(list(pool.map(_simulate_chunk, tasks)))
+
+    start_value = float(np.sum(start_holdings))
+    horizons = []
+    for year in years:
+        values = np.percentile(wealth[12 * year - 1], percentiles)
+        horizons.append({
+            'years': year,
+            'contributed': start_value + amount * 12 * year,
+            'percentiles': dict(zip(percentiles, values.tolist())),
+        })
+    return {'paths': n_paths, 'start_value': start_value, 'monthly_contribution': amount, 'horizons': horizons}
+
+
+def project_portfolio(portfolio_df, price_panel, portfolio_data, cdi_diario):
+    """
+    Goal projection for the current portfolio from the 1y price panel and Settings.
+    The panel is sampled on business days, so a 21-row block is one calendar month
+    even when crypto puts weekends on the union calendar.
+    """
+    if price_panel is not None:
+        price_panel = price_panel.business_days()
+    if price_panel is None or len(price_panel.dates) <= MONTH_DAYS or portfolio_df.empty:
+        logger.warning("Not enough price history for the goal projection.")
+        return None
+
+    categories = list(Settings.TARGET_ALLOCATION)
+    targets = np.array([Settings.TARGET_ALLOCATION[c] for c in categories])
+    closes = price_panel.to_frame()
+    daily = category_returns(closes, portfolio_data, np.full(len(closes), cdi_diario), categories)
+    blocks = monthly_blocks(daily)
+
+    current = portfolio_df.groupby(portfolio_df['category'].map(CATEGORY_MAP))['value_brl'].sum()
+    start_holdings = current.reindex(categories).fillna(0.0).to_numpy()
+
+    return project(
+        blocks, start_holdings, targets, categories.index(RF_CATEGORY),
+        years=Settings.PROJECTION_YEARS,
+        n_paths=Settings.PROJECTION_PATHS,
+        amount=Settings.MONTHLY_CONTRIBUTION,
+        band_pp=Settings.REBALANCE_BAND_PP,
+        rf_cap_pct=Settings.RF_PRIORITY_CAP_PCT,
+        percentiles=Settings.PROJECTION_PERCENTILES,
+        max_workers=Settings.PROJECTION_MAX_WORKERS
+    )
@@ -0,0 +1,100 @@
+import numpy as np
+
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token)."""
+    return len(text) // 4 + 1
+
+def _history_stats(price_panel, ticker):
+    """' | Topo 12M: x% | DD 12M: y%' from the ticker's row of the price panel (a view)."""
+    if price_panel is None or ticker not in price_panel:
+        return ""
+    closes = price_panel.row(ticker)
+    closes = closes[np.isfinite(closes)]
+    if len(closes) < 2 or closes.max() <= 0:
+        return ""
+    from_high = (closes[-1] / closes.max() - 1) * 100
+    drawdown = (closes / np.maximum.accumulate(closes) - 1).min() * 100
+    return f" | Topo 12M: {from_high:.1f}% | DD 12M: {drawdown:.1f}%"
+
+def _asset_line(item, price_panel=None):
+    return (f"- {item['ticker']} ({item['category']}): R$ {item['value_brl']:.2f} "
+            f"({item['allocation']:.1f}%) | L/P: {item.get('profit_loss_pct', 0):.2f}% | "
+            f"P/L: {item.get('pe', 0):.1f} | ROE: {item.get('roe', 0):.1f}% | Rec: {item.get('recommendation', 'N/A')}"
+            f"{_history_stats(price_panel, item['ticker'])}")
+
+def _category_lines(portfolio_df):
+    df = portfolio_df.assign(weighted_1d=portfolio_df['change_1d'] * portfolio_df['value_brl'])
+    grouped = df.groupby('category').agg(
+        value_brl=('value_brl', 'sum'),
+        allocation=('allocation', 'sum'),
+        count=('ticker', 'size'),
+        weighted_1d=('weighted_1d', 'sum')
+    ).sort_values('value_brl', ascending=False)
+    lines = ["Categorias:"]
+    for category, row in grouped.iterrows():
+        change_1d = row['weighted_1d'] / row['value_brl'] if row['value_brl'] else 0.0
+        lines.append(f"- {category}: R$ {row['value_brl']:.2f} ({row['allocation']:.1f}%) | "
+                     f"{int(row['count'])} ativos | Var. 1D: {change_1d:.2f}%")
+    return lines
+
+def _asset_lines(portfolio_df, k, price_panel=None):
+    """Top-k assets by weight plus top-k by absolute 1D move; the rest in one line."""
+    if k >= len(portfolio_df):
+        selected = portfolio_df
+    else:
+        by_weight = portfolio_df['allocation'].nlargest(k).index
+        by_move = portfolio_df['change_1d'].abs().nlargest(k).index
+        selected = portfolio_df.loc[by_weight.union(by_move)].sort_values('allocation', ascending=False)
+
+    lines = ["Ativos:"]
+    lines.extend(_asset_line(item, price_panel) for item in selected.to_dict(orient='records'))
+
+    rest = portfolio_df.drop(selected.index)
+    if not rest.empty:
+        lines.append(f"- Outros {len(rest)} ativos: R$ {rest['value_brl'].sum():.2f} "
+                     f"({rest['allocation'].sum():.1f}%)")
+    return lines
+
+def _risk_line(risk):
+    beta = f"{risk['beta']:.2f}" if risk.get('beta') is not None else "n/d"
+    top = ", ".join(f"{c['ticker']} {c['pct']:.0f}%" for c in risk['risk_contribution'][:3])
+    return (f"Risco: Vol. a.a. {risk['volatility_pct']:.1f}% | Max DD {risk['max_drawdown_pct']:.1f}% | "
+            f"Beta ({risk.get('benchmark', 'benchmark')}) {beta} | "
+            f"VaR {risk['confidence']:.0%} 1D {risk['var_pct']:.2f}% | "
+            f"CVaR {risk['cvar_pct']:.2f}% | Maiores contribuições de risco: {top}")
+
+def build_portfolio_summary(portfolio_df, total_value, indicators, token_budget=2000, top_k=15, risk=None,
+                            price_panel=None):
+    """
+    Builds the portfolio section of the AI prompt within `token_budget` tokens:
+    totals, indicators, per-category aggregates and the most relevant assets.
+    Small portfolios keep one line per asset; with `price_panel`, asset lines also
+    carry the distance from the 12M high and the 12M max drawdown.
+    """
+    header = [
+        f"Valor Total: R$ {total_value:,.2f}",
+        f"Indicadores: Selic {indicators.get('selic_meta')}% | CDI {indicators.get('cdi')}% | PTAX {indicators.get('ptax_venda')}",
+    ]
+    if risk:
+        header.append(_risk_line(risk))
+    if portfolio_df.empty:
+        return "\n".join(header + ["Ativos:"]) + "\n"
+
+    category_lines = _category_lines(portfolio_df)
+
+    # Tenta a lista completa se a carteira for pequena, depois reduz o top-K até caber
+    candidates = [len(portfolio_df)] if len(portfolio_df) <= 4 * top_k else []
+    k = top_k
+    while k > 0:
+        candidates.append(k)
+        k //= 2
+    candidates.append(0)
+
+    for k in candidates:
+        full_list = k >= len(portfolio_df)
+        lines = header + ([] if full_list else category_lines) + _asset_lines(portfolio_df, k, price_panel)
+        text = "\n".join(lines) + "\n"
+        if estimate_tokens(text) <= token_budget:
+            break
+    return text
@@ -1,10 +1,12 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import os
 import re
-import matplotlib.pyplot as plt
 import io
 import base64
+from config.settings import Settings
+from src.svg_chart import render_donut_svg, render_line_svg
 
 class ReportGenerator:
     def __init__(self):
@@ -62,6 +64,42 @@ class ReportGenerator:
         return report
 
     def generate_allocation_chart(self, portfolio_df):
+        """Returns the allocation chart as a base64 PNG string (inline data URI mode)."""
+        image_png = self.generate_allocation_chart_png(portfolio_df)
+        if not image_png:
+            return ""
+        return base64.b64encode(image_png).decode('utf-8')
+
+    def generate_allocation_chart_svg(self, portfolio_df):
+        """Returns the allocation donut as SVG markup, rendered without matplotlib."""
+        data = portfolio_df.groupby('category')['value_brl'].sum().fillna(0)
+        data = data[data > 0]
+        if data.empty:
+            return ""
+        return render_donut_svg(list(data.items()))
+
+    def generate_history_chart_svg(self, portfolio_df, price_panel):
+        """
+        12-month line of the current market holdings (base 100), weighted by today's
+        value and read straight from the shared price panel. "" without history.
+        """
+        if price_panel is None or len(price_panel) == 0 or portfolio_df.empty:
+            return ""
+        held = portfolio_df[portfolio_df['ticker'].map(lambda t: t in price_panel) & (portfolio_df['value_brl'] > 0)]
+        if held.empty:
+            return ""
+
+        prices = price_panel.rows(held['ticker'].tolist())
+        complete = np.isfinite(prices).all(axis=1) & (prices[:, -1] > 0)
+        if not complete.any():
+            return ""
+        weights = held['value_brl'].to_numpy()[complete]
+        relative = prices[complete] / prices[complete, -1:]
+        series = (weights / weights.sum()) @ relative
+        return render_line_svg(100 * series / series[0], 'Carteira Atual em 12 Meses (base 100)')
+
+    def generate_allocation_chart_png(self, portfolio_df):
+        """Returns the allocation chart as compressed PNG bytes (b"" if there is nothing to plot)."""
         # Agrupa por categoria e preenche NaNs
         data = portfolio_df.groupby('category')['value_brl'].sum().fillna(0)
         
@@ -69,8 +107,13 @@ class ReportGenerator:
         data = data[data > 0]
         
         if data.empty:
-            return ""
+            return b""
         
+        # Import tardio: matplotlib só carrega quando o gráfico é gerado, sempre no backend Agg
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
         # Configurações visuais
         colors_list = ['#ff9999','#66b3ff','#99ff99','#ffcc99', '#c2c2f0', '#ffb3e6', '#c4e17f']
         plt.figure(figsize=(6, 6))
@@ -89,11 +132,6 @@ class ReportGenerator:
         # --- A MÁGICA ACONTECE AQUI ---
         # Em vez de salvar em arquivo, salvamos na memória (buffer)
         buffer = io.BytesIO()
-        plt.savefig(buffer, format='png')
+        plt.savefig(buffer, format='png', dpi=Settings.CHART_DPI, pil_kwargs={'optimize': True})
         plt.close()
-        buffer.seek(0)
-        
-        # Converte para Base64 string
-        image_png = buffer.getvalue()
-        graphic = base64.b64encode(image_png)
-        return graphic.decode('utf-8')
+        return buffer.getvalue()
@@ -0,0 +1,250 @@
+import os
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+
+class RollingMoments:
+    """Running sums of a returns window, so the covariance updates in O(n²) per new day."""
+
+    def __init__(self, n_assets):
+        self.count = 0
+        self.total = np.zeros(n_assets)
+        self.outer = np.zeros((n_assets, n_assets))
+
+    @classmethod
+    def from_matrix(cls, returns):
+        moments = cls(returns.shape[1])
+        moments.count = returns.shape[0]
+        moments.total = returns.sum(axis=0)
+        moments.outer = returns.T @ returns
+        return moments
+
+    def add(self, row):
+        self.count += 1
+        self.total += row
+        self.outer += np.outer(row, row)
+
+    def remove(self, row):
+        self.count -= 1
+        self.total -= row
+        self.outer -= np.outer(row, row)
+
+    def covariance(self):
+        if self.count < 2:
+            return np.zeros_like(self.outer)
+        mean = self.total / self.count
+        return (self.outer - self.count * np.outer(mean, mean)) / (self.count - 1)
+
+def _row_returns(panel, ticker):
+    """Daily simple returns of one ticker from its panel row."""
+    closes = panel.row(ticker).astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return closes[1:] / closes[:-1] - 1
+
+class RiskAnalyzer:
+    """
+    Portfolio risk from a returns matrix (days x assets) and BRL weights: annualized
+    volatility, max drawdown, beta, per-asset risk contribution and 1-day historical
+    VaR/CVaR. The covariance comes from running moments, built once and then slid
+    one day at a time by update(); from_portfolio keeps them between runs.
+
+    `constant` flags columns with no variance by definition (fixed income at the CDI):
+    they enter the moments as zeros, so their covariance is exactly zero.
+    """
+
+    def __init__(self, tickers, returns, weights, benchmark=None, confidence=0.95, moments=None, constant=None):
+        self.tickers = list(tickers)
+        self.returns = np.nan_to_num(np.asarray(returns, dtype=np.float64))
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.benchmark = None if benchmark is None else np.nan_to_num(np.asarray(benchmark, dtype=np.float64))
+        self.confidence = confidence
+        self.constant = np.zeros(len(self.weights), dtype=bool) if constant is None else np.asarray(constant, dtype=bool)
+        self.moments = moments or RollingMoments.from_matrix(self._moment_rows(self.returns))
+        self.portfolio_returns = self.returns @ self.weights
+
+    def _moment_rows(self, returns):
+        return np.where(self.constant, 0.0, returns)
+
+    @property
+    def covariance(self):
+        return self.moments.covariance()
+
+    @classmethod
+    def from_portfolio(cls, panel, portfolio_df, cdi_diario=0.0, benchmark_ticker=None,
+                       usd_ticker="BRL=X", confidence=0.95, state_path=None):
+        """
+        Builds the returns matrix from a PricePanel and the valued portfolio, on business
+        days so the 252-day annualization holds. USD assets are converted to BRL returns
+        with BRL=X; fixed income earns the daily CDI with zero variance. Returns None
+        when there is not enough history.
+
+        With `state_path`, the moments of the previous run are loaded and slid to
+        today's window with update() (only the new days are added), then saved again.
+        """
+        if panel is None or len(panel) == 0 or portfolio_df.empty:
+            return None
+        panel = panel.business_days()
+        if len(panel.dates) < 3:
+            return None
+
+        positions = portfolio_df.groupby('ticker').agg(value_brl=('value_brl', 'sum'), category=('category', 'first'))
+        total = positions['value_brl'].sum()
+        if total <= 0:
+            return None
+
+        n_days = len(panel.dates) - 1
+        fx = _row_returns(panel, usd_ticker) if usd_ticker in panel else np.zeros(n_days)
+
+        columns = []
+        missing = []
+        constant = (positions['category'] == "RENDA_FIXA").to_numpy()
+        for ticker, row in positions.iterrows():
+            if row['category'] == "RENDA_FIXA":
+                columns.append(np.full(n_days, cdi_diario / 100))
+            elif ticker in panel:
+                r = _row_returns(panel, ticker)
+                if row['category'] in ("US_STOCKS", "US_REITS") or \
+                        (row['category'] == "CRYPTO" and not ticker.endswith("-BRL")):
+                    r = (1 + r) * (1 + fx) - 1
+                columns.append(r)
+            else:
+                missing.append(ticker)
+                columns.append(np.zeros(n_days))
+        if missing:
+            logger.warning(f"No price history for {missing}; treated as zero-return in risk metrics.")
+
+        benchmark = None
+        if benchmark_ticker and benchmark_ticker in panel:
+            benchmark = _row_returns(panel, benchmark_ticker)
+
+        returns = np.column_stack(columns)
+        weights = (positions['value_brl'] / total).to_numpy()
+        if not state_path:
+            return cls(positions.index, returns, weights, benchmark=benchmark, confidence=confidence,
+                       constant=constant)
+
+        dates = panel.dates[1:].astype('datetime64[D]')
+        analyzer = cls._from_state(state_path, positions.index, dates, returns, weights, benchmark,
+                                   confidence, constant)
+        if analyzer is None:
+            analyzer = cls(positions.index, returns, weights, benchmark=benchmark, confidence=confidence,
+                           constant=constant)
+        analyzer._save_state(state_path, dates)
+        return analyzer
+
+    @classmethod
+    def _from_state(cls, path, tickers, dates, returns, weights, benchmark, confidence, constant):
+        """
+        Rolls the saved window forward to `dates`: drops the days that left the window and
+        update()s the new ones. None (full rebuild) if there is no usable state, the
+        holdings changed, or any overlapping day was revised (split, adjusted close).
+        """
+        try:
+            if not os.path.exists(path):
+                return None
+            with np.load(path, allow_pickle=False) as state:
+                state = dict(state)
+        except Exception as e:
+            logger.warning(f"Failed to load risk state: {e}")
+            return None
+
+        if list(state['tickers']) != list(tickers) or not np.array_equal(state['constant'], constant) \
+                or bool(state['has_benchmark']) != (benchmark is not None):
+            return None
+        saved_dates = state['dates']
+        start = int(np.searchsorted(saved_dates, dates[0]))
+        overlap = len(saved_dates) - start
+        if overlap < 2 or overlap > len(dates) or not np.array_equal(saved_dates[start:], dates[:overlap]):
+            return None
+        current = np.where(constant, 0.0, np.nan_to_num(returns[:overlap]))
+        if not np.array_equal(state['returns'][start:], current) or (
+                benchmark is not None and not np.array_equal(state['benchmark'][start:], np.nan_to_num(benchmark[:overlap]))):
+            logger.info("Price history revised inside the risk window; rebuilding the covariance.")
+            return None
+
+        moments = RollingMoments(len(tickers))
+        moments.count, moments.total, moments.outer = int(state['count']), state['total'], state['outer']
+        analyzer = cls(tickers, state['returns'], weights, benchmark=state['benchmark'] if benchmark is not None else None,
+                       confidence=confidence, moments=moments, constant=constant)
+        for _ in range(start):
+            analyzer._drop_oldest()
+        for i in range(overlap, len(dates)):
+            analyzer.update(returns[i], None if benchmark is None else benchmark[i], drop_oldest=False)
+
+        # Mesma janela da recomputação completa, com a RF no CDI de hoje
+        analyzer.returns = np.nan_to_num(returns)
+        analyzer.portfolio_returns = analyzer.returns @ analyzer.weights
+        logger.info(f"Risk window rolled forward: {start} days dropped, {len(dates) - overlap} added.")
+        return analyzer
+
+    def _save_state(self, path, dates):
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_path = path + ".tmp.npz"
+            np.savez(
+                tmp_path, tickers=np.array(self.tickers, dtype=str), constant=self.constant, dates=dates,
+                returns=self._moment_rows(self.returns),
+                has_benchmark=self.benchmark is not None,
+                benchmark=self.benchmark if self.benchmark is not None else np.zeros(0),
+                count=self.moments.count, total=self.moments.total, outer=self.moments.outer
+            )
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to save risk state: {e}")
+
+    def _drop_oldest(self):
+        self.moments.remove(self._moment_rows(self.returns[0]))
+        self.returns = self.returns[1:]
+        self.portfolio_returns = self.portfolio_returns[1:]
+        if self.benchmark is not None:
+            self.benchmark = self.benchmark[1:]
+
+    def update(self, new_row, benchmark_return=None, drop_oldest=True):
+        """Adds one day of asset returns (rolling the window if drop_oldest) and refreshes the moments."""
+        new_row = np.nan_to_num(np.asarray(new_row, dtype=np.float64))
+        if drop_oldest and self.returns.shape[0] > 0:
+            self._drop_oldest()
+        self.moments.add(self._moment_rows(new_row))
+        self.returns = np.vstack([self.returns, new_row])
+        self.portfolio_returns = np.append(self.portfolio_returns, new_row @ self.weights)
+        if self.benchmark is not None:
+            self.benchmark = np.append(self.benchmark, 0.0 if benchmark_return is None else benchmark_return)
+
+    def compute(self):
+        w = self.weights
+        marginal = self.covariance @ w
+        variance = float(w @ marginal)
+        port = self.portfolio_returns
+
+        # Max drawdown da curva acumulada
+        curve = np.cumprod(1 + port)
+        drawdown = curve / np.maximum.accumulate(curve) - 1
+
+        # VaR/CVaR histórico de 1 dia
+        var = -float(np.percentile(port, (1 - self.confidence) * 100)) if len(port) else 0.0
+        tail = port[port <= -var]
+        cvar = -float(tail.mean()) if len(tail) else var
+
+        beta = None
+        if self.benchmark is not None and len(self.benchmark) > 1:
+            bench_var = float(np.var(self.benchmark, ddof=1))
+            if bench_var > 0:
+                beta = float(np.cov(port, self.benchmark, ddof=1)[0, 1] / bench_var)
+
+        contribution = w * marginal / variance if variance > 0 else np.zeros_like(w)
+        order = np.argsort(-contribution)
+
+        return {
+            "volatility_pct": float(np.sqrt(max(variance, 0.0) * TRADING_DAYS) * 100),
+            "max_drawdown_pct": float(drawdown.min() * 100) if len(drawdown) else 0.0,
+            "beta": beta,
+            "var_pct": var * 100,
+            "cvar_pct": cvar * 100,
+            "confidence": self.confidence,
+            "risk_contribution": [
+                {"ticker": self.tickers[i], "pct": float(contribution[i] * 100)} for i in order
+            ],
+        }
@@ -1,61 +1,188 @@
-import pandas as pd
+import os
+import io
+import json
+import hashlib
 import logging
+import threading
+import requests
+import pandas as pd
 from config.settings import Settings
 
 logger = logging.getLogger(__name__)
 
 class SheetsManager:
+    # Parsed portfolios already built in this process, keyed by CSV content hash
+    _parsed_memo = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _cache_paths(url):
+        key = hashlib.sha1(url.encode()).hexdigest()[:16]
+        base = os.path.join(Settings.SHEETS_CACHE_DIR, key)
+        return base + ".csv", base + ".meta.json"
+
+    @staticmethod
+    def _load_meta(meta_path):
+        try:
+            if os.path.exists(meta_path):
+                with open(meta_path, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.warning(f"Failed to read sheet cache metadata: {e}")
+        return {}
+
+    @staticmethod
+    def _fetch_csv(url, csv_path, meta):
+        """
+        Downloads the published CSV, revalidating the local copy with ETag/Last-Modified.
+        Returns the CSV bytes; on 304 or network failure the cached copy is used.
+        """
+        has_copy = os.path.exists(csv_path)
+        headers = {}
+        if has_copy:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        try:
+            response = requests.get(url, headers=headers, timeout=Settings.SHEETS_TIMEOUT)
+            if response.status_code == 304 and has_copy:
+                logger.info("Planilha não modificada (304), usando cópia local.")
+                with open(csv_path, 'rb') as f:
+                    return f.read()
+            response.raise_for_status()
+        except Exception as e:
+            if not has_copy:
+                raise
+            logger.warning(f"Failed to download sheet ({e}), using local copy.")
+            with open(csv_path, 'rb') as f:
+                return f.read()
+
+        content = response.content
+        os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+        with open(csv_path, 'wb') as f:
+            f.write(content)
+        meta['etag'] = response.headers.get('ETag')
+        meta['last_modified'] = response.headers.get('Last-Modified')
+        return content
+
+    @staticmethod
+    def _clean_number(values):
+        """Brazilian-formatted numbers ('R$ 1.234,56') to floats; NaN when invalid."""
+        return pd.to_numeric(
+            values.astype(str)
+            .str.replace('R$', '', regex=False)
+            .str.replace(' ', '', regex=False)
+            .str.replace('.', '', regex=False)
+            .str.replace(',', '.', regex=False),
+            errors='coerce'
+        )
+
     @staticmethod
-    def get_portfolio_from_sheets():
-        """Reads portfolio data from Google Sheets CSV."""
-        url = Settings.SHEET_CSV_URL
+    def _parse_portfolio(content):
+        """Parses the sheet CSV into the portfolio list with vectorized string cleaning."""
+        df = pd.read_csv(io.BytesIO(content), dtype=str)
+        
+        # Expected columns: Ticker, Quantidade, Categoria, Meta
+        required_cols = ['Ticker', 'Quantidade', 'Categoria', 'Meta']
+        if not all(col in df.columns for col in required_cols):
+            logger.error(f"Missing columns in Sheet. Expected: {required_cols}")
+            return []
+
+        tickers = df['Ticker'].astype(str).str.strip().str.upper()
+
+        # Clean Quantity (remove R$, dots, replace comma with dot)
+        qty = SheetsManager._clean_number(df['Quantidade'])
+        invalid = qty.isna() & df['Quantidade'].notna()
+        for ticker, raw in zip(tickers[invalid], df.loc[invalid, 'Quantidade']):
+            logger.warning(f"Invalid quantity for {ticker}: {raw}")
+
+        # Clean Meta (Target Allocation)
+        meta = pd.to_numeric(
+            df['Meta'].astype(str)
+            .str.replace('%', '', regex=False)
+            .str.replace(' ', '', regex=False)
+            .str.replace(',', '.', regex=False),
+            errors='coerce'
+        ).fillna(0.0)
+
+        parsed = pd.DataFrame({
+            "ticker": tickers,
+            "quantity": qty.astype('float64'),
+            "category": df['Categoria'].astype(str).str.strip().str.upper(),
+            "target_pct": meta.astype('float64')
+        })
+        return parsed[parsed['quantity'] > 0].to_dict(orient='records')
+
+    @staticmethod
+    def parse_transactions(content):
+        """
+        Parses rows of the transactions tab (Data, Ticker, Tipo, Quantidade, Preço and the
+        optional Taxas, Moeda, Câmbio) into a DataFrame; `content` includes the header line.
+        """
+        df = pd.read_csv(io.BytesIO(content), dtype=str)
+        required_cols = ['Data', 'Ticker', 'Tipo', 'Quantidade', 'Preço']
+        if not all(col in df.columns for col in required_cols):
+            raise ValueError(f"Missing columns in transactions sheet. Expected: {required_cols}")
+
+        def optional(col):
+            return df[col] if col in df.columns else pd.Series(None, index=df.index, dtype=object)
+
+        return pd.DataFrame({
+            "date": pd.to_datetime(df['Data'].astype(str).str.strip(), dayfirst=True, errors='coerce'),
+            "ticker": df['Ticker'].fillna('').str.strip().str.upper(),
+            "type": df['Tipo'].fillna('').str.strip().str.upper(),
+            "quantity": SheetsManager._clean_number(df['Quantidade']).fillna(0.0),
+            "price": SheetsManager._clean_number(df['Preço']).fillna(0.0),
+            "fees": SheetsManager._clean_number(optional('Taxas')).fillna(0.0),
+            "currency": optional('Moeda').fillna('').astype(str).str.strip().str.upper(),
+            # Câmbio informado na nota; senão usa a PTAX da data
+            "fx": SheetsManager._clean_number(optional('Câmbio'))
+        })
+
+    @staticmethod
+    def get_transactions_csv(url):
+        """Raw CSV bytes of the transactions tab, revalidated like the portfolio sheet."""
+        csv_path, meta_path = SheetsManager._cache_paths(url)
+        meta = SheetsManager._load_meta(meta_path)
+        content = SheetsManager._fetch_csv(url, csv_path, meta)
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+        return content
+
+    @staticmethod
+    def get_portfolio_from_sheets(url=None):
+        """Reads portfolio data from Google Sheets CSV (defaults to Settings.SHEET_CSV_URL)."""
+        url = url or Settings.SHEET_CSV_URL
         if not url:
             logger.error("SHEET_CSV_URL not found in settings.")
             return []
             
         try:
             logger.info("Baixando carteira do Google Sheets...")
-            df = pd.read_csv(url)
-            
-            # Expected columns: Ticker, Quantidade, Categoria, Meta
-            required_cols = ['Ticker', 'Quantidade', 'Categoria', 'Meta']
-            if not all(col in df.columns for col in required_cols):
-                logger.error(f"Missing columns in Sheet. Expected: {required_cols}")
-                return []
-                
-            portfolio = []
-            for _, row in df.iterrows():
-                ticker = str(row['Ticker']).strip().upper()
-                
-                # Clean Quantity (remove R$, dots, replace comma with dot)
-                qty_str = str(row['Quantidade'])
-                qty_str = qty_str.replace('R$', '').replace(' ', '').replace('.', '').replace(',', '.')
-                try:
-                    qty = float(qty_str)
-                except ValueError:
-                    logger.warning(f"Invalid quantity for {ticker}: {row['Quantidade']}")
-                    qty = 0.0
-
-                # Clean Meta (Target Allocation)
-                meta_str = str(row['Meta'])
-                meta_str = meta_str.replace('%', '').replace(' ', '').replace(',', '.')
-                try:
-                    meta = float(meta_str)
-                except ValueError:
-                    meta = 0.0
-                    
-                category = str(row['Categoria']).strip().upper()
-                
-                if qty > 0:
-                    portfolio.append({
-                        "ticker": ticker,
-                        "quantity": qty,
-                        "category": category,
-                        "target_pct": meta
-                    })
+            csv_path, meta_path = SheetsManager._cache_paths(url)
+            meta = SheetsManager._load_meta(meta_path)
+            content = SheetsManager._fetch_csv(url, csv_path, meta)
+            digest = hashlib.sha256(content).hexdigest()
+
+            with SheetsManager._lock:
+                portfolio = SheetsManager._parsed_memo.get(digest)
+            if portfolio is None and meta.get('content_hash') == digest and 'portfolio' in meta:
+                logger.info("Conteúdo da planilha inalterado, reutilizando carteira já processada.")
+                portfolio = meta['portfolio']
+            if portfolio is None:
+                portfolio = SheetsManager._parse_portfolio(content)
+
+            with SheetsManager._lock:
+                SheetsManager._parsed_memo[digest] = portfolio
+            meta['content_hash'] = digest
+            meta['portfolio'] = portfolio
+            with open(meta_path, 'w') as f:
+                json.dump(meta, f)
             
             logger.info(f"Carteira carregada com sucesso: {len(portfolio)} ativos.")
-            return portfolio
+            return [dict(item) for item in portfolio]
             
         except Exception as e:
             logger.error(f"Error reading Google Sheet: {e}")
@@ -0,0 +1,96 @@
+import math
+from xml.sax.saxutils import escape
+
+# Mesma paleta do gráfico matplotlib
+COLORS = ['#ff9999', '#66b3ff', '#99ff99', '#ffcc99', '#c2c2f0', '#ffb3e6', '#c4e17f']
+
+def _point(cx, cy, radius, angle):
+    # Ângulo em graus, anti-horário a partir do eixo x (como o matplotlib)
+    rad = math.radians(angle)
+    return cx + radius * math.cos(rad), cy - radius * math.sin(rad)
+
+def _slice_path(cx, cy, r_outer, r_inner, start, end):
+    large = 1 if end - start > 180 else 0
+    ox0, oy0 = _point(cx, cy, r_outer, start)
+    ox1, oy1 = _point(cx, cy, r_outer, end)
+    ix1, iy1 = _point(cx, cy, r_inner, end)
+    ix0, iy0 = _point(cx, cy, r_inner, start)
+    return (
+        f"M{ox0:.2f},{oy0:.2f}"
+        f"A{r_outer},{r_outer} 0 {large} 0 {ox1:.2f},{oy1:.2f}"
+        f"L{ix1:.2f},{iy1:.2f}"
+        f"A{r_inner},{r_inner} 0 {large} 1 {ix0:.2f},{iy0:.2f}Z"
+    )
+
+def render_donut_svg(items, title='Alocação Atual da Carteira', size=360, hole=0.70):
+    """
+    Renders a donut chart as an SVG string from [(label, value)] pairs, with
+    slices counter-clockwise from 12 o'clock, labels outside and percentages on the ring.
+    """
+    items = [(label, float(value)) for label, value in items if value > 0]
+    total = sum(value for _, value in items)
+    if total <= 0:
+        return ""
+
+    title_height = 30
+    cx = size / 2
+    cy = title_height + size / 2
+    r_outer = size * 0.30
+    r_inner = r_outer * hole
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size + title_height}" '
+        f'viewBox="0 0 {size} {size + title_height}" font-family="Helvetica, Arial, sans-serif">',
+        f'<text x="{cx}" y="20" text-anchor="middle" font-size="15">{escape(title)}</text>',
+    ]
+
+    angle = 90.0
+    for i, (label, value) in enumerate(items):
+        share = value / total
+        sweep = share * 360
+        color = COLORS[i % len(COLORS)]
+        if sweep >= 359.999:
+            # Fatia única: anel completo
+            parts.append(
+                f'<circle cx="{cx}" cy="{cy}" r="{(r_outer + r_inner) / 2:.2f}" fill="none" '
+                f'stroke="{color}" stroke-width="{r_outer - r_inner:.2f}"/>'
+            )
+        else:
+            parts.append(f'<path d="{_slice_path(cx, cy, r_outer, r_inner, angle, angle + sweep)}" fill="{color}"/>')
+
+        mid = angle + sweep / 2
+        px, py = _point(cx, cy, r_outer * 0.85, mid)
+        lx, ly = _point(cx, cy, r_outer * 1.15, mid)
+        anchor = "start" if math.cos(math.radians(mid)) >= 0 else "end"
+        parts.append(f'<text x="{px:.1f}" y="{py + 4:.1f}" text-anchor="middle" font-size="11">{share * 100:.1f}%</text>')
+        parts.append(f'<text x="{lx:.1f}" y="{ly + 4:.1f}" text-anchor="{anchor}" font-size="12">{escape(str(label))}</text>')
+        angle += sweep
+
+    parts.append('</svg>')
+    return "".join(parts)
+
+def render_line_svg(values, title, width=360, height=160):
+    """Renders a series as an SVG polyline with its first, min and max values labelled."""
+    values = [float(v) for v in values]
+    if len(values) < 2:
+        return ""
+
+    title_height = 30
+    pad = 10
+    low, high = min(values), max(values)
+    span = (high - low) or 1.0
+    step = (width - 2 * pad) / (len(values) - 1)
+    points = " ".join(
+        f"{pad + i * step:.1f},{title_height + pad + (high - v) / span * (height - 2 * pad):.1f}"
+        for i, v in enumerate(values)
+    )
+    color = COLORS[2] if values[-1] >= values[0] else COLORS[0]
+    return "".join([
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height + title_height}" '
+        f'viewBox="0 0 {width} {height + title_height}" font-family="Helvetica, Arial, sans-serif">',
+        f'<text x="{width / 2}" y="20" text-anchor="middle" font-size="15">{escape(title)}</text>',
+        f'<polyline points="{points}" fill="none" stroke="{color}" stroke-width="2"/>',
+        f'<text x="{pad}" y="{title_height + height - 2}" font-size="11">{values[0]:.0f}</text>',
+        f'<text x="{width - pad}" y="{title_height + 12}" text-anchor="end" font-size="11">'
+        f'máx {high:.0f} | mín {low:.0f} | hoje {values[-1]:.0f}</text>',
+        '</svg>',
+    ])
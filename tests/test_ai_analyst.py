@@ -0,0 +1,71 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from config.settings import Settings
+from src.ai_analyst import AIAnalyst
+
+
+class FakeModels:
+    """Stands in for client.models: per-model latency or error, records every call."""
+
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.calls = []
+
+    def generate_content(self, model, contents, config=None):
+        self.calls.append((model, config.http_options.timeout))
+        latency, error = self.behaviour[model]
+        time.sleep(latency)
+        if error:
+            raise error
+        return SimpleNamespace(text=f"análise de {model}")
+
+
+@pytest.fixture
+def analyst(monkeypatch, tmp_path):
+    monkeypatch.setattr(Settings, "GEMINI_API_KEY", None)
+    monkeypatch.setattr(Settings, "AI_CACHE_PATH", str(tmp_path / "ai.json"))
+    monkeypatch.setattr(Settings, "AI_STREAMING", False)
+    monkeypatch.setattr(Settings, "AI_HEDGE_DELAY_SECONDS", 0.2)
+    monkeypatch.setattr(Settings, "AI_DEADLINE_SECONDS", 1.0)
+    analyst = AIAnalyst()
+    analyst.models_to_try = ["primary", "backup"]
+    return analyst
+
+
+def use_models(analyst, behaviour):
+    analyst.client = SimpleNamespace(models=FakeModels(behaviour))
+    return analyst.client.models
+
+
+def test_slow_primary_is_hedged(analyst):
+    models = use_models(analyst, {"primary": (0.8, None), "backup": (0.05, None)})
+    start = time.monotonic()
+    model_id, text, _ = analyst._generate_hedged("prompt")
+    assert (model_id, text) == ("backup", "análise de backup")
+    assert time.monotonic() - start < 0.5
+    # Cada chamada leva o tempo restante do prazo como timeout HTTP
+    timeouts = dict(models.calls)
+    assert 0 < timeouts["backup"] < timeouts["primary"] <= 1000
+
+
+def test_failed_primary_falls_back_immediately(analyst):
+    use_models(analyst, {"primary": (0.0, RuntimeError("429")), "backup": (0.0, None)})
+    start = time.monotonic()
+    model_id, _, _ = analyst._generate_hedged("prompt")
+    assert model_id == "backup"
+    assert time.monotonic() - start < Settings.AI_HEDGE_DELAY_SECONDS
+
+
+def test_deadline_gives_up(analyst):
+    use_models(analyst, {"primary": (3.0, None), "backup": (3.0, None)})
+    start = time.monotonic()
+    assert analyst._generate_hedged("prompt") is None
+    assert time.monotonic() - start < 1.5
+
+
+def test_all_models_failing_returns_none(analyst):
+    use_models(analyst, {"primary": (0.0, ValueError("x")), "backup": (0.0, ValueError("y"))})
+    assert analyst._generate_hedged("prompt") is None
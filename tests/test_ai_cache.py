@@ -0,0 +1,97 @@
+import pytest
+
+from config.settings import Settings
+from src import ai_cache
+from src.ai_cache import AIResponseCache, normalize_prompt
+
+PROMPT = "Valor Total: R$ 10,000.00\nIndicadores: Selic 10.5% | CDI 10.4%\n- PETR4.SA: R$ 4000.00 (40.0%)"
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ai_cache.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return AIResponseCache(str(tmp_path / "ai.json"), ttl_seconds=3600, max_entries=3)
+
+
+def test_hit_and_miss(cache, tmp_path):
+    assert cache.lookup(["m1"], PROMPT) == (None, None)
+    cache.put("m1", PROMPT, "análise", latency=2.5)
+    cache.save()
+
+    # Espaços diferentes, mesmo prompt; e um novo processo lendo do disco
+    reloaded = AIResponseCache(str(tmp_path / "ai.json"), ttl_seconds=3600)
+    assert reloaded.lookup(["m1"], "  " + PROMPT.replace("\n", "\n   ")) == ("m1", "análise")
+    assert cache.lookup(["m1"], PROMPT.replace("10.5%", "11.0%")) == (None, None)
+    assert cache.stats() == {"hits": 0, "misses": 2, "hit_rate": 0.0, "saved_seconds": 0.0}
+    assert reloaded.stats()["saved_seconds"] == 2.5
+
+
+def test_ttl_expiry(cache, clock):
+    cache.put("m1", PROMPT, "análise", latency=1.0)
+    clock.now += 3599
+    assert cache.lookup(["m1"], PROMPT) == ("m1", "análise")
+    clock.now += 2
+    assert cache.lookup(["m1"], PROMPT) == (None, None)
+
+
+def test_lru_eviction_above_max_entries(monkeypatch, tmp_path, clock):
+    monkeypatch.setattr(Settings, "AI_CACHE_MAX_ENTRIES", 3)
+    cache = AIResponseCache(str(tmp_path / "ai.json"), 3600, max_entries=Settings.AI_CACHE_MAX_ENTRIES)
+    for i in range(3):
+        cache.put("m1", f"prompt {i}", f"r{i}", latency=1.0)
+    # Usar o 0 o torna o mais recente; o 1 é o primeiro a sair
+    cache.lookup(["m1"], "prompt 0")
+    cache.put("m1", "prompt 3", "r3", latency=1.0)
+
+    assert len(cache.entries) == 3
+    assert cache.lookup(["m1"], "prompt 1") == (None, None)
+    assert cache.lookup(["m1"], "prompt 0") == ("m1", "r0")
+
+
+def test_model_ids_are_separate(cache):
+    cache.put("backup", PROMPT, "do backup", latency=1.0)
+    assert cache.lookup(["primary"], PROMPT) == (None, None)
+    # Na ordem de preferência, a primeira entrada viva vale
+    assert cache.lookup(["primary", "backup"], PROMPT) == ("backup", "do backup")
+    cache.put("primary", PROMPT, "do primary", latency=1.0)
+    assert cache.lookup(["primary", "backup"], PROMPT) == ("primary", "do primary")
+
+
+def test_tolerance_matches_within_one_percent(tmp_path, clock):
+    cache = AIResponseCache(str(tmp_path / "ai.json"), 3600, tolerance=0.01)
+    cache.put("m1", "Valor Total: R$ 10,000.00 | Selic 10.50%", "análise", latency=1.0)
+    assert cache.lookup(["m1"], "Valor Total: R$ 10,020.00 | Selic 10.52%") == ("m1", "análise")
+    assert cache.lookup(["m1"], "Valor Total: R$ 10,500.00 | Selic 10.50%") == (None, None)
+
+
+@pytest.mark.parametrize("a, b", [("1.0", "1.049"), ("100.00", "98.50"), ("-2.0%", "2.0%")])
+def test_tolerance_keeps_values_apart_beyond_it(a, b):
+    assert normalize_prompt(f"Var. {a}", 0.01) != normalize_prompt(f"Var. {b}", 0.01)
+
+
+def test_tolerance_buckets_are_narrower_than_it():
+    values = [1.0 + i * 0.0005 for i in range(200)]
+    keys = [normalize_prompt(f"R$ {v:.4f}", 0.01) for v in values]
+    for key in set(keys):
+        same = [v for v, k in zip(values, keys) if k == key]
+        assert max(same) / min(same) - 1 < 0.01
+
+
+def test_tolerance_leaves_dates_years_counts_and_tickers_alone():
+    text = "Relatório de 17/10/2026 (2026): PETR4 e PETR3, 30 ativos, Topo 12M"
+    assert normalize_prompt(text, 0.01) == text
+    assert normalize_prompt("PETR4 R$ 30.00", 0.01) != normalize_prompt("PETR3 R$ 30.00", 0.01)
@@ -0,0 +1,136 @@
+import itertools
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from config.settings import Settings
+from src import indicators_service
+from src.backtest import RF_CATEGORY, business_days, load_cdi_daily, run_grid, simulate
+from src.portfolio import CATEGORY_MAP, PortfolioManager
+
+HOLIDAY = pd.Timestamp("2024-11-15")
+
+
+@pytest.fixture
+def fake_sgs(monkeypatch, tmp_path):
+    """SGS stand-in: CDI of 0.04% a.d. on business days except one holiday; records each query."""
+    calls = []
+
+    def get(codes, start, end):
+        calls.append((dict(codes), start, end))
+        dates = pd.bdate_range(start, end).drop(HOLIDAY, errors="ignore")
+        return pd.DataFrame({name: 0.04 for name in codes}, index=dates)
+
+    monkeypatch.setattr(Settings, "INDICATORS_STORE_PATH", str(tmp_path / "indicators.json"))
+    monkeypatch.setattr(indicators_service, "sgs", SimpleNamespace(get=get))
+    return calls
+
+
+def test_business_days_drop_weekends():
+    closes = pd.DataFrame({"BTC-BRL": 1.0}, index=pd.date_range("2024-01-01", periods=14, freq="D"))
+    assert len(business_days(closes)) == 10
+
+
+def test_cdi_history_is_downloaded_once_for_the_window(fake_sgs):
+    dates = pd.bdate_range("2015-01-02", "2024-12-31")
+    cdi = load_cdi_daily(dates)
+
+    # Store vazio: da janela até hoje, em consultas de até 5 anos e só da série 12
+    assert fake_sgs[0][1] == "2015-01-02"
+    assert all(codes == {'cdi': 12} for codes, _, _ in fake_sgs)
+    assert all(pd.Timestamp(end) - pd.Timestamp(start) <= pd.Timedelta(days=5 * 365) for _, start, end in fake_sgs)
+    downloads = len(fake_sgs)
+    assert cdi[dates.get_loc(HOLIDAY)] == 0.0
+    assert (np.delete(cdi, dates.get_loc(HOLIDAY)) == 0.04).all()
+
+    # Próxima execução: a janela já está no store
+    load_cdi_daily(dates[-500:])
+    load_cdi_daily(dates)
+    assert len(fake_sgs) == downloads
+
+
+def test_fixed_income_accrues_per_business_day():
+    per_year = 261
+    returns = np.full((per_year + 1, 1), 0.0004)
+    result = simulate(returns, np.r_[True, np.zeros(per_year, bool)], [1.0], 0,
+                      bands=[5.0], amounts=[0.0], rf_caps=[100.0], initial=1000.0,
+                      periods_per_year=per_year)
+    assert result['twr_annual_pct'][0] == pytest.approx((1.0004 ** per_year - 1) * 100)
+    assert result['volatility_pct'][0] == pytest.approx(0.0, abs=1e-9)
+
+
+CATEGORIES = list(Settings.TARGET_ALLOCATION)
+TARGETS = np.array([Settings.TARGET_ALLOCATION[c] for c in CATEGORIES])
+CODES = {category: code for code, category in CATEGORY_MAP.items()}
+
+
+def replay(returns, contribution_days, band, amount, rf_cap, initial, monkeypatch):
+    """The report's own rules, one day at a time, through PortfolioManager."""
+    monkeypatch.setattr(Settings, "REBALANCE_BAND_PP", band)
+    monkeypatch.setattr(Settings, "RF_PRIORITY_CAP_PCT", rf_cap)
+    manager = PortfolioManager([], {}, {}, history_store=object())
+    holdings = TARGETS * initial
+    idle, rebalances, rf_skipped = 0.0, 0, 0
+
+    def suggestions():
+        df = pd.DataFrame({"category": [CODES[c] for c in CATEGORIES], "value_brl": holdings})
+        return manager.get_rebalancing_suggestions(df, holdings.sum())
+
+    for t in range(len(returns)):
+        if t > 0:
+            holdings = holdings * (1 + returns[t])
+        if contribution_days[t]:
+            current = suggestions()
+            contribution = manager.suggest_contribution(amount, current)
+            if isinstance(contribution, str):
+                idle += amount
+            else:
+                for category, value in zip(contribution['category'], contribution['contribution']):
+                    holdings[CATEGORIES.index(category)] += value
+                rf = current.set_index('category').loc[RF_CATEGORY]
+                rf_skipped += rf['diff'] < 0 and RF_CATEGORY not in set(contribution['category'])
+        if (suggestions()['status'] != "OK").any():
+            holdings = TARGETS * holdings.sum()
+            rebalances += 1
+    return holdings.sum() + idle, rebalances, rf_skipped
+
+
+def test_simulate_matches_a_day_by_day_replay_of_the_portfolio_rules(monkeypatch):
+    rng = np.random.default_rng(7)
+    n_days = 252
+    vol = np.array([0.0, 0.015, 0.012, 0.01, 0.013, 0.014, 0.04])
+    returns = rng.normal(0.0003, vol, (n_days, len(CATEGORIES)))
+    returns[:, CATEGORIES.index(RF_CATEGORY)] = 0.0004
+    contribution_days = np.arange(n_days) % 21 == 0
+    # Banda estreita (rebalanceia), teto de RF abaixo da meta (RF fica fora do aporte) e banda larga
+    params = [(5.0, 250.0, 40.0), (3.0, 500.0, 30.0), (100.0, 250.0, 30.0), (10.0, 1000.0, 50.0)]
+
+    result = simulate(returns, contribution_days, TARGETS, CATEGORIES.index(RF_CATEGORY),
+                      *np.array(params).T, initial=10_000.0)
+
+    replays = [replay(returns, contribution_days, *p, 10_000.0, monkeypatch) for p in params]
+    for i, (final_value, rebalances, _) in enumerate(replays):
+        assert result['final_value'][i] == pytest.approx(final_value, rel=1e-9)
+        assert result['rebalances'][i] == rebalances
+    assert replays[1][1] > 0 and replays[2][1] == 0
+    assert replays[1][2] > 0
+
+
+def test_ten_year_sweep_of_1000_parameter_sets():
+    rng = np.random.default_rng(8)
+    n_days = 10 * 252
+    returns = rng.normal(0.0003, 0.012, (n_days, len(CATEGORIES)))
+    contribution_days = np.arange(n_days) % 21 == 0
+    grid = list(itertools.product(np.linspace(1, 20, 10), np.linspace(100, 1000, 10), np.linspace(20, 65, 10)))
+
+    start = time.perf_counter()
+    results = run_grid(returns, contribution_days, TARGETS, CATEGORIES.index(RF_CATEGORY), grid, max_workers=1)
+    elapsed = time.perf_counter() - start
+
+    print(f"\n10 years x {len(grid)} parameter sets: {elapsed:.2f}s")
+    assert len(results) == 1000
+    # Meta do pedido: "em minutos" num notebook; ~0,2 s aqui num só processo, folga para CI lento
+    assert elapsed < 10
@@ -0,0 +1,43 @@
+import importlib
+import random
+
+import pytest
+
+from src.pipeline import Pipeline
+
+
+@pytest.fixture
+def main(monkeypatch, tmp_path):
+    # main.py configura logs/ no import; fica fora do repositório
+    monkeypatch.chdir(tmp_path)
+    return importlib.import_module("main")
+
+
+def family(n_portfolios, pool=60, per_portfolio=30, seed=0):
+    rng = random.Random(seed)
+    tickers = [f"T{i}.SA" for i in range(pool)]
+    return {
+        f"p{n}": [{"ticker": t, "category": "BR_STOCKS", "quantity": 1.0} for t in rng.sample(tickers, per_portfolio)]
+        for n in range(n_portfolios)
+    }
+
+
+@pytest.mark.parametrize("n_portfolios", [10, 100])
+def test_batch_fetches_the_union_once(main, monkeypatch, n_portfolios):
+    sheets = family(n_portfolios)
+    fetched = []
+    monkeypatch.setattr(main, "load_portfolio", lambda config: sheets[config['name']])
+    monkeypatch.setattr(main, "fetch_market_data", lambda universe: fetched.append(len(universe)) or {})
+    monkeypatch.setattr(main, "fetch_indicators", lambda: {})
+    monkeypatch.setattr(main, "fetch_news", lambda universe: "")
+    monkeypatch.setattr(main, "load_ledger", lambda config, portfolio_data, indicators: None)
+    monkeypatch.setattr(main, "compute_portfolio", lambda *args: None)
+
+    configs = [{"name": name, "email_receiver": ""} for name in sheets]
+    Pipeline(main.build_stages(configs), max_workers=4).run()
+
+    separate_runs = sum(len(portfolio) for portfolio in sheets.values())
+    union = len({item['ticker'] for portfolio in sheets.values() for item in portfolio})
+    print(f"\n{n_portfolios} portfolios: {fetched[0]} tickers fetched once vs {separate_runs} in separate runs "
+          f"({1 - fetched[0] / separate_runs:.0%} fewer)")
+    assert fetched == [union]
@@ -0,0 +1,105 @@
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from config.settings import Settings
+from src.contribution_solver import lot_step, solve_contribution
+
+CATEGORIES = ["BR_STOCKS", "FIIS", "US_STOCKS", "CRYPTO", "RENDA_FIXA"]
+
+
+@pytest.fixture(autouse=True)
+def steps(monkeypatch):
+    monkeypatch.setattr(Settings, "B3_FRACTIONAL", False)
+    monkeypatch.setattr(Settings, "B3_STANDARD_LOT", 100)
+    monkeypatch.setattr(Settings, "CRYPTO_DECIMALS", 6)
+    monkeypatch.setattr(Settings, "US_FRACTIONAL_DECIMALS", 0)
+    monkeypatch.setattr(Settings, "RF_STEP_BRL", 0.01)
+
+
+def book(n, rng, categories=CATEGORIES):
+    category = rng.choice(categories, n)
+    return pd.DataFrame({
+        "ticker": [f"T{i}.SA" if c in ("BR_STOCKS", "FIIS") else f"T{i}" for i, c in enumerate(category)],
+        "category": category,
+        "value_brl": rng.uniform(0, 20_000, n),
+        "unit_price_brl": np.where(category == "RENDA_FIXA", 1.0, rng.uniform(5, 500, n)),
+        "target_pct": rng.uniform(0, 30, n),
+    })
+
+
+def squared_distance(assets, spent_by_ticker, budget):
+    """Objective the solver minimizes: distance from the target values after the contribution."""
+    assets = assets[(assets['target_pct'] > 0) & (assets['unit_price_brl'] > 0)]
+    targets = assets['target_pct'] / assets['target_pct'].sum() * (assets['value_brl'].sum() + budget)
+    after = assets['value_brl'] + assets['ticker'].map(spent_by_ticker).fillna(0.0)
+    return float(((after - targets) ** 2).sum())
+
+
+def test_budget_and_whole_lots_on_random_books():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        assets = book(int(rng.integers(1, 30)), rng)
+        budget = float(rng.uniform(0, 50_000))
+        orders, leftover = solve_contribution(assets, budget)
+
+        spent = orders['cost_brl'].sum()
+        assert spent <= budget + 1e-6
+        assert leftover == pytest.approx(budget - spent, abs=1e-6)
+        for order in orders.to_dict(orient='records'):
+            lots = order['quantity'] / lot_step(order['ticker'], order['category'])
+            assert lots >= 1 and lots == pytest.approx(round(lots), abs=1e-6)
+            assert order['cost_brl'] == pytest.approx(order['quantity'] * order['unit_price_brl'])
+
+        # Convergiu: nenhum lote que ainda caiba no caixa melhoraria a distância da meta
+        distance = squared_distance(assets, dict(zip(orders['ticker'], orders['cost_brl'])), budget)
+        for asset in assets[(assets['target_pct'] > 0)].to_dict(orient='records'):
+            cost = lot_step(asset['ticker'], asset['category']) * asset['unit_price_brl']
+            if cost <= leftover:
+                spent = dict(zip(orders['ticker'], orders['cost_brl']))
+                spent[asset['ticker']] = spent.get(asset['ticker'], 0.0) + cost
+                assert squared_distance(assets, spent, budget) >= distance - 1e-6
+
+
+def brute_force(assets, budget):
+    """Best objective over every affordable combination of whole lots."""
+    step = np.array([lot_step(t, c) for t, c in zip(assets['ticker'], assets['category'])])
+    lot_cost = step * assets['unit_price_brl'].to_numpy()
+    targets = assets['target_pct'].to_numpy() / assets['target_pct'].sum() * (assets['value_brl'].sum() + budget)
+    grid = np.array(list(itertools.product(*[range(int(budget // cost) + 1) for cost in lot_cost])))
+    spent = grid * lot_cost
+    distance = ((assets['value_brl'].to_numpy() + spent - targets) ** 2).sum(axis=1)
+    return distance[spent.sum(axis=1) <= budget].min()
+
+
+def test_near_optimal_against_brute_force():
+    rng = np.random.default_rng(1)
+    gaps = []
+    for _ in range(100):
+        # Lotes de 100 ações: poucas combinações por ativo, dá para enumerar tudo
+        assets = book(4, rng, categories=["BR_STOCKS"])
+        assets['unit_price_brl'] = rng.uniform(5, 60, 4)
+        budget = float(rng.uniform(1_000, 15_000))
+        orders, _ = solve_contribution(assets, budget)
+
+        solved = squared_distance(assets, dict(zip(orders['ticker'], orders['cost_brl'])), budget)
+        optimum = brute_force(assets, budget)
+        gaps.append(solved / optimum - 1)
+
+    print(f"\n100 4-asset cases: mean gap {np.mean(gaps):.3%}, worst {max(gaps):.3%}")
+    assert max(gaps) <= 0.02
+    assert np.mean(gaps) <= 0.005
+
+
+@pytest.mark.parametrize("n_assets", [50, 500])
+def test_solver_benchmark(n_assets):
+    assets = book(n_assets, np.random.default_rng(2))
+    start = time.perf_counter()
+    orders, leftover = solve_contribution(assets, 100_000.0)
+    seconds = time.perf_counter() - start
+    print(f"\n{n_assets} assets: {len(orders)} orders, R$ {leftover:.2f} left, {seconds * 1000:.1f} ms")
+    assert orders['cost_brl'].sum() <= 100_000.0 + 1e-6
+    assert seconds < 2.0
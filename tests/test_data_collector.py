@@ -0,0 +1,151 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from config.settings import Settings
+from src import data_collector
+from src.data_collector import DataCollector
+
+
+class FakeDownload:
+    """Stands in for yf.download: deterministic closes per ticker, counts requests and rows served."""
+
+    def __init__(self):
+        self.requests = []
+        self.rows = 0
+        # Fator por ticker para simular um split/ajuste retroativo
+        self.scale = {}
+
+    def __call__(self, tickers, period=None, start=None, **kwargs):
+        self.requests.append(list(tickers))
+        end = datetime.now()
+        first = end - timedelta(days=365) if period else datetime.strptime(start, '%Y-%m-%d')
+        dates = pd.bdate_range(first.date(), end.date())
+        closes = {t: float(sum(map(ord, t))) * self.scale.get(t, 1.0) for t in tickers}
+        frame = pd.DataFrame(closes, index=dates, dtype=float)
+        self.rows += frame.size
+        frame.columns = pd.MultiIndex.from_product([["Close"], frame.columns])
+        return frame
+
+
+@pytest.fixture
+def fake_download(monkeypatch, tmp_path):
+    fake = FakeDownload()
+    monkeypatch.setattr(data_collector.yf, "download", fake)
+    monkeypatch.setattr(Settings, "PRICE_CACHE_PATH", str(tmp_path / "prices.db"))
+    monkeypatch.setattr(Settings, "PRICE_BATCH_SIZE", 200)
+    return fake
+
+
+def collector(tickers):
+    return DataCollector([{"ticker": t, "category": "BR_STOCKS"} for t in tickers])
+
+
+def test_one_request_for_n_tickers(fake_download):
+    tickers = [f"T{i}.SA" for i in range(50)]
+    panel = collector(tickers)._load_price_panel(tickers)
+
+    assert len(fake_download.requests) == 1
+    assert sorted(fake_download.requests[0]) == sorted(tickers)
+    assert sorted(panel.columns) == sorted(tickers)
+
+
+def test_warm_run_is_one_delta_request(fake_download):
+    tickers = [f"T{i}.SA" for i in range(50)]
+    collector(tickers)._load_price_panel(tickers)
+    collector(tickers)._load_price_panel(tickers)
+    assert len(fake_download.requests) == 2
+
+
+def test_batches_are_chunked(fake_download, monkeypatch):
+    monkeypatch.setattr(Settings, "PRICE_BATCH_SIZE", 20)
+    tickers = [f"T{i}.SA" for i in range(50)]
+    collector(tickers)._load_price_panel(tickers)
+    assert [len(chunk) for chunk in fake_download.requests] == [20, 20, 10]
+
+
+def test_cold_vs_warm_run(fake_download):
+    tickers = [f"T{i}.SA" for i in range(200)]
+
+    start = time.perf_counter()
+    cold = collector(tickers)._load_price_panel(tickers)
+    cold_seconds, cold_rows = time.perf_counter() - start, fake_download.rows
+
+    start = time.perf_counter()
+    warm = collector(tickers)._load_price_panel(tickers)
+    warm_seconds, warm_rows = time.perf_counter() - start, fake_download.rows - cold_rows
+
+    print(f"\ncold: {cold_rows} rows in {cold_seconds:.2f}s | warm: {warm_rows} rows in {warm_seconds:.2f}s")
+    # Regime permanente: poucas barras por ticker em vez de ~250
+    assert warm_rows <= 5 * len(tickers)
+    assert cold_rows >= 250 * len(tickers)
+    pd.testing.assert_frame_equal(cold, warm)
+
+
+def test_revised_history_is_refetched(fake_download):
+    tickers = ["PETR4.SA", "VALE3.SA"]
+    collector(tickers)._load_price_panel(tickers)
+
+    fake_download.scale["PETR4.SA"] = 0.5
+    panel = collector(tickers)._load_price_panel(tickers)
+
+    # Delta para os dois, depois o ticker revisado baixa o ano inteiro de novo
+    assert fake_download.requests[1:] == [tickers, ["PETR4.SA"]]
+    assert (panel["PETR4.SA"] == sum(map(ord, "PETR4.SA")) * 0.5).all()
+
+
+@pytest.fixture
+def fundamentals(monkeypatch, tmp_path):
+    monkeypatch.setattr(Settings, "FUNDAMENTALS_CACHE_PATH", str(tmp_path / "fundamentals.json"))
+    monkeypatch.setattr(Settings, "FUNDAMENTALS_RATE_LIMIT", 0)
+    monkeypatch.setattr(Settings, "FUNDAMENTALS_TIMEOUT", 0.3)
+    monkeypatch.setattr(Settings, "FUNDAMENTALS_STAGE_TIMEOUT", 1.0)
+    release = threading.Event()
+    hanging = set()
+
+    def fetch(self, ticker):
+        if ticker in hanging:
+            release.wait(10)
+            return None
+        return {"dy_12m": 5.0, "p_vp": 1.0, "pe": 8.0, "roe": 20.0,
+                "sector": "Energy", "recommendation": "buy", "name": ticker}
+
+    monkeypatch.setattr(DataCollector, "_fetch_fundamentals", fetch)
+    yield hanging
+    release.set()
+
+
+def test_hung_ticker_times_out_and_falls_back(fundamentals, monkeypatch):
+    monkeypatch.setattr(Settings, "FUNDAMENTALS_MAX_WORKERS", 4)
+    fundamentals.add("HUNG.SA")
+    tickers = ["HUNG.SA", "PETR4.SA", "VALE3.SA"]
+
+    start = time.perf_counter()
+    results = collector(tickers)._fetch_all_fundamentals(tickers)
+    elapsed = time.perf_counter() - start
+
+    assert results["HUNG.SA"] == DataCollector._default_fundamentals("HUNG.SA")
+    assert results["PETR4.SA"]["sector"] == "Energy"
+    assert elapsed < 1.0
+
+
+def test_all_workers_hung_still_finishes(fundamentals, monkeypatch):
+    monkeypatch.setattr(Settings, "FUNDAMENTALS_MAX_WORKERS", 2)
+    tickers = [f"T{i}.SA" for i in range(6)]
+    # Valores antigos no cache para um dos tickers que ficam na fila
+    collector(["T5.SA"])._fetch_all_fundamentals(["T5.SA"])
+    monkeypatch.setattr(data_collector.FundamentalsCache, "get", lambda self, ticker: None)
+    fundamentals.update(tickers)
+
+    start = time.perf_counter()
+    results = collector(tickers)._fetch_all_fundamentals(tickers)
+    elapsed = time.perf_counter() - start
+
+    # Os 2 workers travam; os 4 tickers na fila nunca começam e caem no prazo da etapa
+    assert sorted(results) == tickers
+    assert results["T5.SA"]["stale"] is True and results["T5.SA"]["sector"] == "Energy"
+    assert results["T0.SA"] == DataCollector._default_fundamentals("T0.SA")
+    assert elapsed < 2.0
@@ -0,0 +1,111 @@
+import pytest
+
+from config.settings import Settings
+from src import fundamentals_cache
+from src.data_collector import DataCollector
+from src.fundamentals_cache import FundamentalsCache
+
+DAY = 86400
+FIELDS = {"dy_12m": 5.0, "p_vp": 1.0, "pe": 8.0, "roe": 20.0,
+          "sector": "Energy", "recommendation": "buy", "name": "Petrobras"}
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(fundamentals_cache.time, "time", clock.time)
+    return clock
+
+
+def new_cache(tmp_path, max_entries=500):
+    return FundamentalsCache(str(tmp_path / "fundamentals.json"), Settings.FUNDAMENTALS_TTL, max_entries=max_entries)
+
+
+def test_ttl_expires_per_field(tmp_path, clock):
+    cache = new_cache(tmp_path)
+    cache.put("PETR4.SA", FIELDS)
+    clock.now += 6 * DAY
+    assert cache.get("PETR4.SA") == FIELDS
+
+    # Depois de 7 dias só os campos de mercado vencem; nome e setor valem 30 dias
+    clock.now += 2 * DAY
+    assert cache.get("PETR4.SA") is None
+    assert cache.get_fresh("PETR4.SA") == {"sector": "Energy", "name": "Petrobras"}
+
+    refreshed = {"dy_12m": 6.0, "p_vp": 1.1, "pe": 7.0, "roe": 21.0, "recommendation": "hold"}
+    cache.put("PETR4.SA", refreshed)
+    assert cache.get("PETR4.SA") == dict(FIELDS, **refreshed)
+    # Nome e setor mantêm o carimbo original e vencem no 30º dia
+    assert cache.entries["PETR4.SA"]["fetched_at"]["name"] == clock.now - 8 * DAY
+
+
+def test_lru_eviction_above_cache_size(monkeypatch, tmp_path, clock):
+    monkeypatch.setattr(Settings, "FUNDAMENTALS_CACHE_SIZE", 3)
+    cache = new_cache(tmp_path, max_entries=Settings.FUNDAMENTALS_CACHE_SIZE)
+    for ticker in ["A", "B", "C"]:
+        cache.put(ticker, FIELDS)
+    cache.get("A")
+    cache.put("D", FIELDS)
+    cache.save()
+
+    reloaded = new_cache(tmp_path)
+    assert list(reloaded.entries) == ["C", "A", "D"]
+
+
+def test_counters(tmp_path, clock):
+    cache = new_cache(tmp_path)
+    cache.put("PETR4.SA", FIELDS)
+    cache.get("PETR4.SA")
+    cache.get("VALE3.SA")
+    clock.now += 8 * DAY
+    cache.get("PETR4.SA")
+    cache.get_stale("PETR4.SA")
+    cache.get_stale("VALE3.SA")
+    assert cache.stats() == {"hits": 1, "misses": 2, "stale": 1}
+
+
+@pytest.fixture
+def collector(monkeypatch, tmp_path):
+    monkeypatch.setattr(Settings, "FUNDAMENTALS_CACHE_PATH", str(tmp_path / "fundamentals.json"))
+    monkeypatch.setattr(Settings, "FUNDAMENTALS_RATE_LIMIT", 0)
+    responses = {}
+    monkeypatch.setattr(DataCollector, "_fetch_fundamentals", lambda self, ticker: responses.get(ticker))
+    return DataCollector([{"ticker": "PETR4.SA", "category": "BR_STOCKS"}]), responses
+
+
+def test_fetch_refreshes_only_expired_fields(collector, clock, tmp_path):
+    collector, responses = collector
+    responses["PETR4.SA"] = FIELDS
+    collector._fetch_all_fundamentals(["PETR4.SA"])
+
+    clock.now += 8 * DAY
+    responses["PETR4.SA"] = dict(FIELDS, dy_12m=7.0, name="PETROBRAS PN")
+    result = collector._fetch_all_fundamentals(["PETR4.SA"])
+
+    # Nome ainda válido vem do cache, com o carimbo original
+    assert result["PETR4.SA"] == dict(FIELDS, dy_12m=7.0)
+    stamps = new_cache(tmp_path).entries["PETR4.SA"]["fetched_at"]
+    assert stamps["name"] == stamps["sector"] == clock.now - 8 * DAY
+    assert stamps["dy_12m"] == clock.now
+
+
+def test_failed_fetch_serves_stale(collector, clock):
+    collector, responses = collector
+    responses["PETR4.SA"] = FIELDS
+    collector._fetch_all_fundamentals(["PETR4.SA"])
+
+    clock.now += 8 * DAY
+    responses["PETR4.SA"] = None
+    result = collector._fetch_all_fundamentals(["PETR4.SA"])
+    assert result["PETR4.SA"] == dict(FIELDS, stale=True)
+
+    # Sem nada em cache: valores padrão
+    assert collector._fetch_all_fundamentals(["VALE3.SA"])["VALE3.SA"] == DataCollector._default_fundamentals("VALE3.SA")
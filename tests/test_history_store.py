@@ -0,0 +1,117 @@
+import json
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from src.history_store import HistoryStore
+
+
+def days(n, start=date(2016, 1, 1)):
+    return [(start + timedelta(days=i)).isoformat() for i in range(n)]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = HistoryStore(str(tmp_path / "history.jsonl"), legacy_path=None)
+
+    # Append/reescrita da última linha nunca regravam o arquivo inteiro
+    def no_full_rewrite(history):
+        raise AssertionError("full rewrite")
+    monkeypatch.setattr(store, "_write_all", no_full_rewrite)
+    return store
+
+
+def read_bytes(store):
+    with open(store.path, 'rb') as f:
+        return f.read()
+
+
+def test_new_day_appends_a_single_line(store):
+    store.upsert("2026-10-15", 1000.0)
+    before = read_bytes(store)
+    store.upsert("2026-10-16", 1010.0)
+    after = read_bytes(store)
+
+    assert after.startswith(before)
+    assert after[len(before):] == b'{"date": "2026-10-16", "value": 1010.0}\n'
+    assert store.last_before("2026-10-17") == {"date": "2026-10-16", "value": 1010.0}
+
+
+def test_same_day_upsert_rewrites_only_the_last_line(store):
+    store.upsert("2026-10-15", 1000.0)
+    store.upsert("2026-10-16", 1010.0)
+    prefix = read_bytes(store).split(b"\n")[0] + b"\n"
+    store.upsert("2026-10-16", 1020.5)
+
+    data = read_bytes(store)
+    assert data.startswith(prefix)
+    assert data.count(b"\n") == 2
+    assert store.load_all()[-1] == {"date": "2026-10-16", "value": 1020.5}
+    # last_before ignora o próprio dia
+    assert store.last_before("2026-10-16") == {"date": "2026-10-15", "value": 1000.0}
+
+
+def test_last_line_without_trailing_newline(store):
+    with open(store.path, 'w') as f:
+        f.write('{"date": "2026-10-14", "value": 990.0}\n{"date": "2026-10-15", "value": 1000.0}')
+
+    assert store.last_before("2026-10-16") == {"date": "2026-10-15", "value": 1000.0}
+    store.upsert("2026-10-16", 1010.0)
+    assert [entry['date'] for entry in store.load_all()] == ["2026-10-14", "2026-10-15", "2026-10-16"]
+
+    # Mesma situação, mas atualizando o próprio dia
+    with open(store.path, 'rb+') as f:
+        f.truncate(len(read_bytes(store)) - 1)
+    store.upsert("2026-10-16", 1015.0)
+    assert store.load_all()[-1] == {"date": "2026-10-16", "value": 1015.0}
+    assert read_bytes(store).endswith(b"}\n")
+
+
+def test_legacy_history_json_is_imported_once(tmp_path):
+    legacy = tmp_path / "history.json"
+    legacy.write_text(json.dumps([
+        {"date": "2026-10-02", "value": 1002.0},
+        {"date": "2026-10-01", "value": 1001.0},
+    ]))
+    path = str(tmp_path / "history.jsonl")
+
+    store = HistoryStore(path, str(legacy))
+    assert store.load_all() == [{"date": "2026-10-01", "value": 1001.0}, {"date": "2026-10-02", "value": 1002.0}]
+
+    store.upsert("2026-10-03", 1003.0)
+    legacy.write_text(json.dumps([{"date": "2026-10-01", "value": 0.0}]))
+    # O .jsonl já existe: o legado não é reimportado por cima
+    assert len(HistoryStore(path, str(legacy)).load_all()) == 3
+
+
+def test_out_of_order_date_falls_back_to_a_sorted_rewrite(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.jsonl"), legacy_path=None)
+    store.upsert("2026-10-15", 1000.0)
+    store.upsert("2026-10-16", 1010.0)
+    store.upsert("2026-10-14", 990.0)
+    assert [entry['date'] for entry in store.load_all()] == ["2026-10-14", "2026-10-15", "2026-10-16"]
+
+
+def test_ten_years_load_and_last_before_timing(tmp_path):
+    dates = days(3650)
+    path = tmp_path / "history.jsonl"
+    path.write_text("".join(json.dumps({"date": d, "value": 1000.0 + i}) + "\n" for i, d in enumerate(dates)))
+    store = HistoryStore(str(path), legacy_path=None)
+
+    start = time.perf_counter()
+    history = store.load_all()
+    load_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(100):
+        previous = store.last_before("2026-01-01")
+    lookup_elapsed = (time.perf_counter() - start) / 100
+
+    print(f"\n10 years: load_all {load_elapsed * 1000:.1f} ms, last_before {lookup_elapsed * 1e6:.0f} us")
+    assert len(history) == 3650
+    assert previous == {"date": dates[-1], "value": 1000.0 + 3649}
+    # last_before lê só o fim do arquivo: custo constante, bem abaixo da leitura completa
+    assert load_elapsed < 1.0
+    assert lookup_elapsed < 0.005
+    assert lookup_elapsed < load_elapsed
@@ -0,0 +1,95 @@
+import json
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+import bcb.sgs
+import pandas as pd
+import pytest
+
+from config.settings import Settings
+from src import indicators_service
+from src.indicators_service import IndicatorsService
+
+VALUES = {432: "10.50", 12: "0.040168"}
+
+
+class FakeSGSHandler(BaseHTTPRequestHandler):
+    """Answers /dados/serie/bcdata.sgs.{code}/dados like the BCB API, one observation per business day."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        code = int(url.path.split("bcdata.sgs.")[1].split("/")[0])
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        self.server.requests.append((code, query["dataInicial"], query["dataFinal"]))
+        dates = pd.bdate_range(pd.to_datetime(query["dataInicial"], dayfirst=True),
+                               pd.to_datetime(query["dataFinal"], dayfirst=True))
+        body = json.dumps([{"data": d.strftime("%d/%m/%Y"), "valor": VALUES[code]} for d in dates]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def sgs_server(monkeypatch, tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeSGSHandler)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    original = bcb.sgs._get_url_and_payload
+
+    def local_url(*args):
+        url, payload = original(*args)
+        return url.replace("https://api.bcb.gov.br", base), payload
+
+    monkeypatch.setattr(bcb.sgs, "_get_url_and_payload", local_url)
+    monkeypatch.setattr(indicators_service, "currency", SimpleNamespace(get=lambda *a, **k: pd.DataFrame()))
+    monkeypatch.setattr(Settings, "INDICATORS_STORE_PATH", str(tmp_path / "indicators.json"))
+    IndicatorsService.reset()
+    yield server
+    IndicatorsService.reset()
+    server.shutdown()
+
+
+def run_on(monkeypatch, day):
+    class Today(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls.fromisoformat(day)
+
+    monkeypatch.setattr(indicators_service, "datetime", Today)
+    return IndicatorsService().get()
+
+
+def test_one_batched_call_per_run_and_memoized(sgs_server, monkeypatch):
+    indicators = run_on(monkeypatch, "2025-03-10")
+    assert sorted(code for code, _, _ in sgs_server.requests) == [12, 432]
+    assert indicators["selic_meta"] == 10.5
+    assert indicators["cdi_diario"] == pytest.approx(0.040168)
+
+    # Segunda chamada no mesmo dia: memoizada, sem rede
+    run_on(monkeypatch, "2025-03-10")
+    assert len(sgs_server.requests) == 2
+
+
+def test_store_is_append_only(sgs_server, monkeypatch):
+    run_on(monkeypatch, "2025-03-10")
+    first = json.loads(open(Settings.INDICATORS_STORE_PATH).read())["sgs"]
+
+    IndicatorsService.reset()
+    run_on(monkeypatch, "2025-03-14")
+    second = json.loads(open(Settings.INDICATORS_STORE_PATH).read())["sgs"]
+
+    # O próximo dia só pede a partir da última observação guardada
+    assert {start for _, start, _ in sgs_server.requests[2:]} == {"10/03/2025"}
+    for name in ("selic", "cdi"):
+        assert first[name].items() <= second[name].items()
+        assert max(second[name]) == "2025-03-14"
@@ -0,0 +1,166 @@
+import json
+
+import pytest
+
+from src.ledger import Ledger
+from src.sheets_manager import SheetsManager
+
+HEADER = b"Data,Ticker,Tipo,Quantidade,Pre\xc3\xa7o,Moeda"
+
+
+def csv(*rows):
+    return b"\n".join([HEADER, *rows])
+
+
+class FakePtax:
+    """PTAX history callable: records the requested start dates."""
+
+    def __init__(self, rates):
+        self.rates = rates
+        self.starts = []
+
+    def __call__(self, start):
+        self.starts.append(start)
+        return {date: rate for date, rate in self.rates.items() if date >= start}
+
+
+def test_old_usd_trades_fetch_ptax_from_their_date(tmp_path):
+    ptax = FakePtax({"2019-03-01": 3.75, "2025-01-02": 6.0})
+    content = csv(b"01/03/2019,AAPL,COMPRA,10,100,USD", b"02/01/2025,AAPL,COMPRA,10,100,USD")
+    ledger = Ledger(str(tmp_path / "ledger.json")).sync(content, SheetsManager.parse_transactions, ptax=ptax)
+
+    assert ptax.starts == ["2019-02-22"]
+    assert ledger.cost_basis()["AAPL"]["cost_brl"] == pytest.approx(10 * 100 * 3.75 + 10 * 100 * 6.0)
+
+
+def test_no_ptax_request_without_usd_trades(tmp_path):
+    ptax = FakePtax({})
+    Ledger(str(tmp_path / "ledger.json")).sync(csv(b"01/03/2019,PETR4.SA,COMPRA,10,30,BRL"),
+                                               SheetsManager.parse_transactions, ptax=ptax)
+    assert ptax.starts == []
+
+
+def test_fallback_rates_are_not_checkpointed(tmp_path):
+    path = tmp_path / "ledger.json"
+    first = csv(b"02/01/2025,PETR4.SA,COMPRA,10,30,BRL")
+    Ledger(str(path)).sync(first, SheetsManager.parse_transactions, ptax=FakePtax({}))
+    checkpoint = json.loads(path.read_text())
+    assert checkpoint["rows"] == 1
+
+    # PTAX indisponível: o relatório de hoje usa o fallback, mas o checkpoint não avança
+    second = csv(b"02/01/2025,PETR4.SA,COMPRA,10,30,BRL", b"03/01/2025,AAPL,COMPRA,1,100,USD")
+    ledger = Ledger(str(path)).sync(second, SheetsManager.parse_transactions, ptax=FakePtax({}))
+    assert "AAPL" in ledger.cost_basis()
+    assert json.loads(path.read_text()) == checkpoint
+
+    # Com a PTAX de volta, a linha é refeita com a taxa correta
+    ledger = Ledger(str(path)).sync(second, SheetsManager.parse_transactions, ptax=FakePtax({"2025-01-03": 6.1}))
+    assert ledger.cost_basis()["AAPL"]["cost_brl"] == pytest.approx(610.0)
+    assert json.loads(path.read_text())["rows"] == 2
+
+
+def sync(path, content, ptax=None, parse=SheetsManager.parse_transactions):
+    return Ledger(str(path)).sync(content, parse, ptax=ptax or FakePtax({}))
+
+
+def test_fifo_consumes_the_oldest_lots(tmp_path):
+    ledger = sync(tmp_path / "ledger.json", csv(
+        b"02/01/2024,PETR4.SA,COMPRA,100,30,BRL",
+        b"02/02/2024,PETR4.SA,COMPRA,100,40,BRL",
+        b"01/03/2024,PETR4.SA,VENDA,150,50,BRL",
+    ))
+    basis = ledger.cost_basis()["PETR4.SA"]
+    # Vende os 100 a 30 e 50 dos 100 a 40; sobram 50 a 40
+    assert ledger.state["positions"]["PETR4.SA"]["lots"] == [[50.0, 40.0]]
+    assert basis["quantity"] == 50 and basis["avg_cost_brl"] == pytest.approx(40.0)
+    assert basis["realized_brl"] == pytest.approx(150 * 50 - (100 * 30 + 50 * 40))
+
+
+def test_realized_pnl_on_a_partial_sale_with_fees(tmp_path):
+    header = HEADER + b",Taxas"
+    ledger = Ledger(str(tmp_path / "ledger.json")).sync(b"\n".join([
+        header,
+        b"02/01/2024,VALE3.SA,COMPRA,10,60,BRL,5",
+        b"02/02/2024,VALE3.SA,VENDA,4,70,BRL,2",
+    ]), SheetsManager.parse_transactions)
+    basis = ledger.cost_basis()["VALE3.SA"]
+    unit_cost = (10 * 60 + 5) / 10
+    assert basis["realized_brl"] == pytest.approx(4 * 70 - 2 - 4 * unit_cost)
+    assert basis["quantity"] == 6 and basis["avg_cost_brl"] == pytest.approx(unit_cost)
+
+
+def test_dividends_and_jcp(tmp_path):
+    ledger = sync(tmp_path / "ledger.json", csv(
+        b"02/01/2024,ITUB4.SA,COMPRA,100,30,BRL",
+        b'15/02/2024,ITUB4.SA,DIVIDENDO,100,"0,50",BRL',
+        b"15/03/2024,ITUB4.SA,JCP,0,120,BRL",
+        b'15/03/2024,AAPL,DIVIDENDO,10,"0,25",USD',
+    ), ptax=FakePtax({"2024-03-15": 5.0}))
+    basis = ledger.cost_basis()
+    # Quantidade x valor por cota, ou o total em Preço; em USD pela PTAX do dia
+    assert basis["ITUB4.SA"]["dividends_brl"] == pytest.approx(100 * 0.5 + 120)
+    assert basis["ITUB4.SA"]["cost_brl"] == pytest.approx(3000)
+    assert basis["AAPL"]["dividends_brl"] == pytest.approx(10 * 0.25 * 5.0)
+
+
+class CountingParse:
+    """parse_transactions wrapper that records how many rows each call parsed."""
+
+    def __init__(self):
+        self.rows = []
+
+    def __call__(self, content):
+        transactions = SheetsManager.parse_transactions(content)
+        self.rows.append(len(transactions))
+        return transactions
+
+
+def test_only_appended_rows_are_processed(tmp_path):
+    path = tmp_path / "ledger.json"
+    rows = [f"{day:02d}/01/2024,PETR4.SA,COMPRA,10,30,BRL".encode() for day in range(1, 21)]
+    parse = CountingParse()
+    sync(path, csv(*rows), parse=parse)
+    sync(path, csv(*rows), parse=parse)
+    rows.append(b"22/01/2024,PETR4.SA,VENDA,5,35,BRL")
+    ledger = sync(path, csv(*rows), parse=parse)
+
+    assert parse.rows == [20, 1]
+    assert ledger.cost_basis()["PETR4.SA"]["quantity"] == 195
+
+
+def test_edited_row_rebuilds(tmp_path):
+    path = tmp_path / "ledger.json"
+    parse = CountingParse()
+    sync(path, csv(b"02/01/2024,PETR4.SA,COMPRA,100,30,BRL", b"02/02/2024,PETR4.SA,COMPRA,100,40,BRL"), parse=parse)
+    ledger = sync(path, csv(b"02/01/2024,PETR4.SA,COMPRA,100,25,BRL", b"02/02/2024,PETR4.SA,COMPRA,100,40,BRL"),
+                  parse=parse)
+
+    assert parse.rows == [2, 2]
+    assert ledger.cost_basis()["PETR4.SA"]["cost_brl"] == pytest.approx(100 * 25 + 100 * 40)
+
+
+def test_backdated_row_rebuilds_in_date_order(tmp_path):
+    path = tmp_path / "ledger.json"
+    rows = [b"02/02/2024,PETR4.SA,COMPRA,100,40,BRL", b"01/03/2024,PETR4.SA,VENDA,100,50,BRL"]
+    sync(path, csv(*rows))
+    # Compra de janeiro lançada depois: a venda de março consome esse lote primeiro
+    ledger = sync(path, csv(*rows, b"02/01/2024,PETR4.SA,COMPRA,100,30,BRL"))
+
+    assert ledger.state["positions"]["PETR4.SA"]["lots"] == [[100.0, 40.0]]
+    assert ledger.cost_basis()["PETR4.SA"]["realized_brl"] == pytest.approx(100 * 50 - 100 * 30)
+
+
+def test_rows_that_never_resolve_are_checkpointed(tmp_path):
+    path = tmp_path / "ledger.json"
+    ledger = sync(path, csv(
+        b"02/01/2024,PETR4.SA,COMPRA,10,30,BRL",
+        b",PETR4.SA,COMPRA,10,30,BRL",
+        b"02/01/2024,,COMPRA,10,30,BRL",
+        b"02/01/1990,AAPL,COMPRA,1,10,USD",
+    ), ptax=FakePtax({"1994-07-01": 0.93}))
+
+    # Sem data ou ticker: ignoradas; antes da série PTAX: primeira taxa disponível
+    assert sorted(ledger.cost_basis()) == ["AAPL", "PETR4.SA"]
+    assert ledger.cost_basis()["PETR4.SA"]["quantity"] == 10
+    assert ledger.cost_basis()["AAPL"]["cost_brl"] == pytest.approx(9.3)
+    assert json.loads(path.read_text())["rows"] == 4
@@ -0,0 +1,122 @@
+import smtplib
+import socket
+import time
+from email.mime.text import MIMEText
+
+import pytest
+
+from src.mailer import SMTPPool
+
+# Servidor SMTP local de teste (dependência só dos testes)
+Controller = pytest.importorskip("aiosmtpd.controller").Controller
+
+
+class CountingHandler:
+    """aiosmtpd handler: counts connections and messages, refuses the first `fail_first` with 451."""
+
+    def __init__(self, fail_first=0):
+        self.sessions = set()
+        self.delivered = []
+        self.fail_first = fail_first
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(session)
+        if self.fail_first > 0:
+            self.fail_first -= 1
+            return "451 Requested action aborted: try again later"
+        self.delivered.extend(envelope.rcpt_tos)
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp_server():
+    handlers = []
+
+    def start(fail_first=0):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        handler = CountingHandler(fail_first)
+        controller = Controller(handler, hostname="127.0.0.1", port=port)
+        controller.start()
+        handlers.append(controller)
+        return handler, port
+
+    yield start
+    for controller in handlers:
+        controller.stop()
+
+
+def messages(n):
+    out = []
+    for i in range(n):
+        msg = MIMEText(f"Relatório {i}")
+        msg['From'] = "bot@example.com"
+        msg['To'] = f"user{i}@example.com"
+        msg['Subject'] = "Relatório"
+        out.append(msg)
+    return out
+
+
+def pool(port, **kwargs):
+    return SMTPPool("127.0.0.1", port, None, None, starttls=False, timeout=5, **kwargs)
+
+
+def test_connections_are_reused(smtp_server):
+    handler, port = smtp_server()
+    smtp = pool(port, size=3)
+    try:
+        results = smtp.send_many(messages(30))
+    finally:
+        smtp.close()
+    assert all(error is None for _, error in results)
+    assert len(handler.delivered) == 30
+    assert len(handler.sessions) <= 3
+
+
+def test_4xx_is_retried(smtp_server):
+    handler, port = smtp_server(fail_first=2)
+    smtp = pool(port, size=1, max_retries=3, backoff=0.01)
+    try:
+        results = smtp.send_many(messages(1))
+    finally:
+        smtp.close()
+    assert results[0][1] is None
+    assert handler.delivered == ["user0@example.com"]
+
+
+def test_4xx_gives_up_after_max_retries(smtp_server):
+    _, port = smtp_server(fail_first=10)
+    smtp = pool(port, size=1, max_retries=1, backoff=0.01)
+    try:
+        (_, error), = smtp.send_many(messages(1))
+    finally:
+        smtp.close()
+    assert isinstance(error, smtplib.SMTPDataError) and error.smtp_code == 451
+
+
+def test_500_recipients_pooled_vs_connect_per_message(smtp_server):
+    handler, port = smtp_server()
+    batch = messages(500)
+
+    start = time.perf_counter()
+    for msg in batch:
+        with smtplib.SMTP("127.0.0.1", port, timeout=5) as server:
+            server.send_message(msg)
+    per_message_seconds = time.perf_counter() - start
+    per_message_sessions = len(handler.sessions)
+
+    handler.sessions.clear()
+    smtp = pool(port, size=3)
+    start = time.perf_counter()
+    try:
+        results = smtp.send_many(batch)
+    finally:
+        smtp.close()
+    pooled_seconds = time.perf_counter() - start
+
+    print(f"\n500 recipients: connect-per-message {per_message_seconds:.2f}s ({per_message_sessions} connections), "
+          f"pooled {pooled_seconds:.2f}s ({len(handler.sessions)} connections)")
+    assert all(error is None for _, error in results)
+    assert per_message_sessions == 500 and len(handler.sessions) <= 3
+    assert pooled_seconds < per_message_seconds
@@ -0,0 +1,118 @@
+import json
+import re
+
+import pytest
+
+from src import metrics as metrics_module
+from src.metrics import Metrics
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(metrics_module.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def test_nested_spans_record_their_own_durations(clock):
+    m = Metrics()
+    with m.span("stage", stage="market_data"):
+        clock.now += 1.0
+        with m.span("fetch.info", ticker="PETR4.SA"):
+            clock.now += 2.5
+        with pytest.raises(TimeoutError), m.span("fetch.info", ticker="VALE3.SA"):
+            clock.now += 0.5
+            raise TimeoutError
+
+    # O span interno fecha primeiro; o externo inclui o tempo dos internos
+    assert [(s["name"], s["labels"], s["seconds"], s["ok"]) for s in m.spans] == [
+        ("fetch.info", {"ticker": "PETR4.SA"}, 2.5, True),
+        ("fetch.info", {"ticker": "VALE3.SA"}, 0.5, False),
+        ("stage", {"stage": "market_data"}, 4.0, True),
+    ]
+
+
+def test_failed_outer_span_is_marked_and_reraises(clock):
+    m = Metrics()
+    with pytest.raises(ValueError):
+        with m.span("stage", stage="news"):
+            with m.span("fetch.news", query="Copom"):
+                raise ValueError("boom")
+    assert [s["ok"] for s in m.spans] == [False, False]
+
+
+def test_incr_accumulates_per_name():
+    m = Metrics()
+    m.incr("retry.smtp")
+    m.incr("retry.smtp")
+    m.incr("cache.ai.saved_seconds", 1.5)
+    m.incr("cache.ai.saved_seconds", 2)
+    m.incr("cache.prices.delta", 0)
+    assert m.counters == {"retry.smtp": 2, "cache.ai.saved_seconds": 3.5, "cache.prices.delta": 0}
+
+    m.reset()
+    assert m.counters == {} and m.spans == []
+
+
+def test_export_appends_one_json_line_per_run(tmp_path, clock):
+    jsonl, prom = tmp_path / "logs" / "metrics.jsonl", tmp_path / "logs" / "metrics.prom"
+    m = Metrics()
+    with m.span("stage", stage="indicators"):
+        clock.now += 0.25
+    m.incr("fallback.usd_rate")
+    m.export(str(jsonl), str(prom))
+
+    m.reset()
+    m.incr("retry.gemini", 3)
+    m.export(str(jsonl), str(prom))
+
+    first, second = [json.loads(line) for line in jsonl.read_text().splitlines()]
+    assert first["spans"] == [{"name": "stage", "labels": {"stage": "indicators"}, "seconds": 0.25, "ok": True}]
+    assert first["counters"] == {"fallback.usd_rate": 1}
+    assert second["spans"] == [] and second["counters"] == {"retry.gemini": 3}
+    assert first["timestamp"] <= second["timestamp"]
+    # O textfile do Prometheus é reescrito, só com a última execução
+    assert "invest_ai_retry_gemini_total 3" in prom.read_text()
+    assert "fallback" not in prom.read_text()
+    assert not list(tmp_path.glob("logs/*.tmp"))
+
+
+def test_prometheus_textfile_format(tmp_path, clock):
+    prom = tmp_path / "metrics.prom"
+    m = Metrics()
+    for seconds in (0.5, 1.5):
+        with m.span("fetch.info", ticker="PETR4.SA"):
+            clock.now += seconds
+    with m.span("fetch.news", query='Dólar "hoje"\\agora'):
+        clock.now += 2
+    m.incr("cache.ai.hits", 4)
+    m.incr("cache.fundamentals.stale-hits", 2)
+    m.export(str(tmp_path / "metrics.jsonl"), str(prom))
+
+    lines = prom.read_text().splitlines()
+    assert "# TYPE invest_ai_span_seconds summary" in lines
+    assert 'invest_ai_span_seconds_sum{span="fetch.info",ticker="PETR4.SA"} 2.000000' in lines
+    assert 'invest_ai_span_seconds_count{span="fetch.info",ticker="PETR4.SA"} 2' in lines
+    assert 'invest_ai_span_seconds_sum{query="Dólar \\"hoje\\"\\\\agora",span="fetch.news"} 2.000000' in lines
+    assert lines[lines.index("# TYPE invest_ai_cache_ai_hits_total counter") + 1] == "invest_ai_cache_ai_hits_total 4"
+    assert "invest_ai_cache_fundamentals_stale_hits_total 2" in lines
+    assert "# TYPE invest_ai_last_run_timestamp_seconds gauge" in lines
+
+    # Toda amostra pertence a uma família declarada em # TYPE, com nome e rótulos válidos
+    declared = {line.split()[2] for line in lines if line.startswith("# TYPE")}
+    sample = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{([a-zA-Z_]\w*="(\\.|[^"\\])*",?)*\})? \S+$')
+    for line in lines:
+        if line.startswith("#"):
+            continue
+        match = sample.match(line)
+        assert match, line
+        name = match.group(1)
+        assert name in declared or re.sub(r'_(sum|count)$', '', name) in declared, line
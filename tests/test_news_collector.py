@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+from config.settings import Settings
+from src import news_collector
+from src.news_collector import NewsCollector
+
+HEADLINES = {
+    "Mercado Financeiro Ibovespa": [
+        "Ibovespa fecha em alta de 1% com Petrobras",
+        "Dólar recua e bolsa sobe",
+    ],
+    "Copom Selic juros": [
+        "Copom mantém Selic em 10,50% ao ano",
+        "Juros futuros caem após ata",
+    ],
+    "Dólar câmbio hoje": ["Dólar recua e bolsa sobe!"],
+    "PETR4": [
+        "Ibovespa fecha em alta de 1% com a Petrobras",
+        "Petrobras anuncia dividendos",
+    ],
+    "VALE3": ["Copom mantém a Selic em 10,50% ao ano"],
+}
+
+
+class FakeGoogleNews:
+    """GoogleNews stand-in: canned results per query, counts searches."""
+    searches = []
+    lock = threading.Lock()
+
+    def __init__(self, lang=None, region=None):
+        self.query = None
+
+    def search(self, query):
+        with self.lock:
+            FakeGoogleNews.searches.append(query)
+        self.query = query
+
+    def result(self):
+        return [{'title': title, 'date': "há 1 hora", 'link': "https://example.com"}
+                for title in HEADLINES[self.query]]
+
+
+@pytest.fixture
+def collector(monkeypatch, tmp_path):
+    monkeypatch.setattr(news_collector, "GoogleNews", FakeGoogleNews)
+    monkeypatch.setattr(FakeGoogleNews, "searches", [])
+    monkeypatch.setattr(Settings, "NEWS_CACHE_DIR", str(tmp_path / "news"))
+    monkeypatch.setattr(Settings, "NEWS_TOP_N", 10)
+    return NewsCollector()
+
+
+PORTFOLIO = [
+    {"ticker": "PETR4.SA", "category": "BR_STOCKS"},
+    {"ticker": "VALE3.SA", "category": "BR_STOCKS"},
+    {"ticker": "RDB-NUBANK", "category": "RENDA_FIXA"},
+]
+
+
+def test_near_duplicates_are_clustered(collector):
+    lines = collector.get_top_news(PORTFOLIO).splitlines()
+
+    assert len(lines) == 5
+    # Manchetes vistas por mais consultas sobem para o topo, uma vez só
+    assert sum("Ibovespa fecha em alta" in line for line in lines) == 1
+    assert sum("Copom mantém" in line for line in lines) == 1
+    assert sum("Dólar recua" in line for line in lines) == 1
+    assert {lines[0], lines[1], lines[2]} == {
+        "- Ibovespa fecha em alta de 1% com Petrobras (há 1 hora)",
+        "- Copom mantém Selic em 10,50% ao ano (há 1 hora)",
+        "- Dólar recua e bolsa sobe (há 1 hora)",
+    }
+
+
+def test_daily_cache_skips_repeat_searches(collector, monkeypatch):
+    first = collector.get_top_news(PORTFOLIO)
+    assert sorted(FakeGoogleNews.searches) == sorted(HEADLINES)
+
+    # Nova execução no mesmo dia: tudo vem do cache em disco
+    assert NewsCollector().get_top_news(PORTFOLIO) == first
+    assert len(FakeGoogleNews.searches) == len(HEADLINES)
+
+    # Ativo novo na carteira: só a consulta que falta vai à rede
+    searched = len(FakeGoogleNews.searches)
+    monkeypatch.setitem(HEADLINES, "ITUB4", ["Itaú lucra mais no trimestre"])
+    NewsCollector().get_top_news(PORTFOLIO + [{"ticker": "ITUB4.SA", "category": "BR_STOCKS"}])
+    assert FakeGoogleNews.searches[searched:] == ["ITUB4"]
@@ -0,0 +1,87 @@
+import time
+
+import pandas as pd
+import pytest
+
+from config.settings import Settings
+from src import notifier as notifier_module
+from src.notifier import Notifier
+from src.report_generator import ReportGenerator
+
+
+class CapturingPool:
+    """SMTPPool stand-in that keeps the built messages instead of sending them."""
+    sent = []
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def send_many(self, messages):
+        CapturingPool.sent = list(messages)
+        return [(msg, None) for msg in messages]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def notifier(monkeypatch, tmp_path):
+    monkeypatch.setattr(Settings, "EMAIL_SENDER", "bot@example.com")
+    monkeypatch.setattr(Settings, "EMAIL_PASSWORD", "secret")
+    monkeypatch.setattr(Settings, "JINJA_CACHE_DIR", str(tmp_path / "jinja"))
+    monkeypatch.setattr(Settings, "CHART_SVG_DOMAINS", [])
+    monkeypatch.setattr(notifier_module, "SMTPPool", CapturingPool)
+    monkeypatch.setattr(Notifier, "_env", None)
+    return Notifier
+
+
+def report_context(chart_png):
+    portfolio_df = pd.DataFrame({
+        "category": ["Ações BR", "FIIs", "Renda Fixa", "Cripto"],
+        "value_brl": [4000.0, 2000.0, 3500.0, 500.0],
+    })
+    return {
+        'date': "17/10/2026",
+        'total_value': 10_000.0,
+        'daily_variation_pct': 0.8,
+        'indicators': {'selic_meta': 10.5, 'cdi': 10.4, 'ptax_venda': 5.4},
+        'ai_analysis': "**Manter** a carteira.",
+        'suggestions': pd.DataFrame({"category": ["FIIs"], "current_pct": [20.0], "target_pct": [10.0], "status": ["OK"]}),
+        'contribution': pd.DataFrame({"category": ["FIIs"], "contribution": [250.0]}),
+        'contribution_amount': 250.0,
+        'allocation_chart_svg': "",
+        'allocation_chart_png': chart_png,
+    }, portfolio_df
+
+
+def send(notifier_cls, mode, chart_png, monkeypatch):
+    monkeypatch.setattr(Settings, "EMAIL_CHART_MODE", mode)
+    context, _ = report_context(chart_png)
+    start = time.perf_counter()
+    notifier_cls().send_email("Relatório", context, recipients="user@example.com")
+    elapsed = time.perf_counter() - start
+    msg, = CapturingPool.sent
+    html = next(part for part in msg.walk() if part.get_content_type() == "text/html")
+    return len(msg.as_bytes()), len(html.get_payload(decode=True)), elapsed
+
+
+def test_message_size_and_render_time_before_and_after(notifier, monkeypatch):
+    _, portfolio_df = report_context(b"")
+    generator = ReportGenerator()
+    # Antes: PNG no DPI padrão do matplotlib, embutido em base64 no HTML, template compilado a cada execução
+    monkeypatch.setattr(Settings, "CHART_DPI", 100)
+    png_before = generator.generate_allocation_chart_png(portfolio_df)
+    monkeypatch.setattr(Settings, "CHART_DPI", 80)
+    png_after = generator.generate_allocation_chart_png(portfolio_df)
+
+    before_bytes, before_html, before_render = send(notifier, "inline", png_before, monkeypatch)
+    # Primeiro envio em CID grava o bytecode; o seguinte (novo processo) só o carrega
+    send(notifier, "cid", png_after, monkeypatch)
+    monkeypatch.setattr(Notifier, "_env", None)
+    after_bytes, after_html, after_render = send(notifier, "cid", png_after, monkeypatch)
+
+    print(f"\nbefore: {before_bytes} bytes (HTML {before_html}), {before_render * 1000:.1f} ms | "
+          f"after: {after_bytes} bytes (HTML {after_html}), {after_render * 1000:.1f} ms")
+    assert before_html - after_html > len(png_before)
+    assert after_bytes < before_bytes
+    assert after_render < before_render
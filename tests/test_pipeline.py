@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+import subprocess
+import textwrap
+import pytest
+from src.pipeline import Pipeline, Stage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_independent_stages_overlap():
+    def slow(value):
+        time.sleep(0.3)
+        return value
+
+    pipeline = Pipeline([
+        Stage("a", lambda: slow(1)),
+        Stage("b", lambda: slow(2)),
+        Stage("sum", lambda a, b: a + b, ["a", "b"]),
+    ])
+    started = time.monotonic()
+    results = pipeline.run()
+    assert results["sum"] == 3
+    assert time.monotonic() - started < 0.55
+    assert pipeline.critical_path()[-1] == "sum"
+
+
+def test_stage_error_propagates():
+    def boom():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        Pipeline([Stage("boom", boom)]).run()
+
+
+def test_deadline_ends_the_process():
+    """A stage stuck past the deadline must not keep the interpreter alive."""
+    script = textwrap.dedent("""
+        import time
+        from src.pipeline import Pipeline, Stage
+        try:
+            Pipeline([Stage("stuck", lambda: time.sleep(6))], deadline=1).run()
+        except TimeoutError:
+            pass
+    """)
+    started = time.monotonic()
+    subprocess.run([sys.executable, "-c", script], cwd=ROOT, check=True, timeout=10)
+    assert time.monotonic() - started < 3
@@ -0,0 +1,97 @@
+import time
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.portfolio import PortfolioManager
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ["RENDA_FIXA", "CRYPTO", "US_STOCKS", "US_REITS", "BR_STOCKS", "FIIS", "ETFS"]
+
+
+def legacy_positions(portfolio_data, market_data):
+    """The per-row loop calculate_portfolio used before it was vectorized (valuation part)."""
+    portfolio = []
+    for item in portfolio_data:
+        ticker = item['ticker']
+        qty = item['quantity']
+        category = item.get('category', 'OUTROS')
+        data = market_data.get(ticker, {})
+        current_price = data.get('price', 0)
+
+        if category == "RENDA_FIXA":
+            value_brl = qty * 1.0
+            current_price = 1.0
+        elif category == "CRYPTO" and ticker.endswith("-BRL"):
+            value_brl = current_price * qty
+        elif category in ["CRYPTO", "US_REITS", "US_STOCKS"]:
+            usd_rate = market_data.get('BRL=X', {}).get('price', 0)
+            if usd_rate <= 0:
+                usd_rate = 6.00
+            value_brl = current_price * qty * usd_rate
+        else:
+            value_brl = current_price * qty
+
+        if current_price == 0 and category != "RENDA_FIXA":
+            logger.warning(f"Price for {ticker} is 0. Check data source.")
+        if pd.isna(value_brl):
+            value_brl = 0.0
+
+        portfolio.append({
+            "ticker": ticker, "qty": qty, "price": current_price, "value_brl": value_brl,
+            "category": category, "name": data.get('name', ticker),
+            "dy_12m": data.get('dy_12m', 0), "p_vp": data.get('p_vp', 0),
+            "pe": data.get('pe', 0), "roe": data.get('roe', 0),
+            "sector": data.get('sector', 'Unknown'), "recommendation": data.get('recommendation', 'None'),
+            "change_1d": data.get('change_1d', 0), "change_12m": data.get('change_12m', 0),
+            "profit_loss_pct": 0.0, "profit_loss_val": 0.0,
+        })
+    return pd.DataFrame(portfolio)
+
+
+def book(n_positions, seed=0):
+    rng = np.random.default_rng(seed)
+    n_tickers = max(10, n_positions // 20)
+    market = {}
+    for i in range(n_tickers):
+        market[f"T{i}"] = {
+            "price": float(rng.choice([0.0, rng.uniform(1, 500)], p=[0.05, 0.95])),
+            "name": f"Ativo {i}", "dy_12m": rng.uniform(0, 10), "p_vp": rng.uniform(0, 3),
+            "pe": rng.uniform(0, 30), "roe": rng.uniform(-5, 30), "sector": "Energy",
+            "recommendation": "buy", "change_1d": rng.normal(), "change_12m": rng.normal(0, 20),
+        }
+    market["BRL=X"] = {"price": 5.4}
+    # Tickers sem dado de mercado, cripto em BRL e em USD
+    tickers = [f"T{i}" if rng.random() > 0.02 else f"MISSING{i}" for i in rng.integers(0, n_tickers, n_positions)]
+    categories = rng.choice(CATEGORIES, n_positions)
+    portfolio_data = [
+        {"ticker": t + ("-BRL" if c == "CRYPTO" and rng.random() < 0.5 else ""),
+         "quantity": float(rng.integers(1, 1000)), "category": c}
+        for t, c in zip(tickers, categories)
+    ]
+    for item in portfolio_data:
+        if item["ticker"].endswith("-BRL"):
+            market.setdefault(item["ticker"], {"price": 300_000.0})
+    return portfolio_data, market
+
+
+@pytest.mark.parametrize("n_positions", [10_000, 100_000])
+def test_vectorized_valuation_matches_the_loop(n_positions):
+    portfolio_data, market = book(n_positions)
+    manager = PortfolioManager(portfolio_data, market, {}, history_store=object())
+
+    start = time.perf_counter()
+    expected = legacy_positions(portfolio_data, market)
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = manager._value_positions()
+    vector_seconds = time.perf_counter() - start
+    print(f"\n{n_positions} positions: loop {loop_seconds:.2f}s, vectorized {vector_seconds:.2f}s")
+
+    pd.testing.assert_frame_equal(result[expected.columns], expected, check_dtype=False)
+    if n_positions >= 100_000:
+        assert vector_seconds < loop_seconds
@@ -0,0 +1,59 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.price_panel import PricePanel
+from src.prompt_builder import _history_stats
+from src.report_generator import ReportGenerator
+
+
+def closes_frame(n_tickers, n_days=365, seed=0):
+    """1y of closes on the union calendar, with gaps where a market was closed."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2025-01-01", periods=n_days, freq="D")
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (n_days, n_tickers)), axis=0))
+    prices[rng.random(prices.shape) < 0.3] = np.nan
+    prices[-1] = 100.0
+    return pd.DataFrame(prices, index=dates, columns=[f"T{i}.SA" for i in range(n_tickers)])
+
+
+@pytest.mark.parametrize("n_tickers", [50, 2000])
+def test_panel_memory_and_build_time(n_tickers):
+    frame = closes_frame(n_tickers)
+    start = time.perf_counter()
+    panel = PricePanel.from_frame(frame)
+    elapsed = time.perf_counter() - start
+
+    frame_bytes = frame.memory_usage(index=True, deep=True).sum()
+    print(f"\n{n_tickers} tickers: panel {panel.nbytes / 1024:.0f} KiB vs DataFrame "
+          f"{frame_bytes / 1024:.0f} KiB, built in {elapsed * 1000:.1f} ms")
+
+    assert panel.values.dtype == np.float32 and panel.values.flags['C_CONTIGUOUS']
+    assert panel.nbytes == n_tickers * len(frame) * 4 + len(frame) * 8
+    assert panel.nbytes < 0.55 * frame_bytes
+    assert elapsed < 1.0
+
+
+def test_rows_are_zero_copy_views():
+    panel = PricePanel.from_frame(closes_frame(50))
+    assert np.shares_memory(panel.row("T7.SA"), panel.values)
+    assert np.shares_memory(panel.rows(["T3.SA", "T4.SA", "T5.SA"]), panel.values)
+    # Fora de ordem não há view possível, mas o resultado é o mesmo
+    np.testing.assert_array_equal(panel.rows(["T5.SA", "T3.SA"]), panel.values[[5, 3]])
+
+
+def test_consumers_read_the_panel():
+    panel = PricePanel.from_frame(closes_frame(50))
+    portfolio_df = pd.DataFrame({
+        "ticker": ["T1.SA", "T2.SA", "TESOURO"],
+        "category": ["Ações", "FIIs", "Renda Fixa"],
+        "value_brl": [600.0, 400.0, 1000.0],
+    })
+    svg = ReportGenerator().generate_history_chart_svg(portfolio_df, panel)
+    assert svg.startswith("<svg") and "<polyline" in svg
+
+    stats = _history_stats(panel, "T1.SA")
+    assert stats.startswith(" | Topo 12M: ") and "DD 12M: -" in stats
+    assert _history_stats(panel, "TESOURO") == ""
@@ -0,0 +1,75 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import projection
+from src.price_panel import PricePanel
+
+
+def test_monthly_blocks_compound_whole_windows():
+    daily = np.full((63, 2), 0.001)
+    blocks = projection.monthly_blocks(daily)
+    assert blocks.shape == (2, 63 - projection.MONTH_DAYS + 1)
+    np.testing.assert_allclose(blocks, 1.001 ** projection.MONTH_DAYS - 1)
+
+
+def test_crypto_calendar_blocks_span_a_calendar_month(monkeypatch):
+    # Cripto sobe 0,1% por dia corrido, inclusive fins de semana
+    dates = pd.date_range("2025-01-01", periods=365, freq="D")
+    panel = PricePanel.from_frame(pd.DataFrame({"BTC-BRL": 1.001 ** np.arange(365)}, index=dates))
+    portfolio_df = pd.DataFrame({"ticker": ["BTC-BRL"], "category": ["CRYPTO"], "value_brl": [1000.0]})
+    portfolio_data = [{"ticker": "BTC-BRL", "category": "CRYPTO", "quantity": 1.0}]
+
+    captured = {}
+    monkeypatch.setattr(projection, "project", lambda blocks, *args, **kwargs: captured.setdefault("blocks", blocks))
+    projection.project_portfolio(portfolio_df, panel, portfolio_data, cdi_diario=0.0)
+
+    # A primeira janela começa no retorno zero do primeiro dia
+    crypto = captured["blocks"][list(projection.Settings.TARGET_ALLOCATION).index("Cripto")][1:]
+    # 21 dias úteis = 29 a 31 dias corridos, não as ~3 semanas de 21 linhas diárias
+    assert crypto.min() == pytest.approx(1.001 ** 29 - 1, rel=1e-3)
+    assert crypto.max() == pytest.approx(1.001 ** 31 - 1, rel=1e-3)
+
+
+def book(seed=9):
+    rng = np.random.default_rng(seed)
+    categories = list(projection.Settings.TARGET_ALLOCATION)
+    targets = np.array([projection.Settings.TARGET_ALLOCATION[c] for c in categories])
+    daily = rng.normal(0.0004, 0.012, (252, len(categories)))
+    daily[:, categories.index(projection.RF_CATEGORY)] = 0.0004
+    blocks = projection.monthly_blocks(daily)
+    return blocks, targets * 50_000.0, targets, categories.index(projection.RF_CATEGORY)
+
+
+def test_same_seed_gives_identical_bands_for_any_chunking_or_worker_count():
+    blocks, start, targets, rf_col = book()
+    args = (blocks, start, targets, rf_col, 24, 250.0, 5.0, 40.0)
+
+    # Caminhos de um fluxo não dependem de como os fluxos são agrupados em chunks
+    streams = projection.path_streams(42, 12_000)
+    whole = projection.simulate_paths(*args, None, streams=streams)
+    split = np.hstack([projection.simulate_paths(*args, None, streams=streams[:1]),
+                       projection.simulate_paths(*args, None, streams=streams[1:])])
+    np.testing.assert_array_equal(whole, split)
+    np.testing.assert_array_equal(whole, projection.simulate_paths(*args, 12_000, seed=42))
+
+    kwargs = dict(years=(1, 2), n_paths=12_000, seed=42)
+    serial = projection.project(blocks, start, targets, rf_col, max_workers=1, **kwargs)
+    assert projection.project(blocks, start, targets, rf_col, max_workers=3, **kwargs) == serial
+    assert projection.project(blocks, start, targets, rf_col, max_workers=1, **dict(kwargs, seed=43)) != serial
+
+
+def test_100k_paths_240_months_timing():
+    blocks, start, targets, rf_col = book()
+
+    t0 = time.perf_counter()
+    result = projection.project(blocks, start, targets, rf_col, years=(5, 10, 20), n_paths=100_000, seed=1)
+    elapsed = time.perf_counter() - t0
+
+    print(f"\n100k paths x 240 months: {elapsed:.2f}s")
+    bands = [h['percentiles'] for h in result['horizons']]
+    assert all(b[10] <= b[50] <= b[90] for b in bands)
+    # Meta do pedido: "alguns segundos"; ~3 s aqui num só processo, folga para CI lento
+    assert elapsed < 10
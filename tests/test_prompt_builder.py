@@ -0,0 +1,63 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.prompt_builder import build_portfolio_summary, estimate_tokens
+
+INDICATORS = {'selic_meta': 10.5, 'cdi': 10.4, 'ptax_venda': 5.4}
+CATEGORIES = ["BR_STOCKS", "FIIS", "US_STOCKS", "CRYPTO", "RENDA_FIXA"]
+
+
+def legacy_summary(portfolio_df, total_value, indicators):
+    """The one-line-per-asset += loop the prompt used before the token budget."""
+    summary_text = f"Valor Total: R$ {total_value:,.2f}\n"
+    summary_text += f"Indicadores: Selic {indicators.get('selic_meta')}% | CDI {indicators.get('cdi')}% | PTAX {indicators.get('ptax_venda')}\n"
+    summary_text += "Ativos:\n"
+    for item in portfolio_df.to_dict(orient='records'):
+        summary_text += (f"- {item['ticker']} ({item['category']}): R$ {item['value_brl']:.2f} "
+                         f"({item['allocation']:.1f}%) | L/P: {item.get('profit_loss_pct', 0):.2f}% | "
+                         f"P/L: {item.get('pe', 0):.1f} | ROE: {item.get('roe', 0):.1f}% | Rec: {item.get('recommendation', 'N/A')}\n")
+    return summary_text
+
+
+def positions(n, seed=0):
+    rng = np.random.default_rng(seed)
+    value = rng.lognormal(8, 1.5, n)
+    return pd.DataFrame({
+        "ticker": [f"T{i}.SA" for i in range(n)],
+        "category": rng.choice(CATEGORIES, n),
+        "value_brl": value,
+        "allocation": value / value.sum() * 100,
+        "change_1d": rng.normal(0, 2, n),
+        "profit_loss_pct": rng.normal(0, 20, n),
+        "pe": rng.uniform(0, 30, n),
+        "roe": rng.uniform(-5, 30, n),
+        "recommendation": "buy",
+    })
+
+
+@pytest.mark.parametrize("n_positions", [50, 1_000, 10_000])
+def test_prompt_size_and_build_time(n_positions):
+    df = positions(n_positions)
+    total = df['value_brl'].sum()
+
+    start = time.perf_counter()
+    legacy = legacy_summary(df, total, INDICATORS)
+    legacy_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    text = build_portfolio_summary(df, total, INDICATORS, token_budget=2000, top_k=15)
+    build_seconds = time.perf_counter() - start
+
+    print(f"\n{n_positions} positions: legacy {estimate_tokens(legacy)} tokens in {legacy_seconds * 1000:.1f} ms, "
+          f"budgeted {estimate_tokens(text)} tokens in {build_seconds * 1000:.1f} ms")
+    assert estimate_tokens(text) <= 2000
+    assert build_seconds < 1.0
+    # Os maiores pesos e o maior movimento do dia nunca ficam de fora
+    assert df.loc[df['allocation'].idxmax(), 'ticker'] in text
+    assert df.loc[df['change_1d'].abs().idxmax(), 'ticker'] in text
+    if n_positions <= 50:
+        assert all(ticker in text for ticker in df['ticker'])
+    else:
+        assert "Categorias:" in text and "Outros" in text
@@ -0,0 +1,48 @@
+import threading
+import time
+
+from src.rate_limiter import TokenBucket
+
+
+def test_burst_then_rate():
+    bucket = TokenBucket(rate=20, capacity=5)
+    start = time.perf_counter()
+    for _ in range(5):
+        bucket.acquire()
+    burst_seconds = time.perf_counter() - start
+    for _ in range(10):
+        bucket.acquire()
+    total_seconds = time.perf_counter() - start
+
+    assert burst_seconds < 0.05
+    # 10 tokens além do burst a 20/s: ~0.5s
+    assert 0.45 <= total_seconds < 1.0
+
+
+def test_rate_holds_across_threads():
+    bucket = TokenBucket(rate=50, capacity=1)
+    acquired = []
+
+    def worker():
+        for _ in range(10):
+            bucket.acquire()
+            acquired.append(time.perf_counter())
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 40 tokens com capacidade 1 a 50/s: pelo menos 39/50 s, quaisquer que sejam as threads
+    assert len(acquired) == 40
+    assert max(acquired) - start >= 0.75
+
+
+def test_zero_rate_never_blocks():
+    bucket = TokenBucket(rate=0)
+    start = time.perf_counter()
+    for _ in range(1000):
+        bucket.acquire()
+    assert time.perf_counter() - start < 0.1
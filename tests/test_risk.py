@@ -0,0 +1,162 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.price_panel import PricePanel
+from src.risk import RiskAnalyzer, RollingMoments, TRADING_DAYS
+
+
+def test_crypto_weekends_do_not_deflate_b3_volatility():
+    rng = np.random.default_rng(1)
+    dates = pd.date_range("2024-01-01", "2025-12-31", freq="D")
+    weekdays = dates.dayofweek < 5
+    b3 = np.full(len(dates), np.nan)
+    b3[weekdays] = 100 * np.cumprod(1 + rng.normal(0, 0.01, weekdays.sum()))
+    crypto = 100 * np.cumprod(1 + rng.normal(0, 0.03, len(dates)))
+    panel = PricePanel.from_frame(pd.DataFrame({"PETR4.SA": b3, "BTC-BRL": crypto}, index=dates))
+    portfolio_df = pd.DataFrame({"ticker": ["PETR4.SA"], "category": ["BR_STOCKS"], "value_brl": [1000.0]})
+
+    risk = RiskAnalyzer.from_portfolio(panel, portfolio_df).compute()
+
+    # 1% ao dia em 252 pregões, sem linhas de retorno zero nos fins de semana
+    assert abs(risk["volatility_pct"] - np.sqrt(TRADING_DAYS)) < 1.5
+
+
+def test_beta_against_the_benchmark_row():
+    dates = pd.bdate_range("2025-01-01", periods=200)
+    rng = np.random.default_rng(2)
+    bench = np.cumprod(1 + rng.normal(0, 0.01, len(dates)))
+    levered = np.cumprod(1 + 2 * (bench[1:] / bench[:-1] - 1))
+    panel = PricePanel.from_frame(pd.DataFrame(
+        {"BOVA11.SA": bench, "X.SA": np.r_[1.0, levered]}, index=dates
+    ))
+    portfolio_df = pd.DataFrame({"ticker": ["X.SA"], "category": ["BR_STOCKS"], "value_brl": [1.0]})
+    risk = RiskAnalyzer.from_portfolio(panel, portfolio_df, benchmark_ticker="BOVA11.SA").compute()
+    assert abs(risk["beta"] - 2.0) < 1e-6
+
+
+def test_2000_assets_5_years_runs_in_seconds():
+    n_assets, n_days = 2000, 5 * TRADING_DAYS
+    rng = np.random.default_rng(3)
+    returns = rng.normal(0, 0.01, (n_days, n_assets))
+    weights = rng.random(n_assets)
+    weights /= weights.sum()
+
+    start = time.perf_counter()
+    risk = RiskAnalyzer([f"T{i}" for i in range(n_assets)], returns, weights, benchmark=returns[:, 0]).compute()
+    elapsed = time.perf_counter() - start
+
+    # Meta do pedido: "em segundos"; ~0,3 s aqui, folga para CI lento
+    assert elapsed < 5
+    assert abs(sum(c["pct"] for c in risk["risk_contribution"]) - 100) < 1e-6
+
+
+def book_panel(n_days, seed=4):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2024-01-01", periods=n_days)
+    tickers = ["BOVA11.SA", "PETR4.SA", "VALE3.SA", "AAPL", "BRL=X"]
+    prices = 100 * np.cumprod(1 + rng.normal(0, 0.012, (n_days, len(tickers))), axis=0)
+    return pd.DataFrame(prices, index=dates, columns=tickers)
+
+
+PORTFOLIO = pd.DataFrame({
+    "ticker": ["PETR4.SA", "VALE3.SA", "AAPL", "Tesouro Selic"],
+    "category": ["BR_STOCKS", "BR_STOCKS", "US_STOCKS", "RENDA_FIXA"],
+    "value_brl": [3000.0, 2000.0, 1500.0, 3500.0],
+})
+
+
+def assert_same_risk(incremental, full):
+    assert incremental.keys() == full.keys()
+    for key, value in full.items():
+        if key == "risk_contribution":
+            for a, b in zip(incremental[key], value):
+                assert a["ticker"] == b["ticker"]
+                assert np.isclose(a["pct"], b["pct"], atol=1e-8)
+        elif isinstance(value, float):
+            assert np.isclose(incremental[key], value, atol=1e-9), key
+        else:
+            assert incremental[key] == value, key
+
+
+def test_daily_run_rolls_the_saved_window_and_matches_a_full_recompute(tmp_path, monkeypatch):
+    frame = book_panel(300)
+    state = str(tmp_path / "risk_state.npz")
+    window = 250
+    kwargs = dict(cdi_diario=0.04, benchmark_ticker="BOVA11.SA")
+    RiskAnalyzer.from_portfolio(PricePanel.from_frame(frame.iloc[:window]), PORTFOLIO, state_path=state, **kwargs)
+
+    builds = []
+    original = RollingMoments.from_matrix.__func__
+    monkeypatch.setattr(RollingMoments, "from_matrix",
+                        classmethod(lambda cls, r: builds.append(r.shape) or original(cls, r)))
+    # Três pregões depois: a janela desliza (sai o mais antigo, entram os novos)
+    for shift in (1, 3):
+        panel = PricePanel.from_frame(frame.iloc[shift:window + shift])
+        incremental = RiskAnalyzer.from_portfolio(panel, PORTFOLIO, state_path=state, **kwargs)
+        assert builds == []
+        full = RiskAnalyzer.from_portfolio(panel, PORTFOLIO, **kwargs)
+        builds.clear()
+        assert np.allclose(incremental.covariance, full.covariance, atol=1e-15)
+        assert_same_risk(incremental.compute(), full.compute())
+
+
+def test_revised_history_or_new_holdings_rebuild_the_moments(tmp_path, monkeypatch):
+    frame = book_panel(260)
+    state = str(tmp_path / "risk_state.npz")
+    RiskAnalyzer.from_portfolio(PricePanel.from_frame(frame.iloc[:250]), PORTFOLIO, state_path=state)
+
+    builds = []
+    original = RollingMoments.from_matrix.__func__
+    monkeypatch.setattr(RollingMoments, "from_matrix",
+                        classmethod(lambda cls, r: builds.append(r.shape) or original(cls, r)))
+
+    # Desdobramento ajustado no histórico: um pregão antigo muda
+    revised = frame.iloc[1:251].copy()
+    revised.iloc[10, 1] *= 1.01
+    panel = PricePanel.from_frame(revised)
+    analyzer = RiskAnalyzer.from_portfolio(panel, PORTFOLIO, state_path=state)
+    assert len(builds) == 1
+    assert np.allclose(analyzer.covariance, RiskAnalyzer.from_portfolio(panel, PORTFOLIO).covariance)
+
+    builds.clear()
+    RiskAnalyzer.from_portfolio(panel, PORTFOLIO.iloc[:3], state_path=state)
+    assert len(builds) == 1
+
+
+def test_update_slides_the_window_like_a_fresh_analyzer():
+    rng = np.random.default_rng(5)
+    returns = rng.normal(0, 0.01, (120, 6))
+    bench = rng.normal(0, 0.01, 120)
+    weights = np.full(6, 1 / 6)
+    constant = np.array([False] * 5 + [True])
+    returns[:, 5] = 0.0004
+
+    analyzer = RiskAnalyzer(list("ABCDEF"), returns[:100], weights, benchmark=bench[:100], constant=constant)
+    for day in range(100, 120):
+        analyzer.update(returns[day], bench[day])
+
+    fresh = RiskAnalyzer(list("ABCDEF"), returns[20:], weights, benchmark=bench[20:], constant=constant)
+    assert analyzer.returns.shape == (100, 6)
+    assert np.allclose(analyzer.covariance, np.cov(returns[20:], rowvar=False), atol=1e-15)
+    assert np.all(analyzer.covariance[5] == 0)
+    assert_same_risk(analyzer.compute(), fresh.compute())
+
+
+def test_one_day_update_at_2000_assets_is_cheaper_than_rebuilding():
+    n_assets, n_days = 2000, 5 * TRADING_DAYS
+    rng = np.random.default_rng(6)
+    returns = rng.normal(0, 0.01, (n_days + 1, n_assets))
+    weights = np.full(n_assets, 1 / n_assets)
+    analyzer = RiskAnalyzer(range(n_assets), returns[:-1], weights)
+
+    start = time.perf_counter()
+    analyzer.update(returns[-1])
+    update_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    RollingMoments.from_matrix(returns[1:])
+    rebuild_elapsed = time.perf_counter() - start
+
+    assert update_elapsed < rebuild_elapsed
+    assert np.allclose(analyzer.covariance, np.cov(returns[1:], rowvar=False), atol=1e-12)
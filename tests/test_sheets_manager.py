@@ -0,0 +1,127 @@
+import io
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from config.settings import Settings
+from src.sheets_manager import SheetsManager
+
+SHEET = "Ticker,Quantidade,Categoria,Meta\npetr4.sa,\"1.234,5\",br_stocks,\"12,5%\"\nRDB-NUBANK,R$ 500,renda_fixa,35%\nX,abc,br_stocks,1%\n"
+
+
+class SheetHandler(BaseHTTPRequestHandler):
+    """Published-CSV stand-in: 304 when If-None-Match matches the current ETag."""
+
+    def do_GET(self):
+        body = self.server.body
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.server.statuses.append(304)
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.server.statuses.append(200)
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def sheet_server(monkeypatch, tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SheetHandler)
+    server.body = SHEET.encode()
+    server.statuses = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(Settings, "SHEETS_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(SheetsManager, "_parsed_memo", {})
+    server.url = f"http://127.0.0.1:{server.server_port}/pub?output=csv"
+    yield server
+    server.shutdown()
+
+
+def test_unchanged_sheet_is_revalidated_not_reparsed(sheet_server, monkeypatch):
+    first = SheetsManager.get_portfolio_from_sheets(sheet_server.url)
+    assert first == [
+        {"ticker": "PETR4.SA", "quantity": 1234.5, "category": "BR_STOCKS", "target_pct": 12.5},
+        {"ticker": "RDB-NUBANK", "quantity": 500.0, "category": "RENDA_FIXA", "target_pct": 35.0},
+    ]
+
+    parses = []
+    original = SheetsManager._parse_portfolio
+    monkeypatch.setattr(SheetsManager, "_parse_portfolio", staticmethod(lambda c: parses.append(c) or original(c)))
+    # Novo processo: sem memo em memória, só a cópia local e o hash guardado
+    monkeypatch.setattr(SheetsManager, "_parsed_memo", {})
+    assert SheetsManager.get_portfolio_from_sheets(sheet_server.url) == first
+    assert sheet_server.statuses == [200, 304]
+    assert parses == []
+
+    sheet_server.body = SHEET.replace("R$ 500", "R$ 600").encode()
+    changed = SheetsManager.get_portfolio_from_sheets(sheet_server.url)
+    assert sheet_server.statuses[-1] == 200 and len(parses) == 1
+    assert changed[1]["quantity"] == 600.0
+
+
+def test_network_failure_uses_the_local_copy(sheet_server):
+    first = SheetsManager.get_portfolio_from_sheets(sheet_server.url)
+    sheet_server.shutdown()
+    sheet_server.server_close()
+    assert SheetsManager.get_portfolio_from_sheets(sheet_server.url) == first
+
+
+def iterrows_parse(content):
+    """The per-row parser the sheet used before vectorization."""
+    df = pd.read_csv(io.BytesIO(content), dtype=str)
+    portfolio = []
+    for _, row in df.iterrows():
+        ticker = str(row['Ticker']).strip().upper()
+        qty_str = str(row['Quantidade']).replace('R$', '').replace(' ', '').replace('.', '').replace(',', '.')
+        try:
+            qty = float(qty_str)
+        except ValueError:
+            qty = 0.0
+        meta_str = str(row['Meta']).replace('%', '').replace(' ', '').replace(',', '.')
+        try:
+            meta = float(meta_str)
+        except ValueError:
+            meta = 0.0
+        category = str(row['Categoria']).strip().upper()
+        if qty > 0:
+            portfolio.append({"ticker": ticker, "quantity": qty, "category": category, "target_pct": meta})
+    return portfolio
+
+
+def br_number(value, decimals=0):
+    """Formato brasileiro: milhar com ponto, decimal com vírgula."""
+    return f"{value:,.{decimals}f}".translate(str.maketrans(",.", ".,"))
+
+
+def test_50k_row_parse_against_iterrows():
+    rng = np.random.default_rng(0)
+    n = 50_000
+    rows = [
+        f't{i}.sa,"{br_number(q)}",br_stocks,"{br_number(m, 1)}%"'
+        for i, q, m in zip(range(n), rng.integers(0, 5000, n).tolist(), rng.uniform(0, 10, n).tolist())
+    ]
+    content = ("Ticker,Quantidade,Categoria,Meta\n" + "\n".join(rows)).encode()
+
+    start = time.perf_counter()
+    expected = iterrows_parse(content)
+    loop_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    result = SheetsManager._parse_portfolio(content)
+    vector_seconds = time.perf_counter() - start
+    print(f"\n50k rows: iterrows {loop_seconds:.2f}s, vectorized {vector_seconds:.2f}s")
+
+    assert len(result) > 40_000
+    assert result == expected
+    assert vector_seconds * 3 < loop_seconds
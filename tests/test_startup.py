@@ -0,0 +1,37 @@
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+HEAVY = ("pandas", "numpy", "yfinance", "matplotlib", "jinja2", "bcb", "GoogleNews", "google.genai")
+# Limite para os imports do próprio main.py (settings, pipeline, logging...); só o pandas passa disso
+BUDGET_US = 100_000
+
+
+def importtime(tmp_path, *args):
+    env = dict(os.environ, PYTHONPATH=str(REPO))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)$", line)
+        if match:
+            modules[match.group(3)] = (int(match.group(1)), match.group(2) == "")
+    return modules
+
+
+def test_dry_run_stays_within_the_import_budget(tmp_path):
+    # Importações do interpretador (site, encodings) ficam de fora da conta
+    baseline = importtime(tmp_path, "-c", "pass")
+    modules = importtime(tmp_path, str(REPO / "main.py"), "--dry-run")
+
+    heavy = sorted(name for name in modules if name.split(".")[0] in HEAVY or name.startswith(HEAVY))
+    own = sum(us for name, (us, top_level) in modules.items() if top_level and name not in baseline)
+    print(f"\nmain.py --dry-run imports: {own / 1000:.1f} ms (budget {BUDGET_US / 1000:.0f} ms)")
+    assert heavy == []
+    assert own <= BUDGET_US
@@ -0,0 +1,46 @@
+import time
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+
+from src.report_generator import ReportGenerator
+
+SVG = "{http://www.w3.org/2000/svg}"
+
+
+def portfolio():
+    return pd.DataFrame({
+        "ticker": ["PETR4.SA", "VALE3.SA", "HGLG11.SA", "RDB-NUBANK", "AAPL", "BTC-USD", "IVVB11.SA", "P&D"],
+        "category": ["BR_STOCKS", "BR_STOCKS", "FIIS", "RENDA_FIXA", "US_STOCKS", "CRYPTO", "ETFS", "P&D <teste>"],
+        "value_brl": [4000.0, 2500.0, 2000.0, 3500.0, 1800.0, 500.0, 900.0, 100.0],
+    })
+
+
+def best_of(render, runs=5):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = render()
+        times.append(time.perf_counter() - start)
+    return output, min(times)
+
+
+def test_svg_donut_against_matplotlib_png():
+    df = portfolio()
+    generator = ReportGenerator()
+    # Aquece o import do matplotlib para comparar só a renderização
+    generator.generate_allocation_chart_png(df)
+
+    svg, svg_seconds = best_of(lambda: generator.generate_allocation_chart_svg(df))
+    png, png_seconds = best_of(lambda: generator.generate_allocation_chart_png(df))
+    print(f"\nSVG {len(svg.encode())} bytes in {svg_seconds * 1000:.2f} ms | "
+          f"PNG {len(png)} bytes in {png_seconds * 1000:.1f} ms")
+
+    root = ET.fromstring(svg)
+    assert root.tag == f"{SVG}svg"
+    categories = df.groupby('category')['value_brl'].sum()
+    assert len(root.findall(f"{SVG}path")) == len(categories)
+    texts = [text.text for text in root.iter(f"{SVG}text")]
+    assert "P&D <teste>" in texts and "Alocação Atual da Carteira" in texts
+    assert len(svg.encode()) < 4096
+    assert svg_seconds * 10 < png_seconds